@@ -1,124 +1,372 @@
 # backend_connector.py
 
 import random
+import re
 import string
 import logging
 import os
-import subprocess
+import shutil
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from functools import wraps
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, ElementClickInterceptedException
+from web_driver_manager import SessionPool
+from browser_lifecycle import browser_lifecycle
+from charger_discovery import ChargerDiscovery
+from http_status_reader import HttpStatusReader
+from config_builder import ConfigBuilder, ConfigSchemaError, get_config_builder, ocpp_identity_from_hostname
+from config_index import config_fingerprint
+from instrumentation import tracer
+from resilience import AuthenticationFailed, BrowserUnavailable, ChargerResilience, CircuitOpenError
+from page_extractor import EVSE_STATUS_FIELDS, INFO_FIELDS, PageStructureError, extract_fields, wait_for_fields
+
+# Export control in the Assembler "Configuration Import / Export" section
+EXPORT_CONFIG_XPATH = ("//*[@id='exportConfig' or @id='downloadConfig'"
+                       " or (self::input and contains(@value, 'Export'))"
+                       " or (self::button and contains(normalize-space(.), 'Export'))]")
+
+# Installed on the Assembler page right before the import click: counts the fetch/XHR requests the page makes
+IMPORT_MONITOR_SCRIPT = """
+if (!window.__importMonitor) {
+    var monitor = window.__importMonitor = {pending: 0, finished: 0, status: null};
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            monitor.pending++;
+            return originalFetch.apply(this, arguments).then(function (response) {
+                monitor.pending--; monitor.finished++; monitor.status = response.status; return response;
+            }, function (error) {
+                monitor.pending--; monitor.finished++; monitor.status = 0; throw error;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        monitor.pending++;
+        this.addEventListener('loadend', function () { monitor.pending--; monitor.finished++; monitor.status = this.status; });
+        return originalSend.apply(this, arguments);
+    };
+}
+"""
+IMPORT_STATE_SCRIPT = """
+var monitor = window.__importMonitor;
+return {monitor: !!monitor, pending: monitor ? monitor.pending : 0, finished: monitor ? monitor.finished : 0,
+        status: monitor ? monitor.status : null, text: document.body ? document.body.innerText.slice(-2000) : ''};
+"""
+IMPORT_SUCCESS = re.compile(r"import(?:ed)? successful|successfully (?:imported|applied|uploaded)|will (?:now )?reboot|rebooting", re.IGNORECASE)
+IMPORT_FAILURE = re.compile(r"import failed|failed to import|invalid (?:config|file)|error", re.IGNORECASE)
+# HTTP read errors a browser can get past: a page the parser could not make sense of. Connection errors,
+# timeouts and rejected logins are not in here, Selenium would only hit them again after a browser launch.
+HTTP_FALLBACK_ERRORS = (PageStructureError, ValueError)
+# How long a charger that accepted an import may stay up before no reboot is expected any more, and how long to wait
+# for one when the message announced a reboot or when the import finished without any message
+REBOOT_GRACE = 3.0
+REBOOT_WAIT = 30.0
+
+class TracedWebDriverWait(WebDriverWait):
+    # Every explicit wait shows up as an element_wait span
+    def until(self, method, message=""):
+        with tracer.span("element_wait"):
+            return super().until(method, message)
+
+    def until_not(self, method, message=""):
+        with tracer.span("element_wait"):
+            return super().until_not(method, message)
+
+def traced_step(method):
+    # Time a whole BackendConnector step, tagged with the charger it runs against
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with tracer.tags(ip=self.ip_address, hostname=self.hostname), tracer.span("step", step=method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def resilient_step(on_circuit_open, retry=False):
+    # Fail fast while the charger's circuit breaker is open; with retry, transient failures are retried with backoff.
+    # Steps that must not run twice blindly (config import, password change) keep retry off.
+    def decorate(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.ip_address is None:
+                return method(self, *args, **kwargs)
+            result, error = self.resilience.run(self.ip_address, method.__name__,
+                                                lambda: method(self, *args, **kwargs), retry=retry)
+            if isinstance(error, CircuitOpenError):
+                return on_circuit_open(str(error))
+            return result
+        return wrapper
+    return decorate
 
 class BackendConnector:
 
-    def __init__(self, web_driver_manager):
+    def __init__(self, web_driver_manager, session_idle_ttl=300, status_mode="selenium", config_index=None,
+                 compare_with_export=True, scheme="https", upload_timeout=180, charger_registry=None,
+                 resilience=None):
         self.web_driver_manager = web_driver_manager
+        self.scheme = scheme  # "http" only for the local mock charger
         self.ip_address = None
         self.hostname = None  # Make sure this is initialized
-
-    def is_ip_reachable(self, ip_address):
+        # Warm, logged-in browsers keyed by charger IP, shared by every step below
+        self.session_pool = SessionPool(web_driver_manager, login_fn=self._login, idle_ttl=session_idle_ttl)
+        self.discovery = ChargerDiscovery()
+        # Per-charger circuit breakers and retry policy around every step
+        self.resilience = resilience or ChargerResilience()
+        # Optional hostname -> URL map kept by a subnet scanner, lets callers find a charger after a new DHCP lease
+        self.charger_registry = charger_registry
+        # "http" reads Info and EVSE pages without a browser and falls back to Selenium when a page does not match
+        self.status_mode = status_mode
+        self.http_reader = HttpStatusReader(scheme=scheme)
+        # Hostname -> last applied config hash, used to skip re-uploading a config the unit already runs
+        self.config_index = config_index
+        self.compare_with_export = compare_with_export
+        # One overall deadline for a config upload, from opening the Assembler page to the unit being back up
+        self.upload_timeout = upload_timeout
+        # Inside provisioning_run() one logged-in driver per charger is kept for every step
+        self._run_active = False
+        self._pinned = {}  # ip_address -> driver
+
+    def _login(self, driver, ip_address, username, password):
+        with tracer.span("login", ip=ip_address):
+            driver.get(f"{self.scheme}://{ip_address}")
+            browser_lifecycle.count_navigation(driver)
+            TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
+            driver.find_element(By.NAME, 'username').send_keys(username)
+            driver.find_element(By.NAME, 'password').send_keys(password)
+            driver.find_element(By.XPATH, "//button[@name='login']").click()
+            try:
+                TracedWebDriverWait(driver, 10).until_not(EC.presence_of_element_located((By.NAME, 'username')))
+            except TimeoutException:
+                # Still on the login form after the submit: the charger rejected the credentials
+                raise AuthenticationFailed(f"Login to {ip_address} as {username} was rejected.")
+
+    def _is_login_page(self, driver):
+        return bool(driver.find_elements(By.NAME, 'username'))
+
+    def _open_page(self, driver, url, username, password):
+        # Navigate with the existing session and only log in again if the charger bounced us to the login form
+        ip_address, _, path = url.split("//")[1].partition("/")
+        with tracer.span("page_load", ip=ip_address, path=f"/{path}"):
+            driver.get(url)
+            expired = self._is_login_page(driver)
+        browser_lifecycle.count_navigation(driver)
+        if expired:
+            logging.info(f"Session expired on {url}, logging in again.")
+            self._login(driver, ip_address, username, password)
+            with tracer.span("page_load", ip=ip_address, path=f"/{path}"):
+                driver.get(url)
+            browser_lifecycle.count_navigation(driver)
+
+    def _open_assembler_page(self, driver, url, username, password, remaining):
+        # Assembler page with its "Configuration Import / Export" section loaded; remaining() bounds each wait
+        self._open_page(driver, url, username, password)
+        TracedWebDriverWait(driver, remaining(), poll_frequency=0.1).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/Assembler']")))
+        driver.find_element(By.XPATH, "//a[@href='/Assembler']").click()
+        TracedWebDriverWait(driver, remaining(), poll_frequency=0.1).until(EC.presence_of_element_located((By.XPATH, '//legend[contains(text(), "Configuration Import / Export")]')))
+
+    def _lease_driver(self, ip_address, username, password, pin=True):
+        # pin=False always leases a browser of its own, never the one a provisioning run keeps for its steps
+        driver = self._pinned.get(ip_address) if pin else None
+        if driver is not None:
+            return driver
         try:
-            response = subprocess.run(["ping", "-n", "1", ip_address], stdout=subprocess.PIPE)
-            return response.returncode == 0
+            driver = self.session_pool.lease(ip_address, username, password)
         except Exception as e:
-            logging.error(f"Failed to ping IP: {str(e)}")
-            return False
-
-    def connect_to_backend(self, test_urls, username, password):
-        for test_url in test_urls:
+            logging.error(f"Failed to open a logged-in session on {ip_address}: {str(e)}")
+            self.resilience.report(e)
+            return None
+        if driver is None:
+            self.resilience.report(BrowserUnavailable("Failed to initialize WebDriver."))
+            return None
+        if driver is not None and self._run_active and pin:
+            self._pinned[ip_address] = driver
+        return driver
+
+    def _release_driver(self, driver, failed=False):
+        pinned_ip = next((ip for ip, pinned in self._pinned.items() if pinned is driver), None)
+        if pinned_ip is not None:
+            if not failed:
+                return
+            # A failed step may have left the browser in an unknown state, the next step starts clean
+            del self._pinned[pinned_ip]
+        self.session_pool.release(driver, discard=failed)
+
+    @contextmanager
+    def provisioning_run(self):
+        # Keep one authenticated browser per charger across all steps of a run instead of re-leasing per step
+        self._run_active = True
+        try:
+            yield self
+        finally:
+            self._run_active = False
+            pinned, self._pinned = self._pinned, {}
+            for driver in pinned.values():
+                self.session_pool.release(driver)
+
+    def close(self):
+        self.session_pool.close_all()
+
+    def connect_to_backend(self, test_urls, username, password, hostname=None):
+        # Traced here instead of with traced_step: the connector still holds the previous unit when the lookup starts,
+        # the step span is tagged with the charger that was found
+        with tracer.span("step", step="connect_to_backend") as span:
+            info = self._connect_to_backend(test_urls, username, password, hostname)
+            span.tags.update({key: value for key, value in (("ip", info[0]), ("hostname", info[2])) if value is not None})
+        return info
+
+    def _connect_to_backend(self, test_urls, username, password, hostname):
+        # A known hostname is looked up in the registry cache and tried before the fixed candidates
+        if hostname is not None and self.charger_registry is not None:
+            resolved_url = self.charger_registry.resolve(hostname)
+            if resolved_url:
+                test_urls = [resolved_url] + [url for url in test_urls if url != resolved_url]
+
+        # Probe every candidate at once and only start a browser on chargers that answered, fastest first
+        live_chargers = self.discovery.discover(test_urls)
+        if not live_chargers and self.charger_registry is not None:
+            # The bench charger may have moved to a new lease, try every charger the scanner knows about
+            known_urls = [url for url in self.charger_registry.known_urls() if url not in test_urls]
+            if known_urls:
+                logging.info(f"No candidate answered, trying {len(known_urls)} charger(s) from the hostname cache.")
+                live_chargers = self.discovery.discover(known_urls)
+        if not live_chargers:
+            logging.error(f"None of the candidate chargers are reachable: {test_urls}")
+
+        for charger in live_chargers:
+            test_url = charger.url
             ip_address = test_url.split("//")[1]
-            if not self.is_ip_reachable(ip_address):
-                logging.error(f"IP {ip_address} is not reachable.")
-                continue
+            # A bench that keeps failing is skipped without a browser launch until its breaker half-opens
+            with tracer.tags(ip=ip_address):
+                info, _ = self.resilience.run(
+                    ip_address, "connect_to_backend",
+                    lambda: self._read_charger_info(test_url, ip_address, username, password),
+                )
+            if info is not None:
+                return info
 
-            driver = self.web_driver_manager.initialize_driver(headless=True)  # Adjust headless mode as needed
-            if driver is None:
-                return None, None, None
+        logging.info("All test URLs failed to connect.")
+        return None, None, None
 
+    def _read_charger_info(self, test_url, ip_address, username, password):
+        if self.status_mode == "http":
             try:
-                driver.get(test_url)
+                self.ip_address, power_drawn, self.hostname = self.http_reader.read_info(ip_address, username, password)
+                logging.info(f"Successfully retrieved information from {test_url}: IP={self.ip_address}, Power={power_drawn}, Hostname={self.hostname}")
+                self._remember_charger(test_url)
+                return self.ip_address, power_drawn, self.hostname
+            except HTTP_FALLBACK_ERRORS as e:
+                logging.warning(f"HTTP Info read failed on {test_url}, falling back to Selenium: {str(e)}")
+            except Exception as e:
+                # Unreachable, timed out or rejected: a browser would fail the same way, only slower
+                logging.error(f"Failed to connect to {test_url}: {str(e)}")
+                self.resilience.report(e)
+                return None
 
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
-                driver.find_element(By.NAME, 'username').send_keys(username)
-                driver.find_element(By.NAME, 'password').send_keys(password)
-                driver.find_element(By.XPATH, "//button[@name='login']").click()
+        driver = self._lease_driver(ip_address, username, password)
+        if driver is None:
+            return None
 
-                WebDriverWait(driver, 10).until(EC.url_contains(test_url))
+        failed = False
+        try:
+            self._open_page(driver, test_url, username, password)
 
-                driver.find_element(By.XPATH, "//a[contains(text(), 'Info')]").click()
+            TracedWebDriverWait(driver, 10).until(EC.url_contains(test_url))
 
-                self.ip_address = driver.find_element(By.XPATH, "//td[text()='System IP Address']/following-sibling::td/span").text.strip()
-                power_drawn = driver.find_element(By.XPATH, "//td[contains(text(),'AC Voltage')]/following-sibling::td/span").text.strip()
+            driver.find_element(By.XPATH, "//a[contains(text(), 'Info')]").click()
 
-                # Store the hostname
-                self.hostname = driver.find_element(By.XPATH, "//td[text()='Hostname']/following-sibling::td/span").text.strip()
+            # Read IP address, supply voltage and hostname in one round trip once the Info page is up
+            with tracer.span("extraction", page="Info"):
+                info = wait_for_fields(driver, INFO_FIELDS, timeout=10)
+            self.ip_address = info["System IP Address"]
+            power_drawn = info["AC Voltage"]
 
-                logging.info(f"Successfully retrieved information from {test_url}: IP={self.ip_address}, Power={power_drawn}, Hostname={self.hostname}")
+            # Store the hostname
+            self.hostname = info["Hostname"]
 
-                return self.ip_address, power_drawn, self.hostname
+            logging.info(f"Successfully retrieved information from {test_url}: IP={self.ip_address}, Power={power_drawn}, Hostname={self.hostname}")
+            self._remember_charger(test_url)
 
-            except (TimeoutException, WebDriverException) as e:
-                logging.error(f"Failed to connect to {test_url}: {str(e)}")
-                continue
-            finally:
-                self.web_driver_manager.quit_driver()
+            return self.ip_address, power_drawn, self.hostname
 
-        logging.info("All test URLs failed to connect.")
-        return None, None, None
+        except (TimeoutException, WebDriverException, PageStructureError) as e:
+            logging.error(f"Failed to connect to {test_url}: {str(e)}")
+            self.resilience.report(e)
+            failed = True
+            return None
+        finally:
+            self._release_driver(driver, failed=failed)
+
+    def _remember_charger(self, url):
+        if self.charger_registry is not None and self.hostname:
+            self.charger_registry.cache.put(self.hostname, url)
 
+    @traced_step
+    @resilient_step(lambda message: None)
     def get_evse_status(self, username, password):
         if self.ip_address is None:
             logging.error("IP address is not set. Connect to the backend first.")
             return None
+        return self._read_evse_status(self.ip_address, username, password)
+
+    def read_evse_status(self, ip_address, username, password):
+        # Status of any charger, not only the connected one; the StatusBroadcaster polls through this so the feed
+        # keeps the Selenium fallback. None when the status could not be read.
+        # Feed polls run on their own threads, outside the worker's per-charger key, and keep failing while a unit
+        # reboots after an import; they get a breaker of their own so they never pause or take the probe of a step.
+        with tracer.tags(ip=ip_address), tracer.span("step", step="read_evse_status"):
+            result, _ = self.resilience.run(f"{ip_address}:status", "read_evse_status",
+                                            lambda: self._read_evse_status(ip_address, username, password, pin=False),
+                                            retry=False)
+        return result
+
+    def _read_evse_status(self, ip_address, username, password, pin=True):
+        if self.status_mode == "http":
+            try:
+                evse_status = self.http_reader.read_evse_status(ip_address, username, password)
+                logging.info(f"EVSE Status retrieved: {evse_status}")
+                return evse_status
+            except HTTP_FALLBACK_ERRORS as e:
+                logging.warning(f"HTTP EVSE status read failed on {ip_address}, falling back to Selenium: {str(e)}")
+            except Exception as e:
+                logging.error(f"An error occurred while retrieving EVSE status: {str(e)}")
+                self.resilience.report(e)
+                return None
 
-        url = f"https://{self.ip_address}/EVSE"
-        driver = self.web_driver_manager.initialize_driver(headless=True)
+        url = f"{self.scheme}://{ip_address}/EVSE"
+        driver = self._lease_driver(ip_address, username, password, pin=pin)
         if driver is None:
             logging.error("Failed to initialize WebDriver.")
             return None
 
+        failed = False
         try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
-            driver.find_element(By.NAME, 'username').send_keys(username)
-            driver.find_element(By.NAME, 'password').send_keys(password)
-            driver.find_element(By.XPATH, "//button[@name='login']").click()
+            self._open_page(driver, url, username, password)
 
             # Navigate to the EVSE Status page
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//legend[text()='EVSEs']")))
-
-            # Extract the EVSE status details
-            status = driver.find_element(By.XPATH, "//td[text()='Status']/following-sibling::td/span").text.strip()
-            temperature = driver.find_element(By.XPATH, "//td[text()='Temperature']/following-sibling::td/span").text.strip()
-            available_power = driver.find_element(By.XPATH, "//td[text()='Available Power']/following-sibling::td/span").text.strip()
-            ac_voltage = driver.find_element(By.XPATH, "//td[text()='AC Voltage']/following-sibling::td/span").text.strip()
-            current = driver.find_element(By.XPATH, "//td[text()='Current']/following-sibling::td/span").text.strip()
-            current_offered = driver.find_element(By.XPATH, "//td[text()='Current Offered']/following-sibling::td/span").text.strip()
-            energy = driver.find_element(By.XPATH, "//td[text()='Energy']/following-sibling::td/span").text.strip()
-            evse_pp_state = driver.find_element(By.XPATH, "//td[text()='EVSE PP State']/following-sibling::td/span").text.strip()
-
-            evse_status = {
-                "Status": status,
-                "Temperature": temperature,
-                "Available Power": available_power,
-                "AC Voltage": ac_voltage,
-                "Current": current,
-                "Current Offered": current_offered,
-                "Energy": energy,
-                "EVSE PP State": evse_pp_state,
-            }
+            TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//legend[text()='EVSEs']")))
+
+            # Extract every EVSE status field in a single round trip
+            with tracer.span("extraction", page="EVSE"):
+                evse_status = extract_fields(driver, EVSE_STATUS_FIELDS)
 
             logging.info(f"EVSE Status retrieved: {evse_status}")
             return evse_status
 
         except Exception as e:
             logging.error(f"An error occurred while retrieving EVSE status: {str(e)}")
+            self.resilience.report(e)
+            failed = True
             return None
         finally:
-            driver.quit()
+            self._release_driver(driver, failed=failed)
 
-    def upload_config_file(self, config_file_path, username, password):
+    @traced_step
+    @resilient_step(lambda message: f"An error occurred: {message}")
+    def upload_config_file(self, config_file_path, username, password, merge_ocpp_id=False):
         config_file_path = os.path.abspath(config_file_path)
 
         if not os.path.exists(config_file_path):
@@ -129,59 +377,358 @@ class BackendConnector:
             logging.error("IP address is not set. Connect to the backend first.")
             return "IP address is not set. Connect to the backend first."
 
-        url = f"https://{self.ip_address}"
-        driver = self.web_driver_manager.initialize_driver(headless=True)
+        # Build a per-unit archive with the OCPP identity already in it, which replaces allocate_ocpp_id
+        ocpp_id = None
+        template_path = config_file_path
+        if merge_ocpp_id:
+            if self.hostname is None:
+                logging.error("Hostname is not set. Ensure you have retrieved it during the readiness check.")
+                return "Hostname is not set. Ensure you have retrieved it during the readiness check."
+            ocpp_id = ocpp_identity_from_hostname(self.hostname)
+            try:
+                config_data = get_config_builder(template_path).build(ocpp_id)
+            except (ConfigSchemaError, OSError, ValueError, zipfile.BadZipFile) as e:
+                logging.error(f"Configuration {template_path} failed checks: {str(e)}")
+                return f"Configuration failed checks: {str(e)}"
+        else:
+            with open(config_file_path, "rb") as f:
+                config_data = f.read()
+
+        # Content hash for the applied-config index, a file we cannot fingerprint is simply always uploaded
+        config_hash = None
+        if self.config_index is not None and self.hostname is not None:
+            try:
+                config_hash, _ = config_fingerprint(config_data)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                logging.warning(f"Could not fingerprint {template_path}: {str(e)}")
+
+        # The index only records what this PC uploaded; a reset or reflashed unit keeps its entry, so a hit is just
+        # a reason to ask the charger: its identity for a merged config, otherwise its export below
+        index_hit = config_hash is not None and self.config_index.is_applied(self.hostname, config_hash, ocpp_id)
+        if index_hit and ocpp_id is not None:
+            identity = self._identity_on_charger(username, password)
+            if identity == ocpp_id:
+                logging.info(f"Configuration {config_hash[:12]} is already applied on {self.hostname}, skipping upload.")
+                return self._upload_skipped_message(ocpp_id)
+            if identity is not None:
+                logging.info(f"{self.hostname} reports identity {identity}, configuration {config_hash[:12]} is gone.")
+                self.config_index.forget(self.hostname)
+            index_hit = False
+
+        if ocpp_id is not None:
+            config_file_path = get_config_builder(template_path).build_file(ocpp_id, data=config_data)
+            logging.info(f"Built configuration for OCPP ID {ocpp_id}: {config_file_path}")
+
+        url = f"{self.scheme}://{self.ip_address}"
+        driver = self._lease_driver(self.ip_address, username, password)
         if driver is None:
+            if ocpp_id is not None:
+                ConfigBuilder.remove_file(config_file_path)
             return "Failed to initialize WebDriver."
 
+        deadline = time.monotonic() + self.upload_timeout
+
+        def remaining():
+            return max(0.1, deadline - time.monotonic())
+
+        failed = False
         try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
-            driver.find_element(By.NAME, 'username').send_keys(username)
-            driver.find_element(By.NAME, 'password').send_keys(password)
-            driver.find_element(By.XPATH, "//button[@name='login']").click()
+            self._open_assembler_page(driver, url, username, password, remaining)
 
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/Assembler']")))
-            assembler_link = driver.find_element(By.XPATH, "//a[@href='/Assembler']")
-            assembler_link.click()
+            # The unit may already run this config (retest/rework), compare its export before re-importing
+            if config_hash is not None and (self.compare_with_export or index_hit):
+                if self._exported_config_matches(driver, config_hash, ocpp_id):
+                    self.config_index.record(self.hostname, config_hash, ocpp_id, os.path.basename(template_path))
+                    return self._upload_skipped_message(ocpp_id)
+                if index_hit:
+                    self.config_index.forget(self.hostname)
 
-            WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.XPATH, '//legend[contains(text(), "Configuration Import / Export")]')))
             file_input = driver.find_element(By.ID, 'configToUpload')
             driver.execute_script("arguments[0].scrollIntoView(true);", file_input)
 
             # Upload the configuration file
-            try:
-                file_input.send_keys(config_file_path)
-                logging.info(f"Uploaded configuration file: {config_file_path}")
+            with tracer.span("upload"):
+                try:
+                    file_input.send_keys(config_file_path)
+                    logging.info(f"Uploaded configuration file: {config_file_path}")
+
+                    # Wait for the button to be enabled and click it
+                    upload_button = driver.find_element(By.ID, 'uploadConfig')
+                    TracedWebDriverWait(driver, remaining(), poll_frequency=0.1).until(
+                        lambda d: upload_button.is_enabled() and upload_button.is_displayed())
+                    driver.execute_script("arguments[0].scrollIntoView(true);", upload_button)
+                    driver.execute_script(IMPORT_MONITOR_SCRIPT)
+                    baseline_text = (driver.execute_script(IMPORT_STATE_SCRIPT) or {}).get("text") or ""
+
+                    try:
+                        upload_button.click()
+                        logging.info("Clicked on the 'Import Config' button successfully.")
+                    except ElementClickInterceptedException as e:
+                        logging.error(f"Element click intercepted: {str(e)}")
+                        # Optionally retry clicking or use JavaScript to click
+                        driver.execute_script("arguments[0].click();", upload_button)
+
+                except Exception as e:
+                    logging.error(f"Failed to upload configuration file: {str(e)}")
+                    self.resilience.report(e)
+                    return f"An error occurred during configuration upload: {str(e)}"
+
+            # Only report success once the charger has confirmed the import and is reachable again
+            with tracer.span("import_confirmation"):
+                confirmed, detail = self._wait_for_import(driver, url, deadline, baseline_text)
+            if not confirmed:
+                logging.error(f"Configuration import on {self.ip_address} was not confirmed: {detail}")
+                return f"Configuration import was not confirmed: {detail}"
+            logging.info(f"Configuration import on {self.ip_address} confirmed: {detail}")
+
+            if config_hash is not None:
+                self.config_index.record(self.hostname, config_hash, ocpp_id, os.path.basename(template_path))
+
+            if ocpp_id is not None:
+                logging.info(f"Set Charger Identity (OCPP ID) to: {ocpp_id} through the configuration upload")
+                return f"Configuration uploaded successfully with OCPP ID: {ocpp_id}"
+            return "Configuration uploaded successfully."
 
-                import time
-                # Wait for the button to be enabled and click it
-                upload_button = driver.find_element(By.ID, 'uploadConfig')
-                WebDriverWait(driver, 20).until(lambda d: upload_button.is_enabled())
-                driver.execute_script("arguments[0].scrollIntoView(true);", upload_button)
-                time.sleep(1)  # Ensure any animations or messages settle
+        except Exception as e:
+            logging.error(f"An error occurred during configuration upload: {str(e)}")
+            self.resilience.report(e)
+            failed = True
+            return f"An error occurred: {str(e)}"
 
+        finally:
+            self._release_driver(driver, failed=failed)
+            if ocpp_id is not None:
+                ConfigBuilder.remove_file(config_file_path)
+
+    def _wait_for_import(self, driver, url, deadline, baseline_text=""):
+        # Event-driven wait for the import: the request finishing, then a success/failure message, then, if the
+        # charger reboots, its web UI going away and coming back. Returns (confirmed, detail).
+        accepted_at = None
+        accepted = None  # The success message, the only confirmation short of a reboot
+        reboot_grace = REBOOT_GRACE
+        went_down = False
+        while time.monotonic() < deadline:
+            if accepted_at is None:
                 try:
-                    upload_button.click()
-                    logging.info("Clicked on the 'Import Config' button successfully.")
-                except ElementClickInterceptedException as e:
-                    logging.error(f"Element click intercepted: {str(e)}")
-                    # Optionally retry clicking or use JavaScript to click
-                    driver.execute_script("arguments[0].click();", upload_button)
+                    state = driver.execute_script(IMPORT_STATE_SCRIPT) or {}
+                except WebDriverException:
+                    state = {"monitor": False, "pending": 0, "finished": 0, "status": None, "text": ""}
+                text = state.get("text") or ""
+                success = self._new_message(IMPORT_SUCCESS, text, baseline_text)
+                failure = self._new_message(IMPORT_FAILURE, text, baseline_text)
+                status = state.get("status")
+                if failure and not success:
+                    return False, failure
+                if status is not None and status >= 400:
+                    return False, f"import request answered HTTP {status}"
+                if success:
+                    accepted_at = time.monotonic()
+                    accepted = success
+                    if "reboot" in success.lower():
+                        reboot_grace = REBOOT_WAIT
+                    logging.info(f"Charger accepted the configuration: {success}")
+                elif state.get("monitor") and not state.get("pending") and not state.get("finished"):
+                    time.sleep(0.1)  # Import request not sent yet
+                    continue
+                elif state.get("monitor") and state.get("pending"):
+                    time.sleep(0.1)  # Import request still in flight
+                    continue
+                else:
+                    # Request done (or the page navigated away) without a message: only a reboot can confirm it now
+                    accepted_at = time.monotonic()
+                    reboot_grace = REBOOT_WAIT
+
+            # After acceptance, a rebooting charger stops answering; once it serves its login page again it is ready
+            live = self.discovery.discover([url], first_only=True)
+            if not live:
+                if not went_down:
+                    logging.info(f"Charger {self.ip_address} is rebooting after the configuration import.")
+                went_down = True
+            elif went_down:
+                return True, "charger rebooted and its web UI is back"
+            elif time.monotonic() - accepted_at >= reboot_grace:
+                if accepted is None:
+                    return False, "import finished without a success message or a reboot"
+                return True, "import accepted, no reboot observed"
+            time.sleep(0.5)
+        return False, f"no confirmation within {self.upload_timeout}s"
+
+    def _new_message(self, pattern, text, baseline_text):
+        # A match only counts if it was not already on the page before the import was clicked
+        matches = pattern.findall(text)
+        if len(matches) > len(pattern.findall(baseline_text)):
+            return matches[-1]
+        return None
+
+    def is_config_applied(self, config_file_path, merge_ocpp_id=False):
+        # Index-only check, no charger involved: has this unit confirmed an import of exactly this (per-unit) config.
+        # Only a reason to read the charger back, see read_back_checkpoints.
+        if self.config_index is None or self.hostname is None:
+            return False
+        config_hash, ocpp_id = self._fingerprint_config(config_file_path, merge_ocpp_id)
+        return config_hash is not None and self.config_index.is_applied(self.hostname, config_hash, ocpp_id)
+
+    @traced_step
+    @resilient_step(lambda message: False, retry=True)
+    def config_matches_charger(self, config_file_path, username, password, merge_ocpp_id=False):
+        # Read-back with a browser: the charger's exported config against this (per-unit) config
+        if self.ip_address is None or self.hostname is None:
+            logging.error("IP address or hostname is not set. Connect to the backend first.")
+            return False
+        config_hash, ocpp_id = self._fingerprint_config(config_file_path, merge_ocpp_id)
+        if config_hash is None:
+            return False
 
-            except Exception as e:
-                logging.error(f"Failed to upload configuration file: {str(e)}")
-                return f"An error occurred during configuration upload: {str(e)}"
+        driver = self._lease_driver(self.ip_address, username, password)
+        if driver is None:
+            return False
+        deadline = time.monotonic() + 30
 
-            return "Configuration uploaded successfully."
+        failed = False
+        try:
+            self._open_assembler_page(driver, f"{self.scheme}://{self.ip_address}", username, password,
+                                      lambda: max(0.1, deadline - time.monotonic()))
+            return self._exported_config_matches(driver, config_hash, ocpp_id)
+        except Exception as e:
+            logging.error(f"Could not read back the configuration of {self.ip_address}: {str(e)}")
+            self.resilience.report(e)
+            failed = True
+            return False
+        finally:
+            self._release_driver(driver, failed=failed)
 
+    def _fingerprint_config(self, config_file_path, merge_ocpp_id):
+        # (config_hash, ocpp_id) of the config this unit gets; config_hash is None when it cannot be fingerprinted
+        ocpp_id = ocpp_identity_from_hostname(self.hostname) if merge_ocpp_id else None
+        try:
+            if ocpp_id is not None:
+                config_data = get_config_builder(os.path.abspath(config_file_path)).build(ocpp_id)
+            else:
+                with open(config_file_path, "rb") as f:
+                    config_data = f.read()
+            config_hash, _ = config_fingerprint(config_data)
+        except (ConfigSchemaError, OSError, ValueError, zipfile.BadZipFile) as e:
+            logging.warning(f"Could not fingerprint {config_file_path}: {str(e)}")
+            return None, ocpp_id
+        return config_hash, ocpp_id
+
+    def _identity_on_charger(self, username, password):
+        # Inside another step: read without a resilience run of its own, None when the identity cannot be read
+        try:
+            return self.http_reader.read_ocpp_identity(self.ip_address, username, password)
         except Exception as e:
-            logging.error(f"An error occurred during configuration upload: {str(e)}")
-            return f"An error occurred: {str(e)}"
+            logging.warning(f"Could not read the OCPP identity on {self.ip_address}: {str(e)}")
+            return None
+
+    def read_back_checkpoints(self, unit, config_file_path, username, password, merge_ocpp_id=False):
+        # Checks a resumed unit's checkpoints against the charger itself, for the bench UI and the pipeline alike.
+        # Returns the step to resume from, or None when every checkpoint still holds. That step and every later one
+        # are reopened; a rejected pre-configure also leaves the config index, so its upload is not skipped.
+        stale = self._first_unconfirmed_step(unit, config_file_path, username, password, merge_ocpp_id)
+        if stale is not None:
+            unit.reopen(stale)
+            if stale == "pre_configure" and self.config_index is not None:
+                self.config_index.forget(unit.hostname)
+        return stale
+
+    def _first_unconfirmed_step(self, unit, config_file_path, username, password, merge_ocpp_id):
+        steps = unit.resumable_steps
+        expected_identity = ocpp_identity_from_hostname(unit.hostname)
+        identity = None
+        if "pre_configure" in steps or "ocpp_id" in steps:
+            identity = self.read_ocpp_identity(username=username, password=password)
+        for step in steps:
+            if step == "pre_configure":
+                # The index hit only says this PC uploaded it, the charger has to confirm it still runs it
+                confirmed = self.is_config_applied(config_file_path, merge_ocpp_id=merge_ocpp_id)
+                if merge_ocpp_id:
+                    confirmed = confirmed and identity == expected_identity
+                elif confirmed:
+                    confirmed = self.config_matches_charger(config_file_path, username, password)
+            elif step == "ocpp_id":
+                confirmed = identity == expected_identity
+            elif step == "passwords":
+                passwords = unit.checkpoint(step)["data"] or {}
+                confirmed = bool(passwords.get("Installer")) and self.verify_login("Installer", passwords["Installer"])
+            else:
+                confirmed = False
+            if not confirmed:
+                # A merged identity came with the config upload, only that upload can put it back
+                return "pre_configure" if step == "ocpp_id" and merge_ocpp_id else step
+        return None
+
+    @traced_step
+    @resilient_step(lambda message: None, retry=True)
+    def read_ocpp_identity(self, username, password):
+        # Charger Identity currently saved on the CSMS page, read over HTTP; None when it cannot be read
+        if self.ip_address is None:
+            logging.error("IP address is not set. Connect to the backend first.")
+            return None
+        try:
+            return self.http_reader.read_ocpp_identity(self.ip_address, username, password)
+        except Exception as e:
+            logging.warning(f"Could not read the OCPP identity on {self.ip_address}: {str(e)}")
+            self.resilience.report(e)
+            return None
 
+    @traced_step
+    @resilient_step(lambda message: False, retry=True)
+    def verify_login(self, username, password):
+        # True when the charger accepts these credentials, used to confirm a password change stuck
+        if self.ip_address is None:
+            logging.error("IP address is not set. Connect to the backend first.")
+            return False
+        try:
+            return self.http_reader.check_login(self.ip_address, username, password)
+        except Exception as e:
+            logging.warning(f"Could not verify the {username} login on {self.ip_address}: {str(e)}")
+            self.resilience.report(e)
+            return False
+
+    def _upload_skipped_message(self, ocpp_id):
+        if ocpp_id is not None:
+            return f"Configuration upload skipped, already applied successfully with OCPP ID: {ocpp_id}"
+        return "Configuration upload skipped, already applied successfully."
+
+    def export_config(self, driver, timeout=15):
+        # Download the charger's current config archive from the Assembler page the driver is on
+        buttons = driver.find_elements(By.XPATH, EXPORT_CONFIG_XPATH)
+        if not buttons:
+            logging.info("No configuration export control found on the Assembler page.")
+            return None
+
+        download_dir = tempfile.mkdtemp(prefix="config-export-")
+        try:
+            driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": download_dir})
+            driver.execute_script("arguments[0].click();", buttons[0])
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                archives = [name for name in os.listdir(download_dir) if name.endswith(".zip")]
+                if archives:
+                    with open(os.path.join(download_dir, archives[0]), "rb") as f:
+                        return f.read()
+                time.sleep(0.2)
+            logging.warning(f"Configuration export did not finish within {timeout}s.")
+            return None
         finally:
-            driver.quit()
+            shutil.rmtree(download_dir, ignore_errors=True)
 
+    def _exported_config_matches(self, driver, config_hash, ocpp_id):
+        try:
+            exported = self.export_config(driver)
+            if exported is None:
+                return False
+            exported_hash, exported_ocpp_id = config_fingerprint(exported)
+        except Exception as e:
+            logging.warning(f"Could not compare the charger's current configuration: {str(e)}")
+            return False
+
+        matches = exported_hash == config_hash and (ocpp_id is None or exported_ocpp_id == ocpp_id)
+        logging.info(f"Charger configuration {exported_hash[:12]} {'matches' if matches else 'differs from'} {config_hash[:12]}.")
+        return matches
+
+    @traced_step
+    @resilient_step(lambda message: f"An error occurred: {message}", retry=True)
     def allocate_ocpp_id(self, username, password):
         if self.ip_address is None:
             logging.error("IP address is not set. Connect to the backend first.")
@@ -192,30 +739,27 @@ class BackendConnector:
             return "Hostname is not set. Ensure you have retrieved it during the readiness check."
 
         # Extract the last 9 digits from the hostname
-        ray_id_last_9 = self.hostname[-9:]
+        ray_id_last_9 = ocpp_identity_from_hostname(self.hostname)
         logging.info(f"Extracted RAY ID (last 9 digits of Hostname): {ray_id_last_9}")
 
-        url = f"https://{self.ip_address}/CSMS"
-        driver = self.web_driver_manager.initialize_driver(headless=True)
+        url = f"{self.scheme}://{self.ip_address}/CSMS"
+        driver = self._lease_driver(self.ip_address, username, password)
         if driver is None:
             logging.error("Failed to initialize WebDriver.")
             return "Failed to initialize WebDriver."
 
+        failed = False
         try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
-            driver.find_element(By.NAME, 'username').send_keys(username)
-            driver.find_element(By.NAME, 'password').send_keys(password)
-            driver.find_element(By.XPATH, "//button[@name='login']").click()
+            self._open_page(driver, url, username, password)
 
             # Navigate to CSMS page
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/CSMS']")))
+            TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/CSMS']")))
             csms_link = driver.find_element(By.XPATH, "//a[@href='/CSMS']")
             csms_link.click()
             logging.info(f"Navigated to the CSMS page for OCPP ID allocation.")
 
             # Set the OCPP ID (Charger Identity)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, 'Identity')))
+            TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, 'Identity')))
             identity_input = driver.find_element(By.ID, 'Identity')
             identity_input.clear()
             identity_input.send_keys(ray_id_last_9)
@@ -230,10 +774,12 @@ class BackendConnector:
 
         except Exception as e:
             logging.error(f"An error occurred during OCPP ID allocation: {str(e)}")
+            self.resilience.report(e)
+            failed = True
             return f"An error occurred: {str(e)}"
 
         finally:
-            driver.quit()
+            self._release_driver(driver, failed=failed)
 
     def generate_password(self):
         # Generate 4 random alphabets
@@ -253,30 +799,30 @@ class BackendConnector:
     def change_password(self, driver, username, password):
         try:
             # Wait for the "Change Password" button to be present on the Security page
-            change_password_button = WebDriverWait(driver, 10).until(
+            change_password_button = TracedWebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.XPATH, f"//input[@name='{username}-Change']"))
             )
             change_password_button.click()
 
             # Wait for the pop-up to appear
-            popup = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'popup')))
+            popup = TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'popup')))
 
             # Locate and input the new password
-            password_input = WebDriverWait(driver, 10).until(
+            password_input = TracedWebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.NAME, 'password1'))
             )
             password_input.clear()
             password_input.send_keys(password)
 
             # Locate and confirm the new password
-            confirm_password_input = WebDriverWait(driver, 10).until(
+            confirm_password_input = TracedWebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.NAME, 'password2'))
             )
             confirm_password_input.clear()
             confirm_password_input.send_keys(password)
 
             # Wait for the "Update" button inside the form
-            update_button = WebDriverWait(driver, 10).until(
+            update_button = TracedWebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.XPATH, '//input[@name="Update" and @type="submit"]'))
             )
             update_button.click()
@@ -286,26 +832,25 @@ class BackendConnector:
             logging.error(f"An error occurred during password change for {username}: {str(e)}")
             raise
 
+    @traced_step
+    @resilient_step(lambda message: {"error": message})
     def change_passwords(self, username, password):
         if self.ip_address is None:
             logging.error("IP address is not set. Connect to the backend first.")
             return {"error": "IP address is not set. Connect to the backend first."}
 
-        url = f"https://{self.ip_address}/Security"
-        driver = self.web_driver_manager.initialize_driver(headless=True)
+        url = f"{self.scheme}://{self.ip_address}/Security"
+        driver = self._lease_driver(self.ip_address, username, password)
         if driver is None:
             logging.error("Failed to initialize WebDriver.")
             return {"error": "Failed to initialize WebDriver."}
 
+        failed = False
         try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, 'username')))
-            driver.find_element(By.NAME, 'username').send_keys(username)
-            driver.find_element(By.NAME, 'password').send_keys(password)
-            driver.find_element(By.XPATH, "//button[@name='login']").click()
+            self._open_page(driver, url, username, password)
 
             # Navigate to Security page
-            security_link = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/Security']")))
+            security_link = TracedWebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//a[@href='/Security']")))
             security_link.click()
 
             # Define passwords
@@ -328,6 +873,8 @@ class BackendConnector:
 
         except Exception as e:
             logging.error(f"An error occurred during password updates: {str(e)}")
+            self.resilience.report(e)
+            failed = True
             return {"error": str(e)}
         finally:
-            driver.quit()
\ No newline at end of file
+            self._release_driver(driver, failed=failed)
\ No newline at end of file
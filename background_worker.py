@@ -0,0 +1,178 @@
+# background_worker.py
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class BackendJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, key, fn, args, kwargs, timeout, on_done, name):
+        self.job_id = next(self._ids)
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.on_done = on_done
+        self.name = name or getattr(fn, "__name__", "job")
+        self.started_at = None
+        self.finished = False
+        self.cancelled = False
+        self.timed_out = False
+
+    def __repr__(self):
+        return f"BackendJob({self.job_id}, {self.name!r})"
+
+
+class BackendWorker:
+    # Runs BackendConnector calls on a thread pool so Tk callbacks never block.
+    # Jobs sharing a key (one charger) run strictly one after another, results come back through a queue
+    # that the Tk loop drains with drain()/attach(), so every on_done callback runs on the Tk thread.
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backend-worker")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = {}   # key -> deque of jobs queued behind the running one
+        self._running = {}   # key -> running job
+        self._root = None
+        self._drain_interval_ms = 50
+        self._shutdown = False
+
+    def submit(self, key, fn, *args, timeout=None, on_done=None, name=None, skip_if_busy=False, **kwargs):
+        job = BackendJob(key, fn, args, kwargs, timeout, on_done, name)
+        with self._lock:
+            if self._shutdown:
+                return None
+            if key in self._running:
+                if skip_if_busy:
+                    return None
+                self._waiting.setdefault(key, deque()).append(job)
+                return job
+            self._running[key] = job
+        self._start(job)
+        return job
+
+    def is_busy(self, key):
+        with self._lock:
+            return key in self._running or bool(self._waiting.get(key))
+
+    def cancel(self, job):
+        # Queued jobs never start, a running job keeps its thread but its result is dropped
+        with self._lock:
+            if job.finished or job.cancelled:
+                return False
+            job.cancelled = True
+            waiting = self._waiting.get(job.key)
+            queued = waiting is not None and job in waiting
+            if queued:
+                waiting.remove(job)
+        self._results.put((job, None, JobCancelled(f"{job.name} was cancelled.")))
+        return True
+
+    def cancel_key(self, key):
+        with self._lock:
+            jobs = list(self._waiting.get(key, ())) + ([self._running[key]] if key in self._running else [])
+        for job in jobs:
+            self.cancel(job)
+
+    def drain(self):
+        self._check_timeouts()
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job.on_done is None:
+                continue
+            try:
+                job.on_done(result, error)
+            except Exception as e:
+                logging.error(f"Result callback for {job.name} failed: {str(e)}")
+
+    def attach(self, root, interval_ms=50):
+        # Drain results from the Tk event loop
+        self._root = root
+        self._drain_interval_ms = interval_ms
+        self._root.after(self._drain_interval_ms, self._drain_from_tk)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            self._shutdown = True
+            waiting = [job for jobs in self._waiting.values() for job in jobs]
+            self._waiting.clear()
+        for job in waiting:
+            job.cancelled = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _drain_from_tk(self):
+        if self._shutdown:
+            return
+        self.drain()
+        self._root.after(self._drain_interval_ms, self._drain_from_tk)
+
+    def _start(self, job):
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError:
+            # Executor already shut down
+            with self._lock:
+                self._running.pop(job.key, None)
+
+    def _run(self, job):
+        job.started_at = time.monotonic()
+        result, error = None, None
+        try:
+            if not job.cancelled:
+                result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            logging.error(f"Background job {job.name} failed: {str(e)}")
+            error = e
+        finally:
+            self._finish(job, result, error)
+
+    def _finish(self, job, result, error):
+        with self._lock:
+            job.finished = True
+            deliver = not job.cancelled and not job.timed_out
+            # The charger is only free once the thread has really returned, even after a timeout
+            self._running.pop(job.key, None)
+            next_job = None
+            waiting = self._waiting.get(job.key)
+            if waiting:
+                next_job = waiting.popleft()
+                if not waiting:
+                    del self._waiting[job.key]
+                self._running[job.key] = next_job
+        if deliver:
+            self._results.put((job, result, error))
+        elif job.timed_out:
+            logging.info(f"{job.name} finished after its timeout, result discarded.")
+        if next_job is not None:
+            self._start(next_job)
+
+    def _check_timeouts(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job for job in self._running.values()
+                       if job.timeout is not None and job.started_at is not None and not job.timed_out
+                       and not job.cancelled and now - job.started_at > job.timeout]
+            for job in expired:
+                job.timed_out = True
+        for job in expired:
+            logging.error(f"{job.name} timed out after {job.timeout}s.")
+            self._results.put((job, None, JobTimeout(f"{job.name} timed out after {job.timeout}s.")))
@@ -0,0 +1,147 @@
+# batch_provision.py
+
+import argparse
+import csv
+import ipaddress
+import json
+import logging
+import os
+import sys
+from urllib.parse import urlsplit
+from provisioning_pipeline import ProvisioningPipeline, Station
+from charger_discovery import ChargerRegistry, HostnameCache
+from config_index import ConfigIndex
+from provisioning_state import ProvisioningCheckpoints
+from run_ledger import RunLedger
+from browser_lifecycle import browser_lifecycle
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "1.3.7_Config.zip")
+
+
+def load_targets(path, username, password):
+    # CSV with a header (url required; name, username, password optional) or a JSON list of such objects/URLs
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+
+    stations = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        url = (entry.get("url") or entry.get("ip") or "").strip()
+        if not url:
+            logging.warning(f"Skipping target without a url: {entry}")
+            continue
+        stations.append(Station(
+            name=(entry.get("name") or url).strip(),
+            url=url,
+            username=entry.get("username") or username,
+            password=entry.get("password") or password,
+        ))
+    return stations
+
+
+def scan_subnet(subnet, scheme, username, password, deadline):
+    # Only hosts serving the charger login page with a "ray-..." hostname become stations, named by hostname
+    registry = ChargerRegistry([subnet], cache=HostnameCache("charger_hosts.json"), username=username,
+                               password=password, scheme=scheme, scan_deadline=deadline)
+    found = registry.scan()
+    return [Station(name=hostname, url=url, username=username, password=password)
+            for hostname, url in sorted(found.items(), key=lambda item: ipaddress.ip_address(urlsplit(item[1]).hostname))]
+
+
+class JsonLinesWriter:
+    # One line per finished step, flushed right away so a tail -f or the MES importer sees it immediately
+    def __init__(self, stream, include_started=False):
+        self.stream = stream
+        self.include_started = include_started
+
+    def __call__(self, event):
+        if event["status"] in ("started", "verifying") and not self.include_started:
+            return
+        if event["elapsed"] is not None:
+            event["elapsed"] = round(event["elapsed"], 3)
+        self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision chargers without the GUI and stream JSON-lines results.")
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--targets", help="CSV or JSON file listing the chargers (url, name, username, password)")
+    targets.add_argument("--subnet", help="Provision every charger found in this CIDR range, e.g. 192.168.1.0/24")
+    parser.add_argument("--scheme", default="https", choices=("https", "http"), help="Scheme used for --subnet")
+    parser.add_argument("--scan-deadline", type=float, default=15.0, help="Seconds allowed for the --subnet scan")
+    parser.add_argument("--username", default="Assembler", help="Default login for targets that do not set one")
+    parser.add_argument("--password", default="E2", help="Default password for targets that do not set one")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Configuration archive to upload")
+    parser.add_argument("--driver-path", default="./chromedriver.exe", help="Path to chromedriver")
+    parser.add_argument("--chrome-profile", default="lean", choices=("default", "lean"),
+                        help="Chrome options: 'lean' skips images, fonts and stylesheets and uses a temp profile")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chargers provisioned at the same time")
+    parser.add_argument("--max-browsers", type=int, default=None,
+                        help="Chrome instances allowed at once (default: --concurrency)")
+    parser.add_argument("--max-browser-mb", type=int, default=800,
+                        help="Recycle a browser once Chrome and chromedriver use more resident memory than this")
+    parser.add_argument("--recycle-after", type=int, default=500,
+                        help="Recycle a browser after this many page loads")
+    parser.add_argument("--separate-ocpp-step", action="store_true",
+                        help="Allocate the OCPP ID on the CSMS page instead of merging it into the uploaded config")
+    parser.add_argument("--output", default="-", help="JSON-lines output file, '-' for stdout")
+    parser.add_argument("--include-started", action="store_true", help="Also emit a line when each step starts")
+    parser.add_argument("--include-passwords", action="store_true",
+                        help="Put the generated passwords into each unit's final line")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore earlier checkpoints and run every step on every unit again")
+    parser.add_argument("--ledger", default="run_ledger.sqlite3", help="Run ledger database for shift reports")
+    parser.add_argument("--log-file", default="app.log", help="Where log messages go, stdout stays JSON only")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.targets:
+        stations = load_targets(args.targets, args.username, args.password)
+    else:
+        stations = scan_subnet(args.subnet, args.scheme, args.username, args.password, args.scan_deadline)
+    if not stations:
+        print("No chargers to provision.", file=sys.stderr)
+        return 2
+
+    browser_lifecycle.configure(max_browsers=args.max_browsers or args.concurrency, max_rss_mb=args.max_browser_mb,
+                                max_navigations=args.recycle_after)
+    browser_lifecycle.sweep_orphans()
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    ledger = RunLedger(args.ledger)
+    try:
+        pipeline = ProvisioningPipeline(
+            driver_path=args.driver_path,
+            config_file_path=args.config,
+            max_concurrency=args.concurrency,
+            on_event=JsonLinesWriter(output, include_started=args.include_started),
+            merge_ocpp_id=not args.separate_ocpp_step,
+            browser_profile=args.chrome_profile,
+            ledger=ledger,
+            # --no-resume uploads every config again instead of checking what the units already run
+            config_index=None if args.no_resume else ConfigIndex("config_index.sqlite3"),
+            emit_passwords=args.include_passwords,
+            # Units that stopped halfway in an earlier run pick up at their first incomplete step
+            checkpoints=None if args.no_resume else ProvisioningCheckpoints("provisioning_state.sqlite3"),
+        )
+        results = pipeline.run(stations)
+    finally:
+        browser_lifecycle.shutdown()
+        ledger.close()
+        if output is not sys.stdout:
+            output.close()
+
+    failed = [name for name, result in results.items() if not result.ok]
+    print(f"{len(results) - len(failed)}/{len(results)} charger(s) provisioned.", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# benchmark.py
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mock_charger import MockCharger
+from web_driver_manager import WebDriverManager
+from browser_lifecycle import browser_lifecycle, driver_pid, process_tree, rss_bytes
+from backend_connector import BackendConnector
+from instrumentation import percentile, tracer
+from resilience import ChargerResilience
+
+USERNAME = 'Assembler'
+PASSWORD = 'E2'
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "1.3.7_Config.zip")
+REBOOT_SECONDS = 5.0
+
+
+class NavigationRecorder:
+    # Every page_load span of one run; the tracer's own buffer is capped and would drop the early iterations
+    def __init__(self):
+        self.durations = []
+
+    def export(self, span):
+        if span.name == "page_load":
+            self.durations.append(span.duration)
+
+    def close(self):
+        pass
+
+
+def step_plan(use_browser):
+    # (step name, call, success check); the HTTP status read never needs Chrome
+    plan = [
+        ("connect_to_backend",
+         lambda connector, charger: connector.connect_to_backend([charger.url], USERNAME, PASSWORD),
+         lambda result: bool(result[0])),
+        ("get_evse_status[http]",
+         lambda connector, charger: connector.http_reader.read_evse_status(connector.ip_address, USERNAME, PASSWORD),
+         lambda result: bool(result)),
+    ]
+    if use_browser:
+        plan += [
+            ("get_evse_status[selenium]",
+             lambda connector, charger: connector.get_evse_status(USERNAME, PASSWORD),
+             lambda result: bool(result)),
+            ("upload_config_file",
+             lambda connector, charger: connector.upload_config_file(CONFIG_FILE, USERNAME, PASSWORD),
+             lambda result: "successfully" in result),
+            ("upload_config_file[merged ocpp id]",
+             lambda connector, charger: connector.upload_config_file(CONFIG_FILE, USERNAME, PASSWORD, merge_ocpp_id=True),
+             lambda result: "successfully" in result),
+            ("allocate_ocpp_id",
+             lambda connector, charger: connector.allocate_ocpp_id(USERNAME, PASSWORD),
+             lambda result: "successfully" in result),
+            ("change_passwords",
+             lambda connector, charger: connector.change_passwords(USERNAME, PASSWORD),
+             lambda result: "error" not in result),
+        ]
+    return plan
+
+
+def run_charger(charger, connector, plan, iterations):
+    samples = {name: [] for name, _, _ in plan}
+    failures = {name: 0 for name, _, _ in plan}
+    for name, call, check in plan:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                ok = check(call(connector, charger))
+            except Exception as e:
+                logging.error(f"{name} raised on {charger.url}: {str(e)}")
+                ok = False
+            samples[name].append(time.perf_counter() - started)
+            if not ok:
+                failures[name] += 1
+    return samples, failures
+
+
+def browser_memory(connectors):
+    # Resident memory per pooled browser (chromedriver, Chrome and its renderers), in MB
+    sizes = []
+    for connector in connectors:
+        for driver in connector.session_pool.drivers():
+            pid = driver_pid(driver)
+            size = rss_bytes(process_tree(pid)) if pid is not None else None
+            if size:
+                sizes.append(size / (1024 * 1024))
+    return sizes
+
+
+def run_benchmark(driver_path, chargers=1, iterations=10, latency=0.0, failure_rate=0.0, use_browser=True,
+                  headless=True, profile="default", reboot_seconds=REBOOT_SECONDS, max_browsers=None):
+    # The mocks go down for reboot_seconds after an import like a real unit; one that never reboots would make
+    # every upload sit out the connector's whole reboot grace instead
+    mocks = [MockCharger(hostname=f"ray-0212600973812{i:05d}", latency=latency, failure_rate=failure_rate,
+                         reboot_seconds=reboot_seconds).start()
+             for i in range(chargers)]
+    # Each charger holds one pooled browser at a time and the probe is quit before the run, so one slot per charger
+    # keeps the browser budget from queueing launches and the report measures the chargers, not the wait for a slot
+    browser_lifecycle.configure(max_browsers=max_browsers or chargers)
+    connectors = []
+    browser_rss = []
+    navigations = NavigationRecorder()
+    tracer.add_exporter(navigations)
+    try:
+        if use_browser:
+            probe_manager = WebDriverManager(driver_path, profile=profile)
+            probe = probe_manager.create_driver(headless=headless)
+            if probe is None:
+                logging.warning("Chrome could not be started, running only the browser-free steps.")
+                use_browser = False
+            else:
+                probe_manager.quit(probe)
+
+        plan = step_plan(use_browser)
+        for _ in mocks:
+            manager = WebDriverManager(driver_path, profile=profile)
+            # Without Chrome, connect_to_backend has to take the HTTP path as well
+            # A breaker that never opens: with failure injection an open circuit would answer in ~1ms and those
+            # short-circuited calls would end up in the latency samples
+            connector = BackendConnector(manager, status_mode="selenium" if use_browser else "http", scheme="http",
+                                         resilience=ChargerResilience(failure_threshold=math.inf))
+            connector.session_pool.headless = headless
+            connectors.append(connector)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=chargers) as executor:
+            outcomes = list(executor.map(lambda pair: run_charger(pair[0], pair[1], plan, iterations),
+                                         zip(mocks, connectors)))
+        wall_time = time.perf_counter() - started
+        # Measured while the pooled browsers are still warm, after every step has run in them
+        browser_rss = browser_memory(connectors)
+    finally:
+        tracer.remove_exporter(navigations)
+        for connector in connectors:
+            connector.close()
+        for mock in mocks:
+            mock.stop()
+
+    return build_report([name for name, _, _ in plan], outcomes, chargers=chargers, iterations=iterations,
+                        latency=latency, failure_rate=failure_rate, profile=profile, wall_time=wall_time,
+                        navigations=navigations.durations, browser_rss=browser_rss)
+
+
+def build_report(step_names, outcomes, chargers, iterations, latency, failure_rate, profile, wall_time,
+                 navigations, browser_rss):
+    # outcomes: one (samples, failures) pair per charger from run_charger(); navigations: every driver.get()
+    # of the run in seconds, from the page_load spans BackendConnector records
+    report = {"chargers": chargers, "iterations": iterations, "latency": latency, "failure_rate": failure_rate,
+              "profile": profile, "wall_time": wall_time, "steps": {},
+              "navigation": {"count": len(navigations), "p50": percentile(navigations, 0.50),
+                             "p95": percentile(navigations, 0.95)},
+              "browser_rss_mb": sum(browser_rss) / len(browser_rss) if browser_rss else None}
+    for name in step_names:
+        durations = [d for samples, _ in outcomes for d in samples[name]]
+        failures = sum(failed[name] for _, failed in outcomes)
+        total = sum(durations)
+        report["steps"][name] = {
+            "count": len(durations),
+            "failures": failures,
+            "p50": percentile(durations, 0.50),
+            "p95": percentile(durations, 0.95),
+            "mean": total / len(durations) if durations else None,
+            # Calls per second per charger times the number of chargers running in parallel
+            "throughput": len(durations) / total * chargers if total else None,
+        }
+    return report
+
+
+def format_report(report):
+    def ms(value):
+        return f"{value * 1000:.1f}" if value is not None else "-"
+
+    lines = [
+        f"{report['chargers']} charger(s) x {report['iterations']} iteration(s), {report['profile']} Chrome profile, "
+        f"injected latency {report['latency'] * 1000:.0f}ms, failure rate {report['failure_rate']:.0%}, "
+        f"wall time {report['wall_time']:.2f}s",
+        f"{'step':<36}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'ops/s':>10}{'fail':>6}",
+    ]
+    for name, step in report["steps"].items():
+        throughput = f"{step['throughput']:.2f}" if step["throughput"] is not None else "-"
+        lines.append(f"{name:<36}{ms(step['p50']):>10}{ms(step['p95']):>10}{ms(step['mean']):>10}"
+                     f"{throughput:>10}{step['failures']:>6}")
+    navigation = report["navigation"]
+    if navigation["count"]:
+        lines.append(f"{'page navigation':<36}{ms(navigation['p50']):>10}{ms(navigation['p95']):>10}"
+                     f"{'':>10}{'':>10}{'':>6}  ({navigation['count']} loads)")
+    if report["browser_rss_mb"] is not None:
+        lines.append(f"Resident memory per browser: {report['browser_rss_mb']:.0f} MB")
+    return "\n".join(lines)
+
+
+def format_comparison(baseline, lean):
+    # Lean profile against the default options, negative numbers are savings
+    def change(old, new):
+        if old is None or new is None or old == 0:
+            return "-"
+        return f"{(new - old) / old:+.0%}"
+
+    lines = [f"{'lean vs default':<36}{'p50':>10}{'p95':>10}"]
+    for name, step in baseline["steps"].items():
+        other = lean["steps"].get(name)
+        if other is not None:
+            lines.append(f"{name:<36}{change(step['p50'], other['p50']):>10}{change(step['p95'], other['p95']):>10}")
+    lines.append(f"{'page navigation':<36}{change(baseline['navigation']['p50'], lean['navigation']['p50']):>10}"
+                 f"{change(baseline['navigation']['p95'], lean['navigation']['p95']):>10}")
+    lines.append(f"Resident memory per browser: {change(baseline['browser_rss_mb'], lean['browser_rss_mb'])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every BackendConnector step against local mock chargers.")
+    parser.add_argument("--driver-path", default="./chromedriver.exe", help="Path to chromedriver")
+    parser.add_argument("--chargers", type=int, default=1, help="Mock chargers driven in parallel")
+    parser.add_argument("--iterations", type=int, default=10, help="Calls per step per charger")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every mock response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of mock requests answered with a 500")
+    parser.add_argument("--reboot-seconds", type=float, default=REBOOT_SECONDS,
+                        help="Mock web UI downtime after a config import")
+    parser.add_argument("--max-browsers", type=int, default=None,
+                        help="Chrome instances allowed at once (default: --chargers)")
+    parser.add_argument("--no-browser", action="store_true", help="Only run the steps that do not need Chrome")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chrome with a visible window")
+    parser.add_argument("--profile", default="default", choices=("default", "lean", "both"),
+                        help="Chrome profile to benchmark; 'both' runs default and lean and compares them")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--spans", help="Also write every instrumented span to this JSON-lines file")
+    args = parser.parse_args()
+
+    if args.spans:
+        tracer.add_jsonl_exporter(args.spans)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    profiles = ("default", "lean") if args.profile == "both" else (args.profile,)
+    reports = [run_benchmark(args.driver_path, chargers=args.chargers, iterations=args.iterations,
+                             latency=args.latency, failure_rate=args.failure_rate, use_browser=not args.no_browser,
+                             headless=not args.show_browser, profile=profile, reboot_seconds=args.reboot_seconds,
+                             max_browsers=args.max_browsers)
+               for profile in profiles]
+    if args.json:
+        print(json.dumps(reports[0] if len(reports) == 1 else reports, indent=2))
+    else:
+        print("\n\n".join(format_report(report) for report in reports))
+        if len(reports) == 2:
+            print()
+            print(format_comparison(*reports))
+    return 0 if all(step["failures"] == 0 for report in reports for step in report["steps"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+# browser_lifecycle.py
+
+import atexit
+import glob
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+# Added to every Chrome we start, so a sweep can tell our orphans apart from a browser someone opened by hand
+MARKER_ARGUMENT = "--egoev-managed-browser"
+PROFILE_DIR_PREFIX = "egoev-chrome-"
+MB = 1024 * 1024
+
+
+def processes_visible():
+    # Process trees can be walked with psutil anywhere, or through /proc on Linux
+    try:
+        import psutil  # noqa: F401
+        return True
+    except ImportError:
+        return os.path.isdir("/proc")
+
+
+def list_processes():
+    # {pid: (ppid, name, cmdline)}; psutil when installed, /proc otherwise (empty where neither works)
+    processes = {}
+    try:
+        import psutil
+        for proc in psutil.process_iter(["ppid", "name", "cmdline"]):
+            processes[proc.pid] = (proc.info["ppid"], proc.info["name"] or "", proc.info["cmdline"] or [])
+        return processes
+    except ImportError:
+        pass
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return processes
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii", errors="replace") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = [part.decode("utf-8", "replace") for part in f.read().split(b"\0") if part]
+            # The command name may contain spaces, the parent pid comes right after its closing ")"
+            name = stat[stat.index("(") + 1:stat.rindex(")")]
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        processes[int(entry)] = (ppid, name, cmdline)
+    return processes
+
+
+def process_tree(pid):
+    # pid plus all its descendants, empty when pid is gone (or cannot be seen here)
+    try:
+        import psutil
+        try:
+            root = psutil.Process(pid)
+            return [pid] + [child.pid for child in root.children(recursive=True)]
+        except psutil.Error:
+            return []
+    except ImportError:
+        pass
+    processes = list_processes()
+    if pid not in processes:
+        return []
+    children = {}
+    for child, (ppid, _, _) in processes.items():
+        children.setdefault(ppid, []).append(child)
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def rss_bytes(pids):
+    # Summed resident set size of the given processes, None when it cannot be measured here
+    try:
+        import psutil
+        total = 0
+        for pid in pids:
+            try:
+                total += psutil.Process(pid).memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    except ImportError:
+        pass
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm", encoding="ascii") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+def driver_pid(driver):
+    # chromedriver's pid; Chrome and its renderers are its descendants
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def process_name(pid):
+    # Name of a running process; None once it has exited, including zombies nobody has reaped yet
+    try:
+        import psutil
+        try:
+            process = psutil.Process(pid)
+            return None if process.status() == psutil.STATUS_ZOMBIE else process.name()
+        except psutil.Error:
+            return None
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii", errors="replace") as f:
+            stat = f.read()
+        return None if stat.rsplit(")", 1)[1].split()[0] == "Z" else stat[stat.index("(") + 1:stat.rindex(")")]
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def browser_processes(pids):
+    # The pids that are still running and still Chrome or chromedriver (a pid may have been reused since)
+    return [pid for pid in pids if pid != os.getpid() and "chrome" in (process_name(pid) or "").lower()]
+
+
+def kill_processes(pids):
+    try:
+        import psutil
+        errors = (OSError, psutil.Error)
+    except ImportError:
+        psutil = None
+        errors = (OSError,)
+    killed = 0
+    for pid in pids:
+        try:
+            if psutil is not None:
+                psutil.Process(pid).kill()
+            else:
+                os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            killed += 1
+        except errors:
+            pass
+    return killed
+
+
+class TrackedBrowser:
+    def __init__(self, pid, profile_dir=None):
+        self.pid = pid
+        self.pids = process_tree(pid) if pid is not None else []
+        self.profile_dir = profile_dir
+        self.started_at = time.monotonic()
+        self.navigations = 0
+        self.rss = None
+        self.recycle_reason = None
+
+
+class BrowserLifecycle:
+    # Every Chrome this process starts is accounted for here. A budget caps how many run at once, a watchdog
+    # measures each one's process tree and flags it for recycling once it grows past max_rss_mb, reaches
+    # max_navigations page loads or loses its chromedriver; SessionPool quits flagged drivers when they come back.
+    # sweep_orphans() kills marked browsers, and the chromedrivers running them, whose owning process is gone.
+
+    def __init__(self, max_browsers=6, max_rss_mb=800, max_navigations=500, watch_interval=30.0,
+                 acquire_timeout=120.0, quit_grace=2.0):
+        self.max_browsers = max_browsers
+        self.max_rss_mb = max_rss_mb
+        self.max_navigations = max_navigations
+        self.watch_interval = watch_interval
+        self.acquire_timeout = acquire_timeout
+        self.quit_grace = quit_grace  # Seconds Chrome gets to exit on its own after driver.quit()
+        self._running = 0
+        self._slots = threading.Condition()
+        self._tracked = {}  # id(driver) -> TrackedBrowser
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watchdog = None
+        self._exit_hook = False
+
+    def configure(self, max_browsers=None, max_rss_mb=None, max_navigations=None, watch_interval=None):
+        with self._slots:
+            if max_browsers is not None:
+                self.max_browsers = max(1, max_browsers)
+            if max_rss_mb is not None:
+                self.max_rss_mb = max_rss_mb
+            if max_navigations is not None:
+                self.max_navigations = max_navigations
+            if watch_interval is not None:
+                self.watch_interval = watch_interval
+            self._slots.notify_all()
+
+    def acquire(self, timeout=None):
+        # Take a browser slot before launching Chrome; False when none freed up within the timeout
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        with self._slots:
+            if self._running >= self.max_browsers:
+                logging.info(f"{self._running} browser(s) running, waiting for a free slot.")
+            while self._running >= self.max_browsers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._slots.wait(remaining)
+            self._running += 1
+            return True
+
+    def release(self):
+        with self._slots:
+            self._running = max(0, self._running - 1)
+            self._slots.notify()
+
+    def register(self, driver, profile_dir=None):
+        browser = TrackedBrowser(driver_pid(driver), profile_dir)
+        with self._lock:
+            self._tracked[id(driver)] = browser
+            if not self._exit_hook:
+                # Browsers nobody quit (a crashed job, an exception on the way out) must not outlive the process
+                atexit.register(self.shutdown)
+                self._exit_hook = True
+        self._start_watchdog()
+        return browser
+
+    def pids(self, driver):
+        # Current process tree of a tracked driver, plus anything the watchdog saw below it earlier
+        with self._lock:
+            browser = self._tracked.get(id(driver))
+        if browser is None or browser.pid is None:
+            return []
+        return sorted(set(browser.pids) | set(process_tree(browser.pid)))
+
+    def unregister(self, driver, pids=()):
+        # Call after driver.quit(): frees the slot and kills whatever part of the tree did not exit
+        with self._lock:
+            browser = self._tracked.pop(id(driver), None)
+        if browser is None:
+            return
+        self.release()
+        leftovers = browser_processes(set(pids) | set(browser.pids))
+        deadline = time.monotonic() + self.quit_grace
+        while leftovers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            leftovers = browser_processes(leftovers)
+        if leftovers:
+            logging.warning(f"Killing {len(leftovers)} browser process(es) left behind by driver.quit().")
+            kill_processes(leftovers)
+
+    def count_navigation(self, driver):
+        with self._lock:
+            browser = self._tracked.get(id(driver))
+            if browser is None:
+                return
+            browser.navigations += 1
+            if browser.navigations >= self.max_navigations and browser.recycle_reason is None:
+                browser.recycle_reason = f"{browser.navigations} page load(s)"
+
+    def recycle_reason(self, driver):
+        with self._lock:
+            browser = self._tracked.get(id(driver))
+            return browser.recycle_reason if browser is not None else None
+
+    def check(self):
+        # One watchdog pass over the tracked browsers
+        with self._lock:
+            browsers = [browser for browser in self._tracked.values() if browser.pid is not None]
+        for browser in browsers:
+            pids = process_tree(browser.pid)
+            if not pids:
+                # chromedriver died under a live session, the Chrome it started would run on unowned
+                leftovers = browser_processes(browser.pids)
+                if leftovers:
+                    logging.warning(f"chromedriver {browser.pid} exited, killing {len(leftovers)} orphaned process(es).")
+                    kill_processes(leftovers)
+                self._flag(browser, "chromedriver exited")
+                browser.pids = []
+                continue
+            browser.pids = pids
+            browser.rss = rss_bytes(pids)
+            if browser.rss is not None and browser.rss > self.max_rss_mb * MB:
+                self._flag(browser, f"{browser.rss / MB:.0f} MB resident")
+
+    def stats(self):
+        with self._lock:
+            browsers = list(self._tracked.values())
+        sizes = [browser.rss for browser in browsers if browser.rss is not None]
+        return {
+            "running": self._running,
+            "max_browsers": self.max_browsers,
+            "rss_mb": [round(size / MB, 1) for size in sizes],
+            "total_rss_mb": round(sum(sizes) / MB, 1) if sizes else None,
+            "navigations": [browser.navigations for browser in browsers],
+        }
+
+    def sweep_orphans(self):
+        # Kill marked Chrome instances and chromedrivers whose parent is gone, then drop their stale profiles.
+        # A chromedriver only counts as ours while it runs a marked Chrome; other tools' drivers are left alone.
+        # Returns how many processes were killed.
+        if not processes_visible():
+            return 0
+        processes = list_processes()
+        with self._lock:
+            own = {pid for browser in self._tracked.values() for pid in browser.pids}
+        children = {}
+        for pid, (ppid, _, _) in processes.items():
+            children.setdefault(ppid, []).append(pid)
+        orphans = set()
+        live_profiles = set()
+        for pid, (ppid, name, cmdline) in processes.items():
+            if pid in own or pid == os.getpid():
+                continue
+            marked = MARKER_ARGUMENT in cmdline
+            if marked:
+                live_profiles.update(arg.split("=", 1)[1] for arg in cmdline if arg.startswith("--user-data-dir="))
+            if not marked and not (name.lower().startswith("chromedriver") and
+                                   any(MARKER_ARGUMENT in processes[child][2] for child in children.get(pid, ()))):
+                continue
+            parent = processes.get(ppid)
+            # Orphans are re-parented to init on Linux; on Windows their parent pid just no longer exists
+            owned = parent is not None and (ppid != 1 or os.getpid() == 1)
+            if marked:
+                owned = owned and parent[1].lower().startswith("chromedriver")
+            if not owned:
+                orphans.update(process_tree(pid) or [pid])
+        killed = 0
+        if orphans:
+            killed = kill_processes(browser_processes(orphans))
+            logging.warning(f"Killed {killed} orphaned Chrome/chromedriver process(es) from an earlier run.")
+        self._remove_stale_profiles(live_profiles)
+        return killed
+
+    def shutdown(self):
+        # Stop the watchdog, kill browsers nobody quit and sweep orphans; safe to call more than once
+        self._stopped.set()
+        with self._lock:
+            browsers = list(self._tracked.values())
+            self._tracked.clear()
+        pids = set()
+        for browser in browsers:
+            pids.update(browser.pids)
+            if browser.pid is not None:
+                pids.update(process_tree(browser.pid))
+        leftovers = browser_processes(pids)
+        if leftovers:
+            logging.warning(f"Killing {len(leftovers)} process(es) of {len(browsers)} browser(s) that were never quit.")
+            kill_processes(leftovers)
+        for browser in browsers:
+            if browser.profile_dir is not None:
+                shutil.rmtree(browser.profile_dir, ignore_errors=True)
+        with self._slots:
+            self._running = max(0, self._running - len(browsers))
+            self._slots.notify_all()
+        self.sweep_orphans()
+
+    def _flag(self, browser, reason):
+        with self._lock:
+            if browser.recycle_reason is None:
+                browser.recycle_reason = reason
+                logging.info(f"Browser {browser.pid} will be recycled: {reason}.")
+
+    def _remove_stale_profiles(self, live_profiles, min_age=600):
+        # Lean temp profiles of browsers that are gone; young ones may belong to a Chrome that is still starting
+        now = time.time()
+        for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{PROFILE_DIR_PREFIX}*")):
+            try:
+                if path in live_profiles or now - os.path.getmtime(path) < min_age:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is not None or self._stopped.is_set() or not processes_visible():
+                return
+            self._watchdog = threading.Thread(target=self._watch_loop, name="browser-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def _watch_loop(self):
+        while not self._stopped.wait(self.watch_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Browser watchdog pass failed: {str(e)}")
+
+
+# Process-wide, every WebDriverManager draws from the same budget
+browser_lifecycle = BrowserLifecycle()
@@ -0,0 +1,306 @@
+# charger_discovery.py
+
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import re
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from http_status_reader import HttpStatusReader, charger_ssl_context
+
+# The EGO login page is the only thing every charger serves at "/" before authentication
+LOGIN_PAGE_FINGERPRINT = (
+    re.compile(rb"name\s*=\s*[\"']?username", re.IGNORECASE),
+    re.compile(rb"name\s*=\s*[\"']?password", re.IGNORECASE),
+    re.compile(rb"name\s*=\s*[\"']?login", re.IGNORECASE),
+)
+REDIRECT_LOCATION = re.compile(rb"^location:\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+class DiscoveredCharger:
+    def __init__(self, url, host, port, latency):
+        self.url = url
+        self.host = host
+        self.port = port
+        self.latency = latency  # Seconds for the TCP (and TLS) handshake
+
+    def __repr__(self):
+        return f"DiscoveredCharger({self.url!r}, latency={self.latency * 1000:.1f}ms)"
+
+
+class ChargerDiscovery:
+    def __init__(self, connect_timeout=2.0, deadline=5.0, max_page_bytes=65536, max_concurrency=256):
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline  # Hard ceiling for a whole discover() call
+        self.max_concurrency = max_concurrency  # Open probes at once, a /16 sweep must not exhaust sockets
+        self.max_page_bytes = max_page_bytes
+        self._ssl_context = charger_ssl_context()
+
+    def discover(self, candidates, first_only=False):
+        # Probe every candidate URL (or bare IP) at once and return the live chargers ranked by latency
+        try:
+            return asyncio.run(self.discover_async(candidates, first_only=first_only))
+        except Exception as e:
+            logging.error(f"Charger discovery failed: {str(e)}")
+            return []
+
+    async def discover_async(self, candidates, first_only=False):
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._bounded_probe(semaphore, candidate)) for candidate in candidates]
+        found = []
+        pending = set(tasks)
+        timed_out = False
+        try:
+            while pending:
+                remaining = self.deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    charger = task.result()
+                    if charger is not None:
+                        found.append(charger)
+                if first_only and found:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        found.sort(key=lambda charger: charger.latency)
+        if timed_out:
+            logging.warning(f"Charger discovery deadline of {self.deadline}s hit with {len(pending)} probe(s) still running.")
+        logging.info(f"Charger discovery finished in {time.monotonic() - started:.2f}s: {found}")
+        return found[:1] if first_only else found
+
+    async def _bounded_probe(self, semaphore, candidate):
+        async with semaphore:
+            return await self.probe(candidate)
+
+    async def probe(self, candidate):
+        url, host, port, use_tls = self._parse_candidate(candidate)
+        try:
+            started = time.monotonic()
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self._ssl_context if use_tls else None),
+                timeout=self.connect_timeout,
+            )
+            latency = time.monotonic() - started
+        except (OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+            logging.info(f"{url} is not reachable: {str(e) or type(e).__name__}")
+            return None
+
+        try:
+            page = await asyncio.wait_for(self._fetch(reader, writer, host, "/"), timeout=self.connect_timeout)
+            # Follow one redirect, some firmwares bounce "/" to a dedicated login path
+            location = REDIRECT_LOCATION.search(page.split(b"\r\n\r\n", 1)[0])
+            if location and not self._is_login_page(page):
+                path = urlsplit(location.group(1).decode("latin-1")).path or "/"
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port, ssl=self._ssl_context if use_tls else None),
+                    timeout=self.connect_timeout,
+                )
+                page = await asyncio.wait_for(self._fetch(reader, writer, host, path), timeout=self.connect_timeout)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+            logging.info(f"{url} accepted a connection but did not serve a page: {str(e) or type(e).__name__}")
+            return None
+
+        if not self._is_login_page(page):
+            logging.info(f"{url} is live but does not look like an EGO charger login page.")
+            return None
+        return DiscoveredCharger(url, host, port, latency)
+
+    async def _fetch(self, reader, writer, host, path):
+        try:
+            writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("ascii"))
+            await writer.drain()
+            page = b""
+            while len(page) < self.max_page_bytes:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    break
+                page += chunk
+                if self._is_login_page(page):
+                    break
+            return page
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+    def _is_login_page(self, page):
+        return all(marker.search(page) for marker in LOGIN_PAGE_FINGERPRINT)
+
+    def _parse_candidate(self, candidate):
+        if "//" not in candidate:
+            candidate = f"https://{candidate}"
+        parts = urlsplit(candidate)
+        use_tls = parts.scheme != "http"
+        port = parts.port or (443 if use_tls else 80)
+        return candidate, parts.hostname, port, use_tls
+
+
+class HostnameCache:
+    # Hostname -> last known URL, persisted as JSON so a restart does not need a new sweep.
+    # Entries older than ttl are still returned (the DHCP lease rarely changes) but reported as stale.
+
+    def __init__(self, path="charger_hosts.json", ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def get(self, hostname):
+        with self._lock:
+            entry = self._entries.get(hostname)
+            return dict(entry) if entry else None
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry["seen_at"] <= self.ttl
+
+    def put(self, hostname, url):
+        with self._lock:
+            # A charger that moved to another IP takes its old address out of the map
+            for other, entry in list(self._entries.items()):
+                if entry["url"] == url and other != hostname:
+                    del self._entries[other]
+            self._entries[hostname] = {"url": url, "seen_at": time.time()}
+            self._save()
+
+    def forget(self, hostname):
+        with self._lock:
+            if self._entries.pop(hostname, None) is not None:
+                self._save()
+
+    def urls(self):
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry["seen_at"], reverse=True)
+            return [entry["url"] for entry in entries]
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable hostname cache {self.path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to write hostname cache {self.path}: {str(e)}")
+
+
+class ChargerRegistry:
+    # Sweeps CIDR ranges for EGO chargers and keeps the hostname -> URL map in a HostnameCache.
+    # A charger counts as EGO when it serves the login page and its Info page reports a "ray-..." hostname.
+
+    def __init__(self, ranges, cache=None, username='Assembler', password='E2', scheme="https",
+                 hostname_prefix="ray-", scan_deadline=30.0, max_concurrency=256, identify_workers=16):
+        self.ranges = list(ranges)
+        self.cache = cache or HostnameCache()
+        self.username = username
+        self.password = password
+        self.scheme = scheme
+        self.hostname_prefix = hostname_prefix
+        self.identify_workers = identify_workers
+        self.discovery = ChargerDiscovery(deadline=scan_deadline, max_concurrency=max_concurrency)
+        self.http_reader = HttpStatusReader(scheme=scheme)
+        self._scan_lock = threading.Lock()
+        self._refresh_thread = None
+        self._stopped = threading.Event()
+
+    def candidates(self):
+        urls = []
+        for cidr in self.ranges:
+            network = ipaddress.ip_network(cidr, strict=False)
+            urls.extend(f"{self.scheme}://{host}" for host in network.hosts())
+        return urls
+
+    def scan(self):
+        # Full sweep; returns {hostname: url} for every charger found and stores them in the cache
+        with self._scan_lock:
+            started = time.monotonic()
+            live_chargers = self.discovery.discover(self.candidates())
+            with ThreadPoolExecutor(max_workers=self.identify_workers, thread_name_prefix="identify") as executor:
+                hostnames = list(executor.map(lambda charger: self.identify(charger.url), live_chargers))
+
+            found = {}
+            for charger, hostname in zip(live_chargers, hostnames):
+                if hostname is not None:
+                    found[hostname] = charger.url
+                    self.cache.put(hostname, charger.url)
+            logging.info(f"Subnet scan of {self.ranges} found {len(found)} charger(s) in {time.monotonic() - started:.2f}s.")
+            return found
+
+    def identify(self, url):
+        # Hostname from the Info page, or None when the login page belongs to something else
+        try:
+            _, _, hostname = self.http_reader.read_info(url.split("//")[1], self.username, self.password)
+        except Exception as e:
+            logging.info(f"Could not read the Info page on {url}: {str(e)}")
+            return None
+        finally:
+            self.http_reader.forget(url.split("//")[1])
+        if not hostname or not hostname.startswith(self.hostname_prefix):
+            logging.info(f"{url} reports hostname {hostname!r}, not an EGO charger.")
+            return None
+        return hostname
+
+    def resolve(self, hostname, scan_on_miss=True):
+        # Cache hit costs no network time; a stale hit is re-checked in the background
+        entry = self.cache.get(hostname)
+        if entry is not None:
+            if not self.cache.is_fresh(entry):
+                threading.Thread(target=self._refresh_entry, args=(hostname, entry["url"]),
+                                 name="hostname-refresh", daemon=True).start()
+            return entry["url"]
+        if not scan_on_miss:
+            return None
+        return self.scan().get(hostname)
+
+    def known_urls(self):
+        return self.cache.urls()
+
+    def start_background_refresh(self, interval=600):
+        if self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                                name="charger-scan", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_entry(self, hostname, url):
+        if self.identify(url) == hostname:
+            self.cache.put(hostname, url)
+            return
+        logging.info(f"{hostname} is no longer at {url}, rescanning.")
+        self.cache.forget(hostname)
+        if not self._scan_lock.locked():
+            self.scan()
+
+    def _refresh_loop(self, interval):
+        while not self._stopped.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                logging.error(f"Background charger scan failed: {str(e)}")
+            self._stopped.wait(interval)
@@ -0,0 +1,158 @@
+# config_builder.py
+
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+OCPP_CONFIG_ENTRY = "OCPPConfig.json"
+OCPP_INFO_ENTRIES = ("OCPPInfo.json", "OCPPInfoBackup.json")  # The backup is kept in step so a restore keeps the ID
+REQUIRED_ENTRIES = ("OCPPConfig.json", "OCPPInfo.json", "config.json")
+REQUIRED_OCPP_INFO_KEYS = ("identity", "serveraddr", "vendor", "model")
+MAX_IDENTITY_LENGTH = 48  # OCPP charge point identity limit
+
+
+class ConfigSchemaError(Exception):
+    pass
+
+
+def ocpp_identity_from_hostname(hostname):
+    # The OCPP ID is the last 9 digits of the charger hostname, e.g. ray-021260097381201829 -> 381201829
+    return hostname[-9:]
+
+
+class ConfigBuilder:
+    # Reads the template config archive once and produces per-unit copies with the OCPP identity merged in
+
+    def __init__(self, template_path):
+        self.template_path = os.path.abspath(template_path)
+        self._entries = []  # (ZipInfo, bytes) in archive order
+        with zipfile.ZipFile(self.template_path) as archive:
+            for info in archive.infolist():
+                self._entries.append((info, archive.read(info)))
+        self._validate_template()
+        logging.info(f"Loaded configuration template {self.template_path} ({len(self._entries)} entries).")
+
+    def build(self, identity):
+        # Return the patched archive as bytes
+        self._validate_identity(identity)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info, data in self._entries:
+                if info.filename == OCPP_CONFIG_ENTRY:
+                    data = self._dump(self._patch_ocpp_config(self._load(info.filename, data), identity))
+                elif info.filename in OCPP_INFO_ENTRIES:
+                    data = self._dump(self._patch_ocpp_info(self._load(info.filename, data), identity))
+                archive.writestr(info, data)
+        return buffer.getvalue()
+
+    def build_file(self, identity, data=None):
+        # Browsers upload from disk, so write the archive under its template name in a private temp dir
+        if data is None:
+            data = self.build(identity)
+        directory = tempfile.mkdtemp(prefix=f"config-{identity}-")
+        path = os.path.join(directory, os.path.basename(self.template_path))
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    @staticmethod
+    def remove_file(path):
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def _validate_template(self):
+        names = [info.filename for info, _ in self._entries]
+        missing = [name for name in REQUIRED_ENTRIES if name not in names]
+        if missing:
+            raise ConfigSchemaError(f"Template {self.template_path} is missing {', '.join(missing)}.")
+        for info, data in self._entries:
+            if info.filename.endswith(".json"):
+                document = self._load(info.filename, data)
+                if info.filename == OCPP_CONFIG_ENTRY:
+                    self._identity_variable(document)
+                elif info.filename in OCPP_INFO_ENTRIES:
+                    self._check_ocpp_info(document, info.filename)
+
+    def _validate_identity(self, identity):
+        if not isinstance(identity, str) or not identity:
+            raise ConfigSchemaError("OCPP identity must be a non-empty string.")
+        if len(identity) > MAX_IDENTITY_LENGTH:
+            raise ConfigSchemaError(f"OCPP identity {identity!r} is longer than {MAX_IDENTITY_LENGTH} characters.")
+        if not identity.isascii() or not identity.isprintable() or any(c.isspace() for c in identity):
+            raise ConfigSchemaError(f"OCPP identity {identity!r} contains characters that are not allowed.")
+
+    def _patch_ocpp_config(self, document, identity):
+        variable = self._identity_variable(document)
+        variable["instances"][0]["values"][0]["value"] = identity
+        return document
+
+    def _patch_ocpp_info(self, document, identity):
+        document["identity"] = identity
+        return document
+
+    def _identity_variable(self, document):
+        if not isinstance(document, dict) or not isinstance(document.get("TierModel"), dict):
+            raise ConfigSchemaError(f"{OCPP_CONFIG_ENTRY} has no TierModel.")
+
+        matches = []
+        try:
+            for version in document["TierModel"]["configuration"]["versions"]:
+                for component in version["components"]:
+                    for instance in component["instances"]:
+                        for variable in instance["variables"]:
+                            if variable.get("variableName") == "Identity":
+                                matches.append(variable)
+        except (KeyError, TypeError) as e:
+            raise ConfigSchemaError(f"{OCPP_CONFIG_ENTRY} does not match the expected TierModel layout: {str(e)}")
+
+        if len(matches) != 1:
+            raise ConfigSchemaError(f"{OCPP_CONFIG_ENTRY} must define exactly one Identity variable, found {len(matches)}.")
+        variable = matches[0]
+        try:
+            if not isinstance(variable["instances"][0]["values"][0]["value"], str):
+                raise ConfigSchemaError(f"{OCPP_CONFIG_ENTRY} Identity value is not a string.")
+        except (KeyError, IndexError, TypeError):
+            raise ConfigSchemaError(f"{OCPP_CONFIG_ENTRY} Identity variable has no value slot.")
+        return variable
+
+    def _check_ocpp_info(self, document, name):
+        if not isinstance(document, dict):
+            raise ConfigSchemaError(f"{name} is not a JSON object.")
+        missing = [key for key in REQUIRED_OCPP_INFO_KEYS if key not in document]
+        if missing:
+            raise ConfigSchemaError(f"{name} is missing {', '.join(missing)}.")
+        not_strings = [key for key, value in document.items() if not isinstance(value, str)]
+        if not_strings:
+            raise ConfigSchemaError(f"{name} has non-string values for {', '.join(not_strings)}.")
+
+    def _load(self, name, data):
+        try:
+            return json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ConfigSchemaError(f"{name} is not valid JSON: {str(e)}")
+
+    def _dump(self, document):
+        # The charger exports these files as compact JSON, keep them that way
+        return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+_builders = {}
+_builders_lock = threading.Lock()
+
+
+def get_config_builder(template_path):
+    # One cached builder per template file, rebuilt only when the file changes on disk
+    template_path = os.path.abspath(template_path)
+    key = (template_path, os.path.getmtime(template_path))
+    with _builders_lock:
+        builder = _builders.get(key)
+        if builder is None:
+            builder = ConfigBuilder(template_path)
+            for stale in [k for k in _builders if k[0] == template_path]:
+                del _builders[stale]
+            _builders[key] = builder
+        return builder
@@ -0,0 +1,96 @@
+# config_index.py
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from sqlite_store import sqlite_connection
+
+# Keys the charger rewrites on every export or that differ per unit, they never count as a config change
+VOLATILE_KEYS = {
+    "config.json": ("ExportDate", "ExportHost", "Network"),
+    "OCPPConfig.json": ("BootReason",),
+    "OCPPInfo.json": ("identity",),
+    "OCPPInfoBackup.json": ("identity",),
+}
+
+
+def config_fingerprint(archive_bytes):
+    # Content hash of a config archive that ignores volatile keys and the OCPP identity, plus that identity
+    digest = hashlib.sha256()
+    identity = None
+    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+        for name in sorted(archive.namelist()):
+            data = archive.read(name)
+            if name.endswith(".json"):
+                document = json.loads(data.decode("utf-8"))
+                if isinstance(document, dict):
+                    if name == "OCPPInfo.json":
+                        identity = document.get("identity")
+                    for key in VOLATILE_KEYS.get(name, ()):
+                        document.pop(key, None)
+                data = json.dumps(_strip_identity(document) if name == "OCPPConfig.json" else document,
+                                  sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            digest.update(name.encode("utf-8") + b"\0" + data + b"\0")
+    return digest.hexdigest(), identity
+
+
+def _strip_identity(document):
+    # Blank the Identity variable wherever it sits in the OCPPConfig TierModel
+    if isinstance(document, dict):
+        if document.get("variableName") == "Identity":
+            return {key: value for key, value in document.items() if key != "instances"}
+        return {key: _strip_identity(value) for key, value in document.items()}
+    if isinstance(document, list):
+        return [_strip_identity(value) for value in document]
+    return document
+
+
+class ConfigIndex:
+    # Remembers, per charger hostname, which configuration was last applied and when
+
+    def __init__(self, path="config_index.sqlite3"):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        with sqlite_connection(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS applied_configs ("
+                " hostname TEXT PRIMARY KEY,"
+                " config_hash TEXT NOT NULL,"
+                " ocpp_id TEXT,"
+                " template TEXT,"
+                " applied_at REAL NOT NULL)"
+            )
+
+    def lookup(self, hostname):
+        with self._lock, sqlite_connection(self.path) as connection:
+            row = connection.execute(
+                "SELECT hostname, config_hash, ocpp_id, template, applied_at FROM applied_configs WHERE hostname = ?",
+                (hostname,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"hostname": row[0], "config_hash": row[1], "ocpp_id": row[2], "template": row[3], "applied_at": row[4]}
+
+    def is_applied(self, hostname, config_hash, ocpp_id=None):
+        entry = self.lookup(hostname)
+        if entry is None or entry["config_hash"] != config_hash:
+            return False
+        return ocpp_id is None or entry["ocpp_id"] == ocpp_id
+
+    def record(self, hostname, config_hash, ocpp_id=None, template=None):
+        with self._lock, sqlite_connection(self.path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO applied_configs (hostname, config_hash, ocpp_id, template, applied_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (hostname, config_hash, ocpp_id, template, time.time()),
+            )
+        logging.info(f"Recorded configuration {config_hash[:12]} for {hostname}.")
+
+    def forget(self, hostname):
+        with self._lock, sqlite_connection(self.path) as connection:
+            connection.execute("DELETE FROM applied_configs WHERE hostname = ?", (hostname,))
@@ -0,0 +1,275 @@
+# dashboard_grid.py
+
+import argparse
+import logging
+import math
+import queue
+import sys
+import time
+import tkinter as tk
+from collections import deque
+from page_extractor import EVSE_STATUS_FIELDS
+from telemetry import NUMBER
+
+# Status feed messages are applied once per frame, however many arrived in between
+FRAME_MS = 100
+# The history strips scroll on this tick even when no new sample came in
+SCROLL_MS = 5000
+HISTORY_SECONDS = 600
+HISTORY_POINTS = 240
+STRIP_WIDTH = 168
+STRIP_HEIGHT = 34
+TILE_FONT = ("Helvetica", 9)
+
+STATUS_COLORS = {
+    "preparing": "pink",
+    "suspendedev": "gray",
+    "charging": "blue",
+    "available": "green",
+}
+# Series drawn in each tile's history strip, with their line colors
+HISTORY_FIELDS = {"AC Voltage": "yellow", "Temperature": "orange"}
+
+
+def reading(value):
+    # '224V' -> 224.0, None when the charger printed no number
+    match = NUMBER.search(str(value or ""))
+    return float(match.group()) if match else None
+
+
+class ChargerTile:
+    # One charger on the grid: a label per EVSE field and a strip with recent voltage and temperature.
+    # Labels are only reconfigured when their text or color actually changes.
+
+    def __init__(self, parent, key):
+        self.key = key
+        self.status = {}
+        self.seq = -1
+        self.reachable = None
+        self.shown = {}  # widget name -> (text, color) currently on screen
+        self.history = {field: deque(maxlen=HISTORY_POINTS) for field in HISTORY_FIELDS}
+
+        self.frame = tk.Frame(parent, bg="black", padx=4, pady=3, highlightthickness=1, highlightbackground="gray25")
+        self.title = tk.Label(self.frame, text=key, font=TILE_FONT + ("bold",), bg="black", fg="white", anchor="w")
+        self.title.pack(fill=tk.X)
+        self.labels = {}
+        for field in EVSE_STATUS_FIELDS:
+            label = tk.Label(self.frame, text="", font=TILE_FONT, bg="black", fg="white", anchor="w")
+            label.pack(fill=tk.X)
+            self.labels[field] = label
+        self.strip = tk.Canvas(self.frame, width=STRIP_WIDTH, height=STRIP_HEIGHT, bg="gray10", highlightthickness=0)
+        self.strip.pack(pady=(3, 0))
+        # Created once and moved with coords(), never deleted and redrawn
+        self.lines = {field: self.strip.create_line(0, 0, 0, 0, fill=color, state=tk.HIDDEN)
+                      for field, color in HISTORY_FIELDS.items()}
+
+    def seed(self, telemetry, now):
+        # Start the strip from what the TelemetryStore already has for this charger
+        for field in HISTORY_FIELDS:
+            for timestamp, value in telemetry.series(self.key, field, since=now - HISTORY_SECONDS)[-HISTORY_POINTS:]:
+                if not math.isnan(value):
+                    self.history[field].append((timestamp, value))
+
+    def apply(self, changes, reachable, seq, timestamp, snapshot=False):
+        # Returns True when a history series got a new sample. A snapshot replaces the state (the broadcaster
+        # may have restarted and counts from 0 again), a delta only applies if it is newer than what is shown.
+        if not snapshot and seq <= self.seq:
+            return False
+        self.seq = seq
+        if snapshot:
+            self.status = dict(changes)
+        else:
+            self.status.update(changes)
+        self.reachable = reachable
+        for field, label in self.labels.items():
+            if field in self.status and (snapshot or field in changes):
+                color = STATUS_COLORS.get(self.status[field], "white") if field == "Status" else "white"
+                self._set(field, label, f"{field}: {self.status[field]}", color)
+        self._set("title", self.title, self.key if reachable is not False else f"{self.key} (offline)",
+                  "white" if reachable is not False else "red")
+
+        sampled = False
+        for field, history in self.history.items():
+            value = reading(changes.get(field))
+            timestamp = timestamp or time.time()
+            if value is not None and reachable and (not history or timestamp > history[-1][0]):
+                history.append((timestamp, value))
+                sampled = True
+        return sampled
+
+    def draw_history(self, now):
+        since = now - HISTORY_SECONDS
+        for field, history in self.history.items():
+            points = [(timestamp, value) for timestamp, value in history if timestamp >= since]
+            # The value before the window still holds at its left edge
+            earlier = [value for timestamp, value in history if timestamp < since]
+            if earlier:
+                points.insert(0, (since, earlier[-1]))
+            if not points:
+                self.strip.itemconfigure(self.lines[field], state=tk.HIDDEN)
+                continue
+            low = min(value for _, value in points)
+            high = max(value for _, value in points)
+            if high - low < 1.0:
+                low, high = low - 0.5, high + 0.5
+            coords = []
+            for index, (timestamp, value) in enumerate(points):
+                x = (timestamp - since) / HISTORY_SECONDS * STRIP_WIDTH
+                y = STRIP_HEIGHT - 2 - (value - low) / (high - low) * (STRIP_HEIGHT - 4)
+                if index:
+                    coords.extend((x, coords[-1]))  # Step line, a reading holds until the next one
+                coords.extend((x, y))
+            coords.extend((STRIP_WIDTH, coords[-1]))
+            self.strip.coords(self.lines[field], *coords)
+            self.strip.itemconfigure(self.lines[field], state=tk.NORMAL)
+
+    def _set(self, name, label, text, color):
+        if self.shown.get(name) != (text, color):
+            label.config(text=text, fg=color)
+            self.shown[name] = (text, color)
+
+
+class DashboardGrid:
+    # Grid of ChargerTiles fed by a StatusBroadcaster or StatusSubscriber. Feed messages are only queued on the
+    # feed threads; the Tk thread merges everything queued into one update per charger every FRAME_MS.
+
+    def __init__(self, parent, status_feed, telemetry=None, columns=5):
+        self.parent = parent
+        self.status_feed = status_feed
+        self.telemetry = telemetry  # Optional TelemetryStore the strips are seeded from
+        self.columns = columns
+        self.tiles = {}
+        self.messages = queue.Queue()
+        self._after_ids = {}  # callback name -> pending after() id
+        self.closed = False
+
+        self.canvas = tk.Canvas(parent, highlightthickness=0)
+        scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.body = tk.Frame(self.canvas)
+        self.canvas.create_window((0, 0), window=self.body, anchor="nw")
+        self.body.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.empty_label = tk.Label(self.body, text="Waiting for chargers on the status feed...", font=("Helvetica", 12))
+        self.empty_label.grid(row=0, column=0, padx=20, pady=20)
+
+        self.unsubscribe = status_feed.subscribe(self.messages.put)
+        self._schedule(FRAME_MS, self.refresh)
+        self._schedule(SCROLL_MS, self.scroll_history)
+
+    def refresh(self):
+        # Everything that arrived since the last frame, merged into one change set per charger
+        pending = {}
+        snapshot = None
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message["type"] == "snapshot":
+                snapshot = set(message["chargers"])
+                for key, entry in message["chargers"].items():
+                    pending[key] = {"changes": dict(entry["status"] or {}), "reachable": entry["reachable"],
+                                    "seq": entry["seq"], "ts": entry["updated_at"], "snapshot": True}
+            else:
+                update = pending.setdefault(message["charger"], {"changes": {}, "snapshot": False})
+                update["changes"].update(message["changes"])
+                update.update(reachable=message["reachable"], seq=message["seq"], ts=message["ts"])
+
+        if snapshot is not None:
+            for key in [key for key in self.tiles if key not in snapshot]:
+                self.remove_tile(key)
+        now = time.time()
+        for key, update in pending.items():
+            tile = self.tiles.get(key) or self.add_tile(key, now)
+            if tile.apply(update["changes"], update["reachable"], update["seq"], update["ts"], update["snapshot"]):
+                tile.draw_history(now)
+        self._schedule(FRAME_MS, self.refresh)
+
+    def scroll_history(self):
+        now = time.time()
+        for tile in self.tiles.values():
+            tile.draw_history(now)
+        self._schedule(SCROLL_MS, self.scroll_history)
+
+    def add_tile(self, key, now):
+        if not self.tiles:
+            self.empty_label.grid_remove()
+        tile = self.tiles[key] = ChargerTile(self.body, key)
+        if self.telemetry is not None:
+            tile.seed(self.telemetry, now)
+        self._place(tile, len(self.tiles) - 1)
+        return tile
+
+    def remove_tile(self, key):
+        self.tiles.pop(key).frame.destroy()
+        for index, tile in enumerate(self.tiles.values()):
+            self._place(tile, index)
+        if not self.tiles:
+            self.empty_label.grid()
+
+    def close(self):
+        self.closed = True
+        self.unsubscribe()
+        for after_id in self._after_ids.values():
+            try:
+                self.parent.after_cancel(after_id)
+            except tk.TclError:
+                pass
+
+    def _place(self, tile, index):
+        tile.frame.grid(row=index // self.columns, column=index % self.columns, padx=3, pady=3, sticky="n")
+
+    def _schedule(self, delay, callback):
+        if self.closed:
+            return
+        self._after_ids[callback.__name__] = self.parent.after(delay, callback)
+
+
+def open_dashboard(root, status_feed, telemetry=None, columns=5):
+    # Grid in its own window; closing the window stops its subscription
+    window = tk.Toplevel(root)
+    window.title("Bench Dashboard")
+    window.geometry("1024x768")
+    grid = DashboardGrid(window, status_feed, telemetry=telemetry, columns=columns)
+
+    def on_close():
+        grid.close()
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
+    return grid
+
+
+def main():
+    from status_broadcaster import DEFAULT_PORT, StatusSubscriber
+
+    parser = argparse.ArgumentParser(description="Show every charger on the shared EVSE status feed in one grid.")
+    parser.add_argument("chargers", nargs="*", help="Charger to add to the feed as ip[,username,password]")
+    parser.add_argument("--feed", default=f"http://127.0.0.1:{DEFAULT_PORT}", help="StatusBroadcaster to subscribe to")
+    parser.add_argument("--columns", type=int, default=6, help="Tiles per row")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    status_feed = StatusSubscriber(args.feed)
+    for entry in args.chargers:
+        parts = entry.split(",")
+        ip_address, username, password = parts + ["", 'Assembler', 'E2'][len(parts):]
+        try:
+            status_feed.watch(ip_address, username, password)
+        except OSError as e:
+            logging.error(f"Could not add {ip_address} to the status feed: {str(e)}")
+
+    root = tk.Tk()
+    root.title("Bench Dashboard")
+    root.geometry("1280x800")
+    grid = DashboardGrid(root, status_feed, columns=args.columns)
+    root.mainloop()
+    grid.close()
+    status_feed.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
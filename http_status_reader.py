@@ -0,0 +1,192 @@
+# http_status_reader.py
+
+import logging
+import ssl
+import threading
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode, urljoin
+from urllib.request import build_opener, HTTPCookieProcessor, HTTPSHandler, Request
+from instrumentation import tracer
+from resilience import AuthenticationFailed
+from page_extractor import EVSE_STATUS_FIELDS, INFO_FIELDS, PageStructureError, resolve_fields
+
+
+class ChargerPageParser(HTMLParser):
+    # Single pass over a charger page collecting <td>label</td><td><span>value</span></td> rows,
+    # links, legends and the login form, which is everything the read-only scrapes need
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = {}
+        self.links = []         # (text, href)
+        self.legends = []
+        self.login_form = None  # {"action": ..., "method": ..., "fields": {...}}
+        self.inputs = {}        # input id -> value, for reading settings back from form pages
+        self._cells = []
+        self._cell_text = None
+        self._span_text = None
+        self._link = None
+        self._legend = None
+        self._form = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "tr":
+            self._cells = []
+        elif tag == "td":
+            self._cell_text = []
+            self._span_text = None
+        elif tag == "span" and self._cell_text is not None:
+            self._span_text = []
+        elif tag == "a":
+            self._link = [attrs.get("href") or "", []]
+        elif tag == "legend":
+            self._legend = []
+        elif tag == "form":
+            self._form = {"action": attrs.get("action") or "", "method": (attrs.get("method") or "get").lower(), "fields": {}}
+        if tag == "input" and attrs.get("id"):
+            self.inputs.setdefault(attrs["id"], attrs.get("value") or "")
+        if tag in ("input", "button") and self._form is not None and attrs.get("name"):
+            if tag == "input" and attrs.get("type") in ("checkbox", "radio") and "checked" not in attrs:
+                return
+            self._form["fields"][attrs["name"]] = attrs.get("value") or ""
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell_text is not None:
+            self._cells.append(("".join(self._cell_text).strip(), None if self._span_text is None else "".join(self._span_text).strip()))
+            self._cell_text = None
+            self._span_text = None
+            # A label cell followed by a value cell with a span is one field, same as the XPath scrape
+            if len(self._cells) >= 2 and self._cells[-1][1] is not None:
+                label = self._cells[-2][0]
+                self.rows.setdefault(label, self._cells[-1][1])
+        elif tag == "a" and self._link is not None:
+            self.links.append(("".join(self._link[1]).strip(), self._link[0]))
+            self._link = None
+        elif tag == "legend" and self._legend is not None:
+            self.legends.append("".join(self._legend).strip())
+            self._legend = None
+        elif tag == "form" and self._form is not None:
+            if "username" in self._form["fields"] and "password" in self._form["fields"]:
+                self.login_form = self._form
+            self._form = None
+
+    def handle_data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+            if self._span_text is not None:
+                self._span_text.append(data)
+        if self._link is not None:
+            self._link[1].append(data)
+        if self._legend is not None:
+            self._legend.append(data)
+
+
+def charger_ssl_context():
+    # Chargers serve self-signed certificates
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class HttpStatusReader:
+    # Reads charger status pages over plain HTTP(S) with one cookie jar per charger, no browser involved
+
+    def __init__(self, scheme="https", timeout=5):
+        self.scheme = scheme
+        self.timeout = timeout
+        self._openers = {}
+        self._lock = threading.Lock()
+        self._ssl_context = charger_ssl_context()
+
+    def read_evse_status(self, ip_address, username, password):
+        page = self.fetch_page(ip_address, "/EVSE", username, password)
+        if "EVSEs" not in page.legends:
+            raise PageStructureError(f"EVSE page on {ip_address} has no 'EVSEs' section.")
+
+        evse_status, missing = resolve_fields(page.rows, EVSE_STATUS_FIELDS)
+        if missing:
+            raise PageStructureError(f"EVSE page on {ip_address} is missing fields: {', '.join(missing)}")
+        return evse_status
+
+    def read_info(self, ip_address, username, password):
+        root = self.fetch_page(ip_address, "/", username, password)
+        info_href = next((href for text, href in root.links if "Info" in text and href), None)
+        if info_href is None:
+            raise PageStructureError(f"No 'Info' link found on {ip_address}.")
+
+        page = self.fetch_page(ip_address, info_href, username, password)
+        info, missing = resolve_fields(page.rows, INFO_FIELDS)
+        if missing:
+            raise PageStructureError(f"Info page on {ip_address} is missing fields: {', '.join(missing)}")
+        return info["System IP Address"], info["AC Voltage"], info["Hostname"]
+
+    def read_ocpp_identity(self, ip_address, username, password):
+        page = self.fetch_page(ip_address, "/CSMS", username, password)
+        if "Identity" not in page.inputs:
+            raise PageStructureError(f"CSMS page on {ip_address} has no 'Identity' input.")
+        return page.inputs["Identity"]
+
+    def check_login(self, ip_address, username, password):
+        # Fresh cookie jar so the cached session of the provisioning user is left alone
+        opener = build_opener(HTTPCookieProcessor(CookieJar()), HTTPSHandler(context=self._ssl_context))
+        url = f"{self.scheme}://{ip_address}/"
+        page = self._get(opener, url)
+        if page.login_form is None:
+            raise PageStructureError(f"No login form on {ip_address}.")
+        with tracer.span("http_login", ip=ip_address):
+            self._login(opener, url, page.login_form, username, password)
+        return self._get(opener, url).login_form is None
+
+    def fetch_page(self, ip_address, path, username, password):
+        opener = self._opener(ip_address)
+        url = urljoin(f"{self.scheme}://{ip_address}/", path)
+        with tracer.span("http_page_load", ip=ip_address, path=path):
+            page = self._get(opener, url)
+        if page.login_form is not None:
+            # The cookie jar has no valid session yet or the charger expired it
+            with tracer.span("http_login", ip=ip_address):
+                self._login(opener, url, page.login_form, username, password)
+            with tracer.span("http_page_load", ip=ip_address, path=path):
+                page = self._get(opener, url)
+            if page.login_form is not None:
+                raise AuthenticationFailed(f"Login to {ip_address} as {username} did not stick.")
+        return page
+
+    def forget(self, ip_address):
+        with self._lock:
+            self._openers.pop(ip_address, None)
+
+    def _login(self, opener, url, login_form, username, password):
+        fields = dict(login_form["fields"])
+        fields["username"] = username
+        fields["password"] = password
+        fields.setdefault("login", "")
+        action = urljoin(url, login_form["action"]) if login_form["action"] else url
+        data = urlencode(fields).encode("utf-8")
+        if login_form["method"] == "post":
+            request = Request(action, data=data)
+        else:
+            request = Request(f"{action}?{data.decode('ascii')}")
+        with opener.open(request, timeout=self.timeout) as response:
+            response.read()
+        logging.info(f"HTTP session logged in to {url} as {username}.")
+
+    def _get(self, opener, url):
+        with opener.open(url, timeout=self.timeout) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            html = response.read().decode(charset, errors="replace")
+        parser = ChargerPageParser()
+        parser.feed(html)
+        parser.close()
+        return parser
+
+    def _opener(self, ip_address):
+        with self._lock:
+            opener = self._openers.get(ip_address)
+            if opener is None:
+                opener = build_opener(HTTPCookieProcessor(CookieJar()), HTTPSHandler(context=self._ssl_context))
+                self._openers[ip_address] = opener
+            return opener
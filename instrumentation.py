@@ -0,0 +1,207 @@
+# instrumentation.py
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets in seconds, from a fast DOM read up to a full config import and reboot
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_NAME = "egoev_step_duration_seconds"
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile, good enough for a handful of samples; None without any
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Span:
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.started_at = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def to_dict(self):
+        record = {"ts": self.started_at, "span": self.name, "duration_ms": round(self.duration * 1000, 3),
+                  "status": self.status}
+        if self.error:
+            record["error"] = self.error
+        record.update(self.tags)
+        return record
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Tracer:
+    # Span-style timing for driver start, page loads, logins, waits, extraction and uploads.
+    # Finished spans go to a bounded in-memory buffer, optional JSON-lines files and per-step histograms.
+
+    def __init__(self, max_spans=10000):
+        self._spans = deque(maxlen=max_spans)
+        self._histograms = {}  # (span, host, status) -> Histogram
+        self._exporters = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._server = None
+
+    @contextmanager
+    def span(self, name, **tags):
+        # Tags set by an enclosing tags() block (charger IP/hostname) are inherited
+        merged = dict(getattr(self._local, "tags", {}))
+        merged.update({key: value for key, value in tags.items() if value is not None})
+        span = Span(name, merged)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {str(e)}"[:300]
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            self._finish(span)
+
+    @contextmanager
+    def tags(self, **tags):
+        previous = getattr(self._local, "tags", {})
+        merged = dict(previous)
+        merged.update({key: value for key, value in tags.items() if value is not None})
+        self._local.tags = merged
+        try:
+            yield
+        finally:
+            self._local.tags = previous
+
+    def add_jsonl_exporter(self, path):
+        self.add_exporter(JsonLinesExporter(path))
+
+    def add_exporter(self, exporter):
+        # Anything with export(span) and close(); the list is replaced, never mutated, while spans may be finishing
+        with self._lock:
+            self._exporters = self._exporters + [exporter]
+
+    def remove_exporter(self, exporter):
+        with self._lock:
+            self._exporters = [other for other in self._exporters if other is not exporter]
+
+    def recent_spans(self, limit=None):
+        with self._lock:
+            spans = list(self._spans)
+        return spans[-limit:] if limit else spans
+
+    def prometheus_text(self):
+        lines = [f"# HELP {METRIC_NAME} Duration of instrumented provisioning steps.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (name, host, status), histogram in items:
+                labels = f'span="{_escape(name)}",host="{_escape(host)}",status="{status}"'
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port=9108, host="127.0.0.1"):
+        # /metrics serves the Prometheus snapshot, /spans the most recent spans as JSON lines
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics"):
+                    body = tracer.prometheus_text().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path.startswith("/spans"):
+                    body = "".join(json.dumps(span.to_dict(), ensure_ascii=False) + "\n"
+                                   for span in tracer.recent_spans(1000)).encode("utf-8")
+                    content_type = "application/x-ndjson; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        logging.info(f"Metrics endpoint listening on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for exporter in self._exporters:
+            exporter.close()
+
+    def _finish(self, span):
+        host = span.tags.get("hostname") or span.tags.get("ip") or ""
+        # Whole-step spans are charted per BackendConnector method
+        name = span.tags.get("step") or span.name
+        with self._lock:
+            self._spans.append(span)
+            key = (name, host, span.status)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(span.duration)
+        for exporter in self._exporters:
+            exporter.export(span)
+
+
+class JsonLinesExporter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                self._file.write(line)
+                self._file.flush()
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to export span to {self.path}: {str(e)}")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide tracer used by WebDriverManager and BackendConnector
+tracer = Tracer()
@@ -0,0 +1,365 @@
+# mock_charger.py
+
+import argparse
+import html
+import io
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+import zipfile
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Stand-in for the EGO charger web UI: just enough of the login form, Info, /EVSE, /Assembler config import,
+# /CSMS Identity and /Security change-password popups for BackendConnector to run against it without hardware.
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>.popup {{ display: none; }} .popup.open {{ display: block; }}</style></head>
+<body>{nav}<main>{body}</main></body></html>"""
+
+NAV = """<nav><a href="/">Home</a> <a href="/Info">Info</a> <a href="/EVSE">EVSE</a>
+<a href="/Assembler">Assembler</a> <a href="/CSMS">CSMS</a> <a href="/Security">Security</a></nav>"""
+
+LOGIN_BODY = """<form method="post" action="/login">
+<input type="hidden" name="next" value="{next}">
+<label>Username <input type="text" name="username"></label>
+<label>Password <input type="password" name="password"></label>
+<button type="submit" name="login">Login</button>
+</form>"""
+
+ASSEMBLER_BODY = """<fieldset><legend>Configuration Import / Export</legend>
+<input type="file" id="configToUpload" name="config">
+<button type="button" id="uploadConfig" disabled>Import Config</button>
+<a id="exportConfig" href="/Assembler/export" download="config.zip">Export Config</a>
+<div id="importStatus"></div>
+</fieldset>
+<script>
+var fileInput = document.getElementById('configToUpload');
+var uploadButton = document.getElementById('uploadConfig');
+var importStatus = document.getElementById('importStatus');
+fileInput.addEventListener('change', function () {{ uploadButton.disabled = !fileInput.files.length; }});
+uploadButton.addEventListener('click', function () {{
+    var form = new FormData();
+    form.append('config', fileInput.files[0]);
+    importStatus.textContent = 'Importing configuration...';
+    fetch('/Assembler/import', {{method: 'POST', body: form}}).then(function (response) {{
+        return response.text().then(function (text) {{
+            importStatus.className = response.ok ? 'success' : 'error';
+            importStatus.textContent = text;
+        }});
+    }}).catch(function (error) {{ importStatus.className = 'error'; importStatus.textContent = String(error); }});
+}});
+</script>"""
+
+CSMS_BODY = """<fieldset><legend>CSMS</legend>
+<form method="post" action="/CSMS">
+<label>Charger Identity <input type="text" id="Identity" name="Identity" value="{identity}"></label>
+<input type="submit" value="Save">
+</form></fieldset>"""
+
+SECURITY_BODY = """<fieldset><legend>Users</legend><table>{rows}</table></fieldset>
+<div class="popup" id="passwordPopup">
+<form id="passwordForm">
+<input type="hidden" name="user" id="popupUser">
+<input type="password" name="password1">
+<input type="password" name="password2">
+<input type="submit" name="Update" value="Update">
+</form></div>
+<script>
+var popup = document.getElementById('passwordPopup');
+function openPopup(user) {{
+    document.getElementById('popupUser').value = user;
+    popup.className = 'popup open';
+}}
+document.getElementById('passwordForm').addEventListener('submit', function (event) {{
+    event.preventDefault();
+    fetch('/Security', {{method: 'POST', body: new URLSearchParams(new FormData(event.target))}}).then(function () {{
+        popup.className = 'popup';
+        event.target.reset();
+    }});
+}});
+</script>"""
+
+USER_ROW = """<tr><td>{user}</td><td><input type="button" name="{user}-Change" value="Change" onclick="openPopup('{user}')"></td></tr>"""
+
+
+def table(rows):
+    return "<table>" + "".join(
+        f"<tr><td>{html.escape(label)}</td><td><span>{html.escape(str(value))}</span></td></tr>" for label, value in rows
+    ) + "</table>"
+
+
+class MockChargerState:
+    def __init__(self, hostname, username, password):
+        self.hostname = hostname
+        self.identity = "158206344"
+        self.passwords = {"Assembler": password, "Installer": "", "EV": ""}
+        self.login_user = username
+        self.evse_status = {
+            "Status": "available",
+            "Temperature": "28℃",
+            "Available Power": "100%",
+            "AC Voltage": "224V",
+            "Current": "0A",
+            "Current Offered": "0A",
+            "Energy": "0kWh",
+            "EVSE PP State": "0A",
+        }
+        self.config = None
+        self.imports = 0
+        self.rebooting_until = 0.0
+        self.sessions = {}  # token -> expiry
+        self.lock = threading.Lock()
+
+
+class MockCharger:
+    # One fake charger on 127.0.0.1. latency is added to every response (a number or a (min, max) range),
+    # failure_rate is the share of requests answered with a 500, reboot_seconds is how long the web UI
+    # stays down after a config import, session_ttl logs clients out after that many seconds.
+
+    def __init__(self, port=0, hostname="ray-021260097381201829", username="Assembler", password="E2",
+                 latency=0.0, failure_rate=0.0, reboot_seconds=0.0, session_ttl=600.0):
+        self.state = MockChargerState(hostname, username, password)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reboot_seconds = reboot_seconds
+        self.session_ttl = session_ttl
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self):
+        return f"http://{self.address}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"mock-{self.address}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        charger = self
+
+        class Handler(MockChargerHandler):
+            pass
+
+        Handler.charger = charger
+        return Handler
+
+
+class MockChargerHandler(BaseHTTPRequestHandler):
+    charger = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if not self._before_request():
+            return
+        path = urlsplit(self.path).path
+        if not self._logged_in():
+            return self._page("Login", LOGIN_BODY.format(next=html.escape(self.path)), nav=False)
+
+        state = self.charger.state
+        if path == "/":
+            self._page("Home", f"<h1>{html.escape(state.hostname)}</h1>")
+        elif path == "/Info":
+            with state.lock:
+                rows = [("System IP Address", self.charger.address), ("Hostname", state.hostname),
+                        ("AC Voltage L1", state.evse_status["AC Voltage"]), ("Firmware", "1.3.7")]
+            self._page("Info", table(rows))
+        elif path == "/EVSE":
+            with state.lock:
+                rows = list(state.evse_status.items())
+            self._page("EVSE", "<fieldset><legend>EVSEs</legend>" + table(rows) + "</fieldset>")
+        elif path == "/Assembler":
+            self._page("Assembler", ASSEMBLER_BODY.format())
+        elif path == "/Assembler/export":
+            self._send(200, self._export_config(), "application/zip",
+                       {"Content-Disposition": f'attachment; filename="{state.hostname}_config.zip"'})
+        elif path == "/CSMS":
+            with state.lock:
+                identity = state.identity
+            self._page("CSMS", CSMS_BODY.format(identity=html.escape(identity)))
+        elif path == "/Security":
+            rows = "".join(USER_ROW.format(user=user) for user in ("Assembler", "Installer", "EV"))
+            self._page("Security", SECURITY_BODY.format(rows=rows))
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_POST(self):
+        if not self._before_request():
+            return
+        path = urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        state = self.charger.state
+
+        if path == "/login":
+            form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+            with state.lock:
+                valid = form.get("username") in state.passwords and state.passwords[form.get("username")] == form.get("password")
+                token = secrets.token_hex(16) if valid else None
+                if valid:
+                    state.sessions[token] = time.monotonic() + self.charger.session_ttl
+            if not valid:
+                return self._page("Login", "<p>Invalid credentials</p>" + LOGIN_BODY.format(next="/"), nav=False)
+            target = form.get("next") or "/"
+            return self._send(303, b"", "text/plain", {"Location": target, "Set-Cookie": f"session={token}; Path=/"})
+
+        if not self._logged_in():
+            return self._send(403, b"Login required", "text/plain")
+
+        if path == "/Assembler/import":
+            config = self._multipart_file(body)
+            if config is None or not zipfile.is_zipfile(io.BytesIO(config)):
+                return self._send(400, b"Configuration import failed: not a config archive", "text/plain")
+            with state.lock:
+                state.config = config
+                state.imports += 1
+                identity = self._identity_in(config)
+                if identity:
+                    state.identity = identity
+                if self.charger.reboot_seconds:
+                    state.rebooting_until = time.monotonic() + self.charger.reboot_seconds
+                    state.sessions.clear()
+            self._send(200, b"Configuration imported successfully. The charger will now reboot.", "text/plain")
+        elif path == "/CSMS":
+            form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+            with state.lock:
+                state.identity = form.get("Identity", state.identity)
+            self._send(303, b"", "text/plain", {"Location": "/CSMS"})
+        elif path == "/Security":
+            form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+            user = form.get("user")
+            if user not in state.passwords or not form.get("password1") or form.get("password1") != form.get("password2"):
+                return self._send(400, b"Password change rejected", "text/plain")
+            with state.lock:
+                state.passwords[user] = form["password1"]
+            self._send(200, b"Password updated", "text/plain")
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock {self.charger.address}: {format % args}")
+
+    def _before_request(self):
+        charger = self.charger
+        charger.requests += 1
+        latency = charger.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        if time.monotonic() < charger.state.rebooting_until:
+            # Rebooting after a config import: drop the connection like the real web server going away
+            self.close_connection = True
+            self.connection.close()
+            return False
+        if charger.failure_rate and random.random() < charger.failure_rate:
+            self._send(500, b"Injected failure", "text/plain")
+            return False
+        return True
+
+    def _logged_in(self):
+        cookies = self.headers.get("Cookie") or ""
+        token = next((part.split("=", 1)[1] for part in cookies.replace(" ", "").split(";")
+                      if part.startswith("session=")), None)
+        state = self.charger.state
+        with state.lock:
+            expiry = state.sessions.get(token)
+            if expiry is None:
+                return False
+            if expiry < time.monotonic():
+                del state.sessions[token]
+                return False
+            return True
+
+    def _export_config(self):
+        state = self.charger.state
+        with state.lock:
+            if state.config is not None:
+                return state.config
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("config.json", json.dumps({"Version": 11, "ExportHost": state.hostname}))
+        return buffer.getvalue()
+
+    def _identity_in(self, config):
+        try:
+            with zipfile.ZipFile(io.BytesIO(config)) as archive:
+                return json.loads(archive.read("OCPPInfo.json")).get("identity")
+        except (KeyError, ValueError, zipfile.BadZipFile):
+            return None
+
+    def _multipart_file(self, body):
+        content_type = self.headers.get("Content-Type") or ""
+        if "multipart/form-data" not in content_type:
+            return body or None
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        for part in message.iter_parts():
+            if part.get_filename() is not None or part.get_param("name", header="content-disposition") == "config":
+                return part.get_payload(decode=True)
+        return None
+
+    def _page(self, title, body, nav=True):
+        page = PAGE.format(title=html.escape(title), nav=NAV if nav else "", body=body)
+        self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-in EGO chargers for development and benchmarks.")
+    parser.add_argument("--count", type=int, default=1, help="Number of chargers to start on consecutive ports")
+    parser.add_argument("--port", type=int, default=8800, help="Port of the first charger")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--reboot-seconds", type=float, default=0.0, help="Web UI downtime after a config import")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    chargers = [
+        MockCharger(port=args.port + i, hostname=f"ray-0212600973812{i:05d}", latency=args.latency,
+                    failure_rate=args.failure_rate, reboot_seconds=args.reboot_seconds).start()
+        for i in range(args.count)
+    ]
+    for charger in chargers:
+        logging.info(f"Mock charger {charger.state.hostname} listening on {charger.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for charger in chargers:
+            charger.stop()
+
+
+if __name__ == "__main__":
+    main()
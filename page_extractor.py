@@ -0,0 +1,97 @@
+# page_extractor.py
+
+import time
+
+
+class PageStructureError(Exception):
+    # The page did not look like the one the scrape expects
+    pass
+
+
+class MissingFieldsError(PageStructureError):
+    def __init__(self, missing, found):
+        self.missing = missing
+        self.found = found
+        super().__init__(f"Missing fields: {', '.join(missing)}")
+
+
+class Field:
+    def __init__(self, label, partial=False):
+        self.label = label
+        self.partial = partial  # Match any row label containing this text, like XPath contains()
+
+
+# Declarative field maps, add a row here to scrape a new value from the page
+EVSE_STATUS_FIELDS = {
+    "Status": Field("Status"),
+    "Temperature": Field("Temperature"),
+    "Available Power": Field("Available Power"),
+    "AC Voltage": Field("AC Voltage"),
+    "Current": Field("Current"),
+    "Current Offered": Field("Current Offered"),
+    "Energy": Field("Energy"),
+    "EVSE PP State": Field("EVSE PP State"),
+}
+
+INFO_FIELDS = {
+    "System IP Address": Field("System IP Address"),
+    "AC Voltage": Field("AC Voltage", partial=True),
+    "Hostname": Field("Hostname"),
+}
+
+# Collects every <td>label</td> ... <td><span>value</span></td> row of the page in a single WebDriver round trip
+EXTRACT_ROWS_SCRIPT = """
+var rows = {};
+var cells = document.getElementsByTagName('td');
+for (var i = 0; i < cells.length; i++) {
+    var label = cells[i].textContent.trim();
+    if (!label || rows.hasOwnProperty(label)) { continue; }
+    for (var sibling = cells[i].nextElementSibling; sibling; sibling = sibling.nextElementSibling) {
+        if (sibling.tagName !== 'TD') { continue; }
+        var span = sibling.querySelector('span');
+        if (span && span.parentElement === sibling) {
+            rows[label] = (span.innerText || span.textContent).trim();
+            break;
+        }
+    }
+}
+return rows;
+"""
+
+
+def extract_rows(driver):
+    return driver.execute_script(EXTRACT_ROWS_SCRIPT) or {}
+
+
+def resolve_fields(rows, field_map):
+    # Map scraped label/value rows onto a field map, collecting every missing field instead of stopping at the first
+    values = {}
+    missing = []
+    for name, field in field_map.items():
+        value = rows.get(field.label)
+        if value is None and field.partial:
+            value = next((v for label, v in rows.items() if field.label in label), None)
+        if value is None:
+            missing.append(name)
+        else:
+            values[name] = value
+    return values, missing
+
+
+def extract_fields(driver, field_map):
+    values, missing = resolve_fields(extract_rows(driver), field_map)
+    if missing:
+        raise MissingFieldsError(missing, values)
+    return values
+
+
+def wait_for_fields(driver, field_map, timeout=10, poll_frequency=0.2):
+    # Re-extract until every field is on the page, e.g. right after clicking through to a new page
+    deadline = time.monotonic() + timeout
+    while True:
+        values, missing = resolve_fields(extract_rows(driver), field_map)
+        if not missing:
+            return values
+        if time.monotonic() >= deadline:
+            raise MissingFieldsError(missing, values)
+        time.sleep(poll_frequency)
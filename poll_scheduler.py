@@ -0,0 +1,114 @@
+# poll_scheduler.py
+
+import logging
+import random
+import threading
+from telemetry import parse_evse_status
+
+# States where the unit is doing something worth watching closely
+ACTIVE_STATES = {"preparing", "charging", "suspendedev", "suspendedevse", "finishing"}
+# Smallest change per field that counts as "moving" between two polls
+CHANGE_THRESHOLDS = {
+    "Temperature": 1.0,
+    "AC Voltage": 3.0,
+    "Current": 0.5,
+    "Current Offered": 0.5,
+    "Energy": 0.01,
+    "Available Power": 1.0,
+}
+
+
+class PollBudgetExceeded(Exception):
+    pass
+
+
+class ChargerPollState:
+    def __init__(self):
+        self.last_sample = None
+        self.last_status = None
+        self.stable_polls = 0
+        self.failures = 0
+        self.interval = None
+
+
+class PollScheduler:
+    # Picks the next poll delay per charger from its state and how fast its readings move, and caps how many
+    # scrapes run at once across all chargers
+
+    def __init__(self, active_interval=1.0, base_interval=5.0, idle_interval=30.0, unreachable_interval=60.0,
+                 backoff=1.5, jitter=0.1, max_concurrent_scrapes=2, budget_wait=10.0):
+        self.active_interval = active_interval
+        self.base_interval = base_interval
+        self.idle_interval = idle_interval
+        self.unreachable_interval = unreachable_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.budget_wait = budget_wait
+        self._budget = threading.BoundedSemaphore(max_concurrent_scrapes)
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def scrape(self, fn, *args, **kwargs):
+        # Run one status scrape inside the global budget
+        if not self._budget.acquire(timeout=self.budget_wait):
+            raise PollBudgetExceeded(f"No scrape slot free within {self.budget_wait}s.")
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._budget.release()
+
+    def record_result(self, charger, evse_status):
+        # Returns the delay in seconds before this charger should be polled again
+        with self._lock:
+            state = self._states.setdefault(charger, ChargerPollState())
+            if not evse_status:
+                state.failures += 1
+                state.stable_polls = 0
+                interval = min(self.base_interval * self.backoff ** state.failures, self.unreachable_interval)
+            else:
+                state.failures = 0
+                status = str(evse_status.get("Status", "")).strip().lower()
+                sample = parse_evse_status(evse_status)
+                changed = status != state.last_status or self._moved(state.last_sample, sample)
+                state.last_status, state.last_sample = status, sample
+
+                if status in ACTIVE_STATES:
+                    state.stable_polls = 0
+                    interval = self.active_interval
+                elif changed:
+                    state.stable_polls = 0
+                    interval = self.base_interval
+                else:
+                    # Back off geometrically while nothing moves
+                    state.stable_polls += 1
+                    interval = min(self.base_interval * self.backoff ** state.stable_polls, self.idle_interval)
+            state.interval = interval
+
+        # Jitter keeps several chargers from being scraped in lockstep
+        delay = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        logging.debug(f"Next poll of {charger} in {delay:.1f}s.")
+        return delay
+
+    def record_skipped(self, charger):
+        # The charger was busy with another job, come back soon without counting it as a failure
+        return self.active_interval * random.uniform(1, 1 + self.jitter)
+
+    def interval(self, charger):
+        with self._lock:
+            state = self._states.get(charger)
+            return state.interval if state is not None else None
+
+    def forget(self, charger):
+        with self._lock:
+            self._states.pop(charger, None)
+
+    def _moved(self, previous, current):
+        if previous is None:
+            return True
+        for field, threshold in CHANGE_THRESHOLDS.items():
+            before, after = previous.get(field), current.get(field)
+            if before != before or after != after:  # NaN on either side, nothing to compare
+                continue
+            if abs(after - before) >= threshold:
+                return True
+        return False
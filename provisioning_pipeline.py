@@ -0,0 +1,251 @@
+# provisioning_pipeline.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from web_driver_manager import WebDriverManager
+from backend_connector import BackendConnector
+from config_builder import ocpp_identity_from_hostname
+from provisioning_state import UnitProvisioning
+
+STEPS = ("readiness", "pre_configure", "ocpp_id", "passwords")
+
+
+class Station:
+    def __init__(self, name, url, username='Assembler', password='E2'):
+        self.name = name
+        self.url = url
+        self.username = username
+        self.password = password
+
+    def __repr__(self):
+        return f"Station({self.name!r}, {self.url!r})"
+
+
+class StationResult:
+    def __init__(self, station):
+        self.station = station
+        self.ip_address = None
+        self.hostname = None
+        self.power_drawn = None
+        self.passwords = None
+        self.steps = {}        # step -> {"ok": bool, "detail": str, "elapsed": float}
+        self.failed_step = None
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.failed_step is None and len(self.steps) == len(STEPS)
+
+
+class StepFailed(Exception):
+    pass
+
+
+class ProvisioningPipeline:
+    # Runs the full readiness -> pre-configure -> OCPP ID -> passwords sequence on several benches at once.
+    # Every station gets its own WebDriverManager and BackendConnector, so ip_address/hostname never leak
+    # between benches, and a failure on one station only ends that station's run.
+
+    def __init__(self, driver_path, config_file_path, max_concurrency=4, on_event=None, status_mode="http",
+                 merge_ocpp_id=True, config_index=None, emit_passwords=False, checkpoints=None,
+                 browser_profile="default", ledger=None):
+        self.driver_path = driver_path
+        self.config_file_path = config_file_path
+        self.merge_ocpp_id = merge_ocpp_id
+        self.config_index = config_index  # Shared by all stations, skips uploads a unit already has
+        self.checkpoints = checkpoints    # ProvisioningCheckpoints; a rerun resumes each unit where it stopped
+        self.max_concurrency = max_concurrency
+        self.on_event = on_event
+        self.emit_passwords = emit_passwords  # Put the generated passwords into the final "done" event
+        self.status_mode = status_mode
+        self.ledger = ledger  # RunLedger fed with every step and every finished unit
+        self.browser_profile = browser_profile  # WebDriverManager profile, "lean" for unattended batch runs
+        self._event_lock = threading.Lock()
+
+    def run(self, stations):
+        results = {}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="station") as executor:
+            futures = {executor.submit(self.run_station, station): station for station in stations}
+            for future in as_completed(futures):
+                station = futures[future]
+                results[station.name] = future.result()
+
+        elapsed = time.monotonic() - started
+        passed = sum(1 for result in results.values() if result.ok)
+        units_per_hour = passed * 3600 / elapsed if elapsed > 0 else 0.0
+        logging.info(f"Provisioned {passed}/{len(stations)} stations in {elapsed:.1f}s ({units_per_hour:.1f} units/hour).")
+        return results
+
+    def run_station(self, station):
+        result = StationResult(station)
+        connector = self.create_connector(station)
+        started = time.monotonic()
+        try:
+            # One login per charger for the whole run
+            with connector.provisioning_run():
+                unit = None
+                for step in STEPS:
+                    if unit is not None and unit.is_done(step):
+                        self._resume_step(station, result, unit, step)
+                        continue
+                    if not self._run_step(connector, station, result, step):
+                        break
+                    if step == "readiness":
+                        if self.checkpoints is not None:
+                            unit = UnitProvisioning(result.hostname, self.checkpoints)
+                            self._read_back_checkpoints(connector, station, result, unit)
+                    elif unit is not None:
+                        unit.complete(step, result.steps[step]["detail"], self._checkpoint_data(step, result))
+        except Exception as e:
+            # Anything unexpected stays inside this station
+            logging.error(f"Station {station.name} aborted: {str(e)}")
+            if result.failed_step is None:
+                result.failed_step = "unknown"
+            self._emit(station, "aborted", "failed", str(e))
+        finally:
+            connector.close()
+            result.elapsed = time.monotonic() - started
+        self._record_unit(station, result)
+        summary = {"ip_address": result.ip_address, "hostname": result.hostname, "power_drawn": result.power_drawn}
+        if self.emit_passwords and result.passwords:
+            summary["passwords"] = result.passwords
+        self._emit(station, "done", "ok" if result.ok else "failed", result.failed_step or "", result.elapsed, **summary)
+        return result
+
+    def create_connector(self, station):
+        # Benches listed as http:// (or the mock charger) are read over plain HTTP as well
+        scheme = "http" if station.url.startswith("http://") else "https"
+        return BackendConnector(WebDriverManager(driver_path=self.driver_path, profile=self.browser_profile),
+                                status_mode=self.status_mode,
+                                config_index=self.config_index, scheme=scheme)
+
+    def _run_step(self, connector, station, result, step):
+        self._emit(station, step, "started")
+        step_started = time.monotonic()
+        try:
+            detail = getattr(self, f"step_{step}")(connector, station, result)
+            ok = True
+        except StepFailed as e:
+            detail = str(e)
+            ok = False
+        except Exception as e:
+            logging.error(f"Station {station.name} failed in {step}: {str(e)}")
+            detail = f"An error occurred: {str(e)}"
+            ok = False
+
+        elapsed = time.monotonic() - step_started
+        result.steps[step] = {"ok": ok, "detail": detail, "elapsed": elapsed}
+        if not ok:
+            result.failed_step = step
+        if self.ledger is not None:
+            self.ledger.record_step(step, "ok" if ok else "failed", hostname=result.hostname, station=station.name,
+                                    detail=detail, duration=elapsed)
+        self._emit(station, step, "ok" if ok else "failed", detail, elapsed, hostname=result.hostname)
+        return ok
+
+    def _read_back_checkpoints(self, connector, station, result, unit):
+        # One read-back of the checkpointed steps on the charger instead of repeating them; what the charger no
+        # longer confirms is reopened and runs again
+        if not unit.resumable_steps:
+            return
+        self._emit(station, "resume", "verifying", hostname=result.hostname)
+        try:
+            connector.read_back_checkpoints(unit, self.config_file_path, station.username, station.password,
+                                            merge_ocpp_id=self.merge_ocpp_id)
+        except Exception as e:
+            logging.error(f"Station {station.name} could not read back its checkpoints: {str(e)}")
+            unit.reopen(unit.resumable_steps[0])
+
+    def _resume_step(self, station, result, unit, step):
+        checkpoint = unit.checkpoint(step)
+        detail = checkpoint["detail"] or ""
+        result.steps[step] = {"ok": True, "detail": detail, "elapsed": 0.0, "resumed": True}
+        if step == "passwords":
+            result.passwords = checkpoint["data"]
+        if self.ledger is not None:
+            self.ledger.record_step(step, "verified", hostname=result.hostname, station=station.name, detail=detail)
+        self._emit(station, step, "verified", detail, hostname=result.hostname)
+
+    def _record_unit(self, station, result):
+        if self.ledger is None:
+            return
+        ocpp_step = result.steps.get("ocpp_id")
+        self.ledger.record_unit(
+            "ok" if result.ok else "failed",
+            started_at=time.time() - result.elapsed,
+            hostname=result.hostname,
+            ip_address=result.ip_address,
+            station=station.name,
+            power_drawn=result.power_drawn,
+            ocpp_id=ocpp_identity_from_hostname(result.hostname) if ocpp_step and ocpp_step["ok"] else None,
+            installer_password=(result.passwords or {}).get("Installer"),
+            failed_step=result.failed_step,
+        )
+
+    def _checkpoint_data(self, step, result):
+        if step == "ocpp_id":
+            return {"ocpp_id": ocpp_identity_from_hostname(result.hostname)}
+        if step == "passwords":
+            return result.passwords
+        return None
+
+    def step_readiness(self, connector, station, result):
+        ip_address, power_drawn, hostname = connector.connect_to_backend(
+            test_urls=[station.url], username=station.username, password=station.password
+        )
+        if not ip_address or not power_drawn:
+            raise StepFailed("Could not retrieve IP or power information.")
+        try:
+            voltage = float(power_drawn.strip('V'))
+        except ValueError:
+            raise StepFailed("Invalid power drawn value retrieved.")
+        if not 220.0 <= voltage <= 240.0:
+            raise StepFailed("Power supply is not within the expected range.")
+
+        result.ip_address, result.power_drawn, result.hostname = ip_address, power_drawn, hostname
+        return f"IP Address: {ip_address}, Power Supply: {voltage:.2f}V, Hostname: {hostname}"
+
+    def step_pre_configure(self, connector, station, result):
+        status = connector.upload_config_file(
+            config_file_path=self.config_file_path, username=station.username, password=station.password,
+            merge_ocpp_id=self.merge_ocpp_id,
+        )
+        if "successfully" not in status:
+            raise StepFailed(status)
+        return status
+
+    def step_ocpp_id(self, connector, station, result):
+        if self.merge_ocpp_id:
+            # Written into OCPPConfig.json/OCPPInfo.json by the pre-configure upload, as long as the charger says so
+            ocpp_id = ocpp_identity_from_hostname(result.hostname)
+            identity = connector.read_ocpp_identity(username=station.username, password=station.password)
+            if identity == ocpp_id:
+                return f"OCPP ID allocated successfully: {ocpp_id} (merged into configuration)"
+            logging.warning(f"Station {station.name} reports OCPP identity {identity} after the upload, allocating {ocpp_id}.")
+        status = connector.allocate_ocpp_id(username=station.username, password=station.password)
+        if "successfully" not in status:
+            raise StepFailed(status)
+        return status
+
+    def step_passwords(self, connector, station, result):
+        passwords = connector.change_passwords(username=station.username, password=station.password)
+        if "error" in passwords:
+            raise StepFailed(f"Error: {passwords['error']}")
+        result.passwords = passwords
+        return "Passwords updated."
+
+    def _emit(self, station, step, status, detail="", elapsed=None, **fields):
+        if self.on_event is None:
+            return
+        event = {"station": station.name, "url": station.url, "step": step, "status": status, "detail": detail,
+                 "elapsed": elapsed, "time": time.time()}
+        event.update(fields)
+        # Callbacks come from several station threads, serialise them so consumers need no locking
+        with self._event_lock:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logging.error(f"Progress callback failed: {str(e)}")
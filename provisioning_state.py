@@ -0,0 +1,92 @@
+# provisioning_state.py
+
+import json
+import logging
+import os
+import threading
+import time
+from sqlite_store import sqlite_connection
+
+# Steps that leave a checkpoint, in order; readiness is re-run every time because it yields the hostname
+CHECKPOINTED_STEPS = ("pre_configure", "ocpp_id", "passwords")
+COMPLETE = "complete"
+
+
+class ProvisioningCheckpoints:
+    # Durable per-unit progress: one row per completed step, keyed by charger hostname
+
+    def __init__(self, path="provisioning_state.sqlite3"):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        with sqlite_connection(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS unit_steps ("
+                " hostname TEXT NOT NULL,"
+                " step TEXT NOT NULL,"
+                " detail TEXT,"
+                " data TEXT,"
+                " completed_at REAL NOT NULL,"
+                " PRIMARY KEY (hostname, step))"
+            )
+
+    def completed_steps(self, hostname):
+        with self._lock, sqlite_connection(self.path) as connection:
+            rows = connection.execute(
+                "SELECT step, detail, data, completed_at FROM unit_steps WHERE hostname = ?", (hostname,),
+            ).fetchall()
+        return {row[0]: {"detail": row[1], "data": json.loads(row[2]) if row[2] else None, "completed_at": row[3]}
+                for row in rows}
+
+    def mark_done(self, hostname, step, detail=None, data=None):
+        with self._lock, sqlite_connection(self.path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO unit_steps (hostname, step, detail, data, completed_at) VALUES (?, ?, ?, ?, ?)",
+                (hostname, step, detail, json.dumps(data) if data is not None else None, time.time()),
+            )
+
+    def clear(self, hostname, steps=None):
+        with self._lock, sqlite_connection(self.path) as connection:
+            if steps is None:
+                connection.execute("DELETE FROM unit_steps WHERE hostname = ?", (hostname,))
+            else:
+                connection.executemany("DELETE FROM unit_steps WHERE hostname = ? AND step = ?",
+                                       [(hostname, step) for step in steps])
+
+
+class UnitProvisioning:
+    # State machine for one unit: the state is the first step without a checkpoint, or "complete".
+    # A checkpoint is only trusted after its step's read-back passes; a failed read-back drops that checkpoint
+    # and every later one, since e.g. a re-imported config may reset the identity and the users.
+
+    def __init__(self, hostname, checkpoints, steps=CHECKPOINTED_STEPS):
+        self.hostname = hostname
+        self.checkpoints = checkpoints
+        self.steps = steps
+        self._done = checkpoints.completed_steps(hostname)
+
+    @property
+    def state(self):
+        return next((step for step in self.steps if step not in self._done), COMPLETE)
+
+    @property
+    def resumable_steps(self):
+        # Checkpointed steps before the state, the ones a resume may skip once their read-backs pass
+        return self.steps if self.state == COMPLETE else self.steps[:self.steps.index(self.state)]
+
+    def is_done(self, step):
+        return step in self._done
+
+    def checkpoint(self, step):
+        return self._done.get(step)
+
+    def complete(self, step, detail=None, data=None):
+        self.checkpoints.mark_done(self.hostname, step, detail, data)
+        self._done[step] = {"detail": detail, "data": data, "completed_at": time.time()}
+        logging.info(f"{self.hostname}: {step} checkpointed, next state {self.state}.")
+
+    def reopen(self, step):
+        later = self.steps[self.steps.index(step):]
+        self.checkpoints.clear(self.hostname, later)
+        for name in later:
+            self._done.pop(name, None)
+        logging.info(f"{self.hostname}: {step} failed its read-back, resuming from there.")
@@ -1,10 +1,14 @@
 # qa.py
 
 import logging
-from web_driver_manager import WebDriverManager
-from backend_connector import BackendConnector
-from ui_manager import UIManager
+import time
 import tkinter as tk
+from telemetry import TelemetryStore
+from instrumentation import tracer
+from ui_manager import UIManager
+from provisioning_state import ProvisioningCheckpoints
+from run_ledger import RunLedger
+from status_broadcaster import StatusBroadcaster, StatusSubscriber
 
 # Set up logging
 logging.basicConfig(
@@ -13,21 +17,95 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def main():
+# Bench networks swept for chargers that came up on a different DHCP lease
+SCAN_RANGES = ["192.168.2.0/24", "192.168.0.0/24"]
+
+def start_backend(backend):
+    # Runs on the worker: Selenium and the connector are only imported here, then the first pooled browser is launched
+    from web_driver_manager import WebDriverManager
+    from backend_connector import BackendConnector
+    from config_index import ConfigIndex
+    from charger_discovery import ChargerRegistry, HostnameCache
+    from browser_lifecycle import browser_lifecycle
+
+    # Chrome and chromedriver left running by a crashed or killed earlier session
+    browser_lifecycle.sweep_orphans()
+
+    charger_registry = ChargerRegistry(SCAN_RANGES, cache=HostnameCache("charger_hosts.json"))
+    charger_registry.start_background_refresh(interval=600)
+
     web_driver_manager = WebDriverManager(driver_path='./chromedriver.exe')  # Provide the correct path to chromedriver
-    backend_connector = BackendConnector(web_driver_manager)
+    backend_connector = BackendConnector(
+        web_driver_manager,
+        status_mode="http",  # Browser-free status reads, falls back to Selenium
+        config_index=ConfigIndex("config_index.sqlite3"),  # Skip re-uploading a config the unit already runs
+        charger_registry=charger_registry,  # Finds the bench charger by hostname when its IP changed
+    )
+    # Kept outside the Tk callback so main() can close it even if the window is shut during warm-up
+    backend["connector"] = backend_connector
+    browser_ready = backend_connector.session_pool.prelaunch(1) > 0
+    return backend_connector, browser_ready
 
-    # Test with headless mode explicitly set to False to see if it works
-    driver = web_driver_manager.initialize_driver(headless=True)  # Set this to True or False depending on what you want to test
-    if driver is None:
-        logging.error("WebDriver failed to initialize. Exiting.")
-        return
+def main():
+    # Per-step timings as JSON lines and as a Prometheus snapshot on http://127.0.0.1:9108/metrics
+    tracer.add_jsonl_exporter("spans.jsonl")
+    try:
+        tracer.serve_metrics(port=9108)
+    except OSError as e:
+        logging.error(f"Metrics endpoint could not start: {str(e)}")
 
+    # The window comes up right away; the buttons unlock once the backend has loaded
     root = tk.Tk()
-    ui_manager = UIManager(root, backend_connector)
+    telemetry = TelemetryStore("telemetry")
+    ledger = RunLedger("run_ledger.sqlite3")
+
+    # One status poller per charger however many dashboards watch it; a second window subscribes to the first one's
+    status_feed = StatusBroadcaster(telemetry=telemetry)
+    try:
+        status_feed.serve(port=8765)
+    except OSError:
+        logging.info("EVSE status feed already running, subscribing to it.")
+        status_feed = StatusSubscriber("http://127.0.0.1:8765")
+
+    ui_manager = UIManager(root, telemetry=telemetry, checkpoints=ProvisioningCheckpoints("provisioning_state.sqlite3"),
+                           ledger=ledger, status_feed=status_feed)
+    backend = {}
+
+    def on_backend_started(result, error):
+        if error is not None:
+            logging.error(f"Backend failed to start: {str(error)}")
+            ui_manager.set_browser_status(f"Backend failed to start: {str(error)}", "red")
+            return
+        backend_connector, browser_ready = result
+        ui_manager.attach_backend(backend_connector)
+        if isinstance(status_feed, StatusBroadcaster):
+            # Feed polls go through the connector from now on: Selenium fallback and circuit breakers included
+            status_feed.set_status_source(backend_connector.read_evse_status)
+        if browser_ready:
+            ui_manager.set_browser_status("Browser ready", "green")
+        else:
+            # Status polling works without Chrome; browser steps will retry the launch when they run
+            ui_manager.set_browser_status("Browser warm-up failed, check chromedriver", "red")
+
+    startup = ui_manager.worker.submit("startup", start_backend, backend, on_done=on_backend_started,
+                                       name="start_backend")
 
     root.mainloop()
 
+    # Stop background jobs and close the pooled browser sessions once the window is gone
+    ui_manager.worker.shutdown()
+    status_feed.close()
+    while not startup.finished:
+        time.sleep(0.1)  # Let a warm-up still in progress finish so its browser gets closed below
+    if "connector" in backend:
+        if backend["connector"].charger_registry is not None:
+            backend["connector"].charger_registry.stop()
+        backend["connector"].close()
+        from browser_lifecycle import browser_lifecycle
+        browser_lifecycle.shutdown()  # Kills any browser that was not quit and sweeps orphans once more
+    telemetry.flush()
+    ledger.close()
+    tracer.close()
+
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,220 @@
+# resilience.py
+
+import logging
+import random
+import socket
+import threading
+import time
+from urllib.error import HTTPError, URLError
+
+# Error classes every connector failure is sorted into
+UNREACHABLE = "unreachable"
+AUTH_FAILED = "auth_failed"
+PAGE_CHANGED = "page_changed"
+TIMEOUT = "timeout"
+BROWSER = "browser"      # Chrome/chromedriver trouble on this PC, says nothing about the charger
+UNKNOWN = "unknown"
+
+# Transient classes worth another attempt; a wrong password or a changed page fails the same way again
+RETRYABLE = (UNREACHABLE, TIMEOUT)
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+class BrowserUnavailable(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, key, retry_in):
+        super().__init__(f"{key} failed repeatedly, calls are paused for another {retry_in:.0f}s.")
+        self.key = key
+        self.retry_in = retry_in
+
+
+def classify_error(error):
+    # Selenium exceptions are matched by name so this module does not need Selenium installed
+    names = {cls.__name__ for cls in type(error).__mro__}
+    message = str(error)
+    if names & {"AuthenticationFailed"} or (isinstance(error, HTTPError) and error.code in (401, 403)):
+        return AUTH_FAILED
+    if names & {"BrowserUnavailable", "SessionNotCreatedException", "NoSuchDriverException"}:
+        return BROWSER
+    if names & {"TimeoutException", "TimeoutError", "JobTimeout"} or isinstance(error, socket.timeout):
+        return TIMEOUT
+    if isinstance(error, URLError) and isinstance(error.reason, socket.timeout):
+        return TIMEOUT
+    if names & {"PageStructureError", "MissingFieldsError", "NoSuchElementException",
+                "StaleElementReferenceException", "ElementNotInteractableException"}:
+        return PAGE_CHANGED
+    if isinstance(error, (URLError, ConnectionError)) or "net::ERR_" in message:
+        return UNREACHABLE
+    if isinstance(error, OSError) and not isinstance(error, HTTPError):
+        return UNREACHABLE
+    return UNKNOWN
+
+
+class RetryPolicy:
+    # Exponential backoff with full jitter: attempt n waits a random time up to base_delay * 2**n (capped)
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=8.0, retry_on=RETRYABLE):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+    def should_retry(self, kind, attempt):
+        return kind in self.retry_on and attempt + 1 < self.attempts
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    # closed: calls go through. open: calls fail at once until reset_timeout has passed.
+    # half_open: a single probe call is let through; success closes the breaker, failure re-opens it
+    # with a doubled timeout (up to max_reset_timeout).
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, key, failure_threshold=3, reset_timeout=30.0, max_reset_timeout=300.0):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.last_error = None
+        self._opened_at = 0.0
+        self._probe_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_running = False
+                logging.info(f"Circuit for {self.key} is half-open, letting one probe through.")
+            if self.state == self.HALF_OPEN and not self._probe_running:
+                self._probe_running = True
+                return True
+            return False
+
+    def retry_in(self):
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info(f"Circuit for {self.key} closed again.")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probe_running = False
+
+    def cancel_probe(self):
+        # The probe ended without telling anything about the charger, let the next call probe instead
+        with self._lock:
+            self._probe_running = False
+
+    def record_failure(self, kind):
+        with self._lock:
+            self.last_error = kind
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_running = False
+        logging.warning(f"Circuit for {self.key} opened after {self.failures} failure(s) ({self.last_error}), "
+                        f"pausing calls for {self.reset_timeout:.0f}s.")
+
+
+class ChargerResilience:
+    # One circuit breaker per charger plus the retry policy, shared by the BackendConnector steps.
+    # Steps report the exception that ended them through report(); run() turns that into retries and breaker state.
+
+    def __init__(self, retry_policy=None, failure_threshold=3, reset_timeout=30.0, max_reset_timeout=300.0):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def breaker(self, key):
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(key, self.failure_threshold, self.reset_timeout,
+                                                               self.max_reset_timeout)
+            return breaker
+
+    def allow(self, key):
+        return self.breaker(key).allow()
+
+    def report(self, error):
+        # Called from a step's except block; the last report of an attempt decides its outcome
+        self._local.error = error
+
+    def record(self, key, error):
+        breaker = self.breaker(key)
+        if error is None:
+            breaker.record_success()
+            return None
+        kind = classify_error(error)
+        # A broken local Chrome must not count against a healthy charger
+        if kind == BROWSER:
+            breaker.cancel_probe()
+        else:
+            breaker.record_failure(kind)
+        return kind
+
+    def run(self, key, name, call, retry=True):
+        # Returns (result, error); error is a CircuitOpenError when the call was short-circuited
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            error = CircuitOpenError(key, breaker.retry_in())
+            logging.warning(f"{name} skipped: {str(error)}")
+            return None, error
+        attempt = 0
+        while True:
+            self._local.error = None
+            try:
+                result = call()
+            except Exception as e:
+                # A step that raises instead of reporting still ends its attempt; without this a half-open
+                # breaker would keep its probe flag and stay closed to every later call
+                self._local.error = None
+                kind = self.record(key, e)
+                logging.error(f"{name} on {key} raised ({kind}): {str(e)}")
+                raise
+            error = self._local.error
+            self._local.error = None
+            kind = self.record(key, error)
+            if error is None:
+                return result, None
+            # Once the breaker has tripped, the remaining attempts would only hit the same dead charger
+            if not retry or not self.retry_policy.should_retry(kind, attempt) or breaker.state != breaker.CLOSED:
+                logging.error(f"{name} on {key} failed ({kind}): {str(error)}")
+                return result, error
+            delay = self.retry_policy.delay(attempt)
+            attempt += 1
+            logging.info(f"{name} on {key} failed ({kind}), retry {attempt} in {delay:.2f}s.")
+            time.sleep(delay)
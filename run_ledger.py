@@ -0,0 +1,240 @@
+# run_ledger.py
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from instrumentation import percentile
+
+STEP_ORDER = ("readiness", "pre_configure", "ocpp_id", "passwords")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS unit_runs ("
+    " id INTEGER PRIMARY KEY,"
+    " hostname TEXT,"
+    " ip_address TEXT,"
+    " station TEXT,"
+    " power_drawn TEXT,"
+    " ocpp_id TEXT,"
+    " installer_password TEXT,"
+    " outcome TEXT NOT NULL,"
+    " failed_step TEXT,"
+    " started_at REAL NOT NULL,"
+    " finished_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS step_runs ("
+    " id INTEGER PRIMARY KEY,"
+    " hostname TEXT,"
+    " station TEXT,"
+    " step TEXT NOT NULL,"
+    " outcome TEXT NOT NULL,"
+    " detail TEXT,"
+    " duration REAL,"
+    " started_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS unit_runs_hostname ON unit_runs (hostname)",
+    "CREATE INDEX IF NOT EXISTS unit_runs_finished ON unit_runs (finished_at)",
+    "CREATE INDEX IF NOT EXISTS unit_runs_outcome ON unit_runs (outcome, finished_at)",
+    "CREATE INDEX IF NOT EXISTS step_runs_hostname ON step_runs (hostname)",
+    "CREATE INDEX IF NOT EXISTS step_runs_started ON step_runs (started_at)",
+    "CREATE INDEX IF NOT EXISTS step_runs_step ON step_runs (step, outcome, started_at)",
+)
+
+
+class RunLedger:
+    # Durable record of every provisioning step and unit, in SQLite (WAL) next to the app.
+    # Writes are queued and committed in batches by one writer thread, so a step never waits on the disk.
+
+    def __init__(self, path="run_ledger.sqlite3", batch_size=200, flush_interval=0.5):
+        self.path = os.path.abspath(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._closed = False
+        connection = self._open()
+        try:
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+        self._writer = threading.Thread(target=self._write_loop, name="run-ledger-writer", daemon=True)
+        self._writer.start()
+
+    def record_step(self, step, outcome, hostname=None, station=None, detail=None, duration=None, started_at=None):
+        if started_at is None:
+            started_at = time.time() - (duration or 0.0)
+        self._put(("step", (hostname, station, step, outcome, detail, duration, started_at)))
+
+    def record_unit(self, outcome, started_at, finished_at=None, hostname=None, ip_address=None, station=None,
+                    power_drawn=None, ocpp_id=None, installer_password=None, failed_step=None):
+        self._put(("unit", (hostname, ip_address, station, power_drawn, ocpp_id, installer_password, outcome,
+                            failed_step, started_at, finished_at or time.time())))
+
+    def flush(self):
+        # Block until everything queued so far is on disk
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    def _put(self, record):
+        if self._closed:
+            logging.warning(f"Run ledger is closed, dropping {record[0]} record.")
+            return
+        self._queue.put(record)
+
+    def report(self, since=None, until=None):
+        # Units/hour, failure rate per step and step latency percentiles for [since, until)
+        until = until or time.time()
+        since = since or until - 8 * 3600
+        connection = self._open()
+        try:
+            units = connection.execute(
+                "SELECT outcome, COUNT(*), MIN(started_at), MAX(finished_at) FROM unit_runs"
+                " WHERE finished_at >= ? AND finished_at < ? GROUP BY outcome",
+                (since, until),
+            ).fetchall()
+            steps = connection.execute(
+                "SELECT step, outcome, duration FROM step_runs WHERE started_at >= ? AND started_at < ?"
+                " ORDER BY step, duration",
+                (since, until),
+            ).fetchall()
+        finally:
+            connection.close()
+
+        passed = sum(count for outcome, count, _, _ in units if outcome == "ok")
+        total = sum(count for _, count, _, _ in units)
+        first = min((row[2] for row in units), default=None)
+        last = max((row[3] for row in units), default=None)
+        hours = (last - first) / 3600 if first is not None and last > first else None
+
+        per_step = {}
+        for step, outcome, duration in steps:
+            entry = per_step.setdefault(step, {"count": 0, "failed": 0, "durations": []})
+            entry["count"] += 1
+            if outcome not in ("ok", "verified", "skipped"):
+                entry["failed"] += 1
+            if duration is not None and outcome == "ok":
+                entry["durations"].append(duration)
+
+        step_report = {}
+        for step in sorted(per_step, key=lambda name: (STEP_ORDER.index(name) if name in STEP_ORDER else len(STEP_ORDER), name)):
+            entry = per_step[step]
+            durations = entry["durations"]
+            step_report[step] = {
+                "count": entry["count"],
+                "failure_rate": entry["failed"] / entry["count"],
+                "p50": percentile(durations, 0.50),
+                "p90": percentile(durations, 0.90),
+                "p99": percentile(durations, 0.99),
+            }
+        return {
+            "since": since,
+            "until": until,
+            "units": total,
+            "passed": passed,
+            "failed": total - passed,
+            "units_per_hour": passed / hours if hours else None,
+            "steps": step_report,
+        }
+
+    def _open(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_loop(self):
+        connection = self._open()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                batch = [item]
+                # Whatever else is already waiting goes into the same transaction
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and time.monotonic() < deadline:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                stopping = None in batch
+                records = [record for record in batch if record is not None]
+                try:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO step_runs (hostname, station, step, outcome, detail, duration, started_at)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [values for kind, values in records if kind == "step"],
+                        )
+                        connection.executemany(
+                            "INSERT INTO unit_runs (hostname, ip_address, station, power_drawn, ocpp_id,"
+                            " installer_password, outcome, failed_step, started_at, finished_at)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [values for kind, values in records if kind == "unit"],
+                        )
+                except sqlite3.Error as e:
+                    logging.error(f"Failed to write {len(records)} ledger record(s): {str(e)}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            connection.close()
+
+
+def format_report(report):
+    def ms(value):
+        return f"{value * 1000:.0f}" if value is not None else "-"
+
+    since = datetime.fromtimestamp(report["since"]).strftime("%Y-%m-%d %H:%M")
+    until = datetime.fromtimestamp(report["until"]).strftime("%Y-%m-%d %H:%M")
+    units_per_hour = f"{report['units_per_hour']:.1f}" if report["units_per_hour"] is not None else "-"
+    lines = [
+        f"{since} to {until}: {report['passed']}/{report['units']} unit(s) passed, {units_per_hour} units/hour",
+        f"{'step':<16}{'runs':>6}{'fail %':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}",
+    ]
+    for step, entry in report["steps"].items():
+        lines.append(f"{step:<16}{entry['count']:>6}{entry['failure_rate'] * 100:>8.1f}"
+                     f"{ms(entry['p50']):>10}{ms(entry['p90']):>10}{ms(entry['p99']):>10}")
+    return "\n".join(lines)
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shift report from the provisioning run ledger.")
+    parser.add_argument("--ledger", default="run_ledger.sqlite3", help="Ledger database")
+    parser.add_argument("--since", type=parse_time, help="Start, e.g. 2026-10-17T06:00 (default: --hours ago)")
+    parser.add_argument("--until", type=parse_time, help="End (default: now)")
+    parser.add_argument("--hours", type=float, default=8.0, help="Window length when --since is not given")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ledger):
+        print(f"No ledger at {args.ledger}.", file=sys.stderr)
+        return 2
+    until = args.until or time.time()
+    since = args.since or (datetime.fromtimestamp(until) - timedelta(hours=args.hours)).timestamp()
+    ledger = RunLedger(args.ledger)
+    try:
+        report = ledger.report(since, until)
+    finally:
+        ledger.close()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+# sqlite_store.py
+
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def sqlite_connection(path, timeout=10):
+    # One short-lived connection per operation: committed when the block succeeds, rolled back when it raises
+    connection = sqlite3.connect(path, timeout=timeout)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,357 @@
+# status_broadcaster.py
+
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+from http_status_reader import HttpStatusReader
+from poll_scheduler import PollBudgetExceeded, PollScheduler
+
+DEFAULT_PORT = 8765
+KEEPALIVE_SECONDS = 15
+
+
+class WatchedCharger:
+    def __init__(self, key, ip_address, username, password):
+        self.key = key
+        self.ip_address = ip_address
+        self.username = username
+        self.password = password
+        self.status = None
+        self.reachable = None
+        self.updated_at = None
+        self.seq = 0
+        self.stopped = threading.Event()
+
+    def to_dict(self):
+        return {"ip_address": self.ip_address, "status": self.status, "reachable": self.reachable,
+                "updated_at": self.updated_at, "seq": self.seq}
+
+
+class StatusBroadcaster:
+    # Polls each watched charger once, however many dashboards are looking, and publishes only what changed.
+    # Subscribers get a "snapshot" message with the last known state first, then "delta" messages:
+    #   {"type": "delta", "charger": key, "seq": n, "ts": ..., "reachable": bool, "changes": {field: value}}
+    # In-process subscribers use subscribe(); other processes use the server-sent events from serve().
+
+    def __init__(self, reader=None, poll_scheduler=None, telemetry=None, scheme="https"):
+        self.reader = reader or HttpStatusReader(scheme=scheme)
+        self.poll_scheduler = poll_scheduler or PollScheduler()
+        self.telemetry = telemetry  # Optional TelemetryStore, fed once per poll instead of once per dashboard
+        # Optional source(ip_address, username, password) -> status or None, used instead of the plain HTTP reader
+        self.status_source = None
+        self._chargers = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def set_status_source(self, source):
+        # qa.py points this at BackendConnector.read_evse_status once the connector is up, so the feed gets the
+        # Selenium fallback and the circuit breakers; polls already running switch over on their next read
+        self.status_source = source
+
+    def watch(self, ip_address, username='Assembler', password='E2', key=None):
+        key = key or ip_address
+        with self._lock:
+            charger = self._chargers.get(key)
+            if charger is not None and charger.ip_address == ip_address:
+                charger.username, charger.password = username, password
+                return key
+            if charger is not None:
+                # Same unit on a new address, restart its poll loop there
+                charger.stopped.set()
+            # One poll per address: whatever watched it under another key is replaced by this entry
+            replaced = [other for other in self._chargers.values() if other.ip_address == ip_address]
+            for other in replaced:
+                other.stopped.set()
+                del self._chargers[other.key]
+            charger = self._chargers[key] = WatchedCharger(key, ip_address, username, password)
+        for other in replaced:
+            self.poll_scheduler.forget(other.key)
+            logging.info(f"{other.key} ({ip_address}) is now broadcast as {key}.")
+        threading.Thread(target=self._poll_loop, args=(charger,), name=f"status-{key}", daemon=True).start()
+        logging.info(f"Broadcasting EVSE status of {key} ({ip_address}).")
+        if replaced:
+            self._publish(self.snapshot())
+        return key
+
+    def unwatch(self, key):
+        # Returns False when the key was not watched
+        with self._lock:
+            charger = self._chargers.pop(key, None)
+        if charger is None:
+            return False
+        charger.stopped.set()
+        self.poll_scheduler.forget(key)
+        logging.info(f"Stopped broadcasting EVSE status of {key}.")
+        # Deltas cannot remove a charger, subscribers drop it from the fresh snapshot
+        self._publish(self.snapshot())
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return {"type": "snapshot", "chargers": {key: charger.to_dict() for key, charger in self._chargers.items()}}
+
+    def subscribe(self, callback):
+        # callback(message) runs on the poll threads; the snapshot is delivered before any later delta
+        with self._lock:
+            message = {"type": "snapshot",
+                       "chargers": {key: charger.to_dict() for key, charger in self._chargers.items()}}
+            self._subscribers.append(callback)
+        callback(message)
+        return lambda: self._unsubscribe(callback)
+
+    def serve(self, port=DEFAULT_PORT, host="127.0.0.1"):
+        # GET /events: server-sent events, GET /snapshot: JSON, POST /watch {"ip_address", "username", "password", "key"},
+        # POST /unwatch {"key"}
+        broadcaster = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/snapshot"):
+                    self._send_json(broadcaster.snapshot())
+                elif self.path.startswith("/events"):
+                    self._stream_events()
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if not self.path.startswith(("/watch", "/unwatch")):
+                    self.send_error(404)
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                    if self.path.startswith("/unwatch"):
+                        document = {"key": body["key"], "removed": broadcaster.unwatch(body["key"])}
+                    else:
+                        document = {"key": broadcaster.watch(body["ip_address"], body.get("username", 'Assembler'),
+                                                             body.get("password", 'E2'), key=body.get("key"))}
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                self._send_json(document)
+
+            def _send_json(self, document):
+                body = json.dumps(document).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream_events(self):
+                messages = queue.Queue(maxsize=1000)
+
+                def enqueue(message):
+                    try:
+                        messages.put_nowait(message)
+                    except queue.Full:
+                        pass  # A stalled client only loses deltas, it resyncs from the snapshot on reconnect
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                unsubscribe = broadcaster.subscribe(enqueue)
+                try:
+                    while broadcaster._server is not None:
+                        try:
+                            message = messages.get(timeout=KEEPALIVE_SECONDS)
+                            chunk = f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+                        except queue.Empty:
+                            chunk = ": keepalive\n\n"
+                        self.wfile.write(chunk.encode("utf-8"))
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    unsubscribe()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), StatusHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="status-broadcaster", daemon=True).start()
+        logging.info(f"EVSE status feed on http://{host}:{self._server.server_address[1]}/events")
+        return self._server.server_address[1]
+
+    def close(self):
+        with self._lock:
+            chargers = list(self._chargers.values())
+            self._chargers.clear()
+        for charger in chargers:
+            charger.stopped.set()
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.shutdown()
+            server.server_close()
+
+    def _unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _poll_loop(self, charger):
+        while not charger.stopped.is_set():
+            try:
+                status = self.poll_scheduler.scrape(self.status_source or self.reader.read_evse_status,
+                                                    charger.ip_address, charger.username, charger.password)
+            except PollBudgetExceeded:
+                charger.stopped.wait(self.poll_scheduler.record_skipped(charger.key))
+                continue
+            except Exception as e:
+                logging.warning(f"EVSE status read failed on {charger.ip_address}: {str(e)}")
+                status = None
+            if charger.stopped.is_set():
+                break
+            self._update(charger, status)
+            charger.stopped.wait(self.poll_scheduler.record_result(charger.key, status))
+
+    def _update(self, charger, status):
+        reachable = status is not None
+        with self._lock:
+            if self._chargers.get(charger.key) is not charger:
+                return  # Unwatched or replaced while this poll was running
+            previous = charger.status or {}
+            changes = {field: value for field, value in (status or {}).items() if previous.get(field) != value}
+            if not changes and reachable == charger.reachable:
+                return
+            charger.seq += 1
+            charger.reachable = reachable
+            charger.updated_at = time.time()
+            if status is not None:
+                charger.status = dict(status)
+            message = {"type": "delta", "charger": charger.key, "seq": charger.seq, "ts": charger.updated_at,
+                       "reachable": reachable, "changes": changes}
+        if status is not None and self.telemetry is not None:
+            self.telemetry.record(charger.key, status)
+        self._publish(message)
+
+    def _publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as e:
+                logging.error(f"Status subscriber failed: {str(e)}")
+
+
+class StatusSubscriber:
+    # Client side of StatusBroadcaster.serve() with the same watch()/subscribe() interface as the broadcaster,
+    # so a dashboard does not care whether the poller runs in its own process or in another one
+
+    def __init__(self, url=f"http://127.0.0.1:{DEFAULT_PORT}", reconnect_delay=2.0):
+        self.url = url.rstrip("/")
+        self.reconnect_delay = reconnect_delay
+        self._chargers = {}  # Mirror of the broadcaster's state, so a late subscriber still starts from a snapshot
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, ip_address, username='Assembler', password='E2', key=None):
+        body = json.dumps({"ip_address": ip_address, "username": username, "password": password,
+                           "key": key}).encode("utf-8")
+        request = Request(f"{self.url}/watch", data=body, headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=5) as response:
+            return json.loads(response.read())["key"]
+
+    def unwatch(self, key):
+        request = Request(f"{self.url}/unwatch", data=json.dumps({"key": key}).encode("utf-8"),
+                          headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=5) as response:
+            return json.loads(response.read())["removed"]
+
+    def snapshot(self):
+        with self._lock:
+            return {"type": "snapshot", "chargers": {key: dict(entry) for key, entry in self._chargers.items()}}
+
+    def subscribe(self, callback):
+        with self._lock:
+            message = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._read_loop, name="status-subscriber", daemon=True)
+                self._thread.start()
+            elif self._chargers:
+                message = {"type": "snapshot", "chargers": {key: dict(entry) for key, entry in self._chargers.items()}}
+            self._subscribers.append(callback)
+        if message is not None:
+            callback(message)
+        return lambda: self._unsubscribe(callback)
+
+    def close(self):
+        self._stopped.set()
+
+    def _unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _read_loop(self):
+        while not self._stopped.is_set():
+            try:
+                with urlopen(f"{self.url}/events", timeout=KEEPALIVE_SECONDS * 2) as response:
+                    data = []
+                    for raw_line in response:
+                        if self._stopped.is_set():
+                            return
+                        line = raw_line.decode("utf-8").rstrip("\r\n")
+                        if line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif not line and data:
+                            self._deliver(json.loads("\n".join(data)))
+                            data = []
+            except (OSError, ValueError) as e:
+                logging.warning(f"EVSE status feed {self.url} dropped: {str(e)}")
+            # Every reconnect starts with a fresh snapshot, so nothing missed in between is lost
+            self._stopped.wait(self.reconnect_delay)
+
+    def _deliver(self, message):
+        with self._lock:
+            if message["type"] == "snapshot":
+                self._chargers = {key: dict(entry) for key, entry in message["chargers"].items()}
+            else:
+                entry = self._chargers.setdefault(message["charger"], {"ip_address": None, "status": None})
+                entry["status"] = dict(entry["status"] or {}, **message["changes"])
+                entry.update(reachable=message["reachable"], updated_at=message["ts"], seq=message["seq"])
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as e:
+                logging.error(f"Status subscriber failed: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll chargers once and share their EVSE status with every dashboard.")
+    parser.add_argument("chargers", nargs="*", help="Charger to watch as ip[,username,password]")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port for /events, /snapshot and /watch")
+    parser.add_argument("--scheme", default="https", choices=("https", "http"), help="Scheme of the charger web UI")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    broadcaster = StatusBroadcaster(scheme=args.scheme)
+    for entry in args.chargers:
+        parts = entry.split(",")
+        ip_address, username, password = parts + ["", 'Assembler', 'E2'][len(parts):]
+        broadcaster.watch(ip_address, username, password)
+    broadcaster.serve(port=args.port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broadcaster.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# telemetry.py
+
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+
+# Numeric EVSE fields and the unit suffix the charger prints after each value
+NUMERIC_FIELDS = {
+    "Temperature": "℃",
+    "Available Power": "%",
+    "AC Voltage": "V",
+    "Current": "A",
+    "Current Offered": "A",
+    "Energy": "kWh",
+    "EVSE PP State": "A",
+}
+# Status strings are stored as small integer codes so every column stays numeric
+STATUS_CODES = {"available": 0, "preparing": 1, "charging": 2, "suspendedev": 3, "suspendedevse": 4,
+                "finishing": 5, "reserved": 6, "unavailable": 7, "faulted": 8}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN_STATUS = -1
+
+COLUMNS = ("time", "Status") + tuple(NUMERIC_FIELDS)
+NUMBER = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+def parse_evse_status(evse_status):
+    # '28℃', '224V', '0kWh' -> 28.0, 224.0, 0.0; anything unparsable becomes NaN
+    sample = {"Status": float(STATUS_CODES.get(str(evse_status.get("Status", "")).strip().lower(), UNKNOWN_STATUS))}
+    for field in NUMERIC_FIELDS:
+        match = NUMBER.search(str(evse_status.get(field, "")))
+        sample[field] = float(match.group()) if match else float("nan")
+    return sample
+
+
+class RingBuffer:
+    # Fixed-size, array-backed columns, oldest samples are overwritten once full
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = {name: array("d", bytes(8 * capacity)) for name in COLUMNS}
+        self.start = 0
+        self.size = 0
+
+    def append(self, timestamp, sample):
+        index = (self.start + self.size) % self.capacity
+        self.columns["time"][index] = timestamp
+        for name in COLUMNS[1:]:
+            self.columns[name][index] = sample[name]
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def indices(self):
+        return ((self.start + offset) % self.capacity for offset in range(self.size))
+
+
+class ColumnarSpill:
+    # One little-endian float64 file per column in a per-charger directory, rows line up by position
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, rows):
+        # rows: list of (timestamp, sample)
+        for name in COLUMNS:
+            values = array("d", (timestamp if name == "time" else sample[name] for timestamp, sample in rows))
+            with open(self._path(name), "ab") as f:
+                values.tofile(f)
+
+    def read(self, column, since=None, until=None):
+        times = self._load("time")
+        values = times if column == "time" else self._load(column)
+        count = min(len(times), len(values))
+        return [(times[i], values[i]) for i in range(count)
+                if (since is None or times[i] >= since) and (until is None or times[i] <= until)]
+
+    def _load(self, name):
+        values = array("d")
+        path = self._path(name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            values.frombytes(data[:len(data) - len(data) % 8])
+        return values
+
+    def _path(self, name):
+        return os.path.join(self.directory, name.replace(" ", "_") + ".f64")
+
+
+class TelemetryStore:
+    # Typed EVSE telemetry per charger: an in-memory ring buffer for recent samples, spilled to disk in batches.
+    # At the default 5 s poll a 12 hour shift is 8640 samples, so capacity bounds memory for a whole shift.
+
+    def __init__(self, directory="telemetry", capacity=8640, spill_every=60):
+        self.directory = directory
+        self.capacity = capacity
+        self.spill_every = spill_every  # Samples buffered per charger before they are appended to disk
+        self._buffers = {}
+        self._pending = {}
+        self._spills = {}
+        self._lock = threading.Lock()
+
+    def record(self, charger, evse_status, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        sample = parse_evse_status(evse_status)
+        with self._lock:
+            buffer = self._buffers.get(charger)
+            if buffer is None:
+                buffer = self._buffers[charger] = RingBuffer(self.capacity)
+            buffer.append(timestamp, sample)
+            pending = self._pending.setdefault(charger, [])
+            pending.append((timestamp, sample))
+            to_spill = None
+            if len(pending) >= self.spill_every:
+                to_spill, self._pending[charger] = pending, []
+        if to_spill:
+            self._spill(charger, to_spill)
+        return sample
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for charger, rows in pending.items():
+            if rows:
+                self._spill(charger, rows)
+
+    def series(self, charger, field, since=None, until=None):
+        # Recent samples come from memory, older ones from the spill files
+        with self._lock:
+            buffer = self._buffers.get(charger)
+            memory = []
+            if buffer is not None:
+                times, values = buffer.columns["time"], buffer.columns[field]
+                memory = [(times[i], values[i]) for i in buffer.indices()]
+        oldest_in_memory = memory[0][0] if memory else None
+        if since is None or oldest_in_memory is None or since < oldest_in_memory:
+            disk = self._spill_for(charger).read(field, since=since, until=until)
+            if oldest_in_memory is not None:
+                disk = [row for row in disk if row[0] < oldest_in_memory]
+        else:
+            disk = []
+        return disk + [row for row in memory
+                       if (since is None or row[0] >= since) and (until is None or row[0] <= until)]
+
+    def summary(self, charger, field, window=None, since=None, until=None):
+        # min/max/mean of a field over the last `window` seconds or an explicit since/until range
+        if window is not None:
+            since = time.time() - window
+        values = [value for _, value in self.series(charger, field, since=since, until=until) if value == value]
+        if not values:
+            return {"count": 0, "min": None, "max": None, "mean": None}
+        return {"count": len(values), "min": min(values), "max": max(values), "mean": sum(values) / len(values)}
+
+    def latest(self, charger):
+        with self._lock:
+            buffer = self._buffers.get(charger)
+            if buffer is None or buffer.size == 0:
+                return None
+            index = (buffer.start + buffer.size - 1) % buffer.capacity
+            return {name: buffer.columns[name][index] for name in COLUMNS}
+
+    def chargers(self):
+        with self._lock:
+            return list(self._buffers)
+
+    def _spill(self, charger, rows):
+        try:
+            self._spill_for(charger).append(rows)
+        except OSError as e:
+            logging.error(f"Failed to write telemetry for {charger}: {str(e)}")
+
+    def _spill_for(self, charger):
+        with self._lock:
+            spill = self._spills.get(charger)
+            if spill is None:
+                safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", charger)
+                spill = self._spills[charger] = ColumnarSpill(os.path.join(self.directory, safe_name))
+            return spill
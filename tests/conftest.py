@@ -0,0 +1,32 @@
+# conftest.py
+
+import os
+import sys
+import pytest
+
+# The modules live flat in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONFIG_FILE = os.path.join(ROOT, "1.3.7_Config.zip")
+
+
+class CountingDriverManager:
+    # Stands in for WebDriverManager: counts launches and never starts a browser
+    def __init__(self):
+        self.launches = 0
+
+    def create_driver(self, headless=True):
+        self.launches += 1
+        return None
+
+    def quit(self, driver):
+        pass
+
+
+@pytest.fixture
+def charger():
+    from mock_charger import MockCharger
+
+    with MockCharger() as mock:
+        yield mock
@@ -0,0 +1,156 @@
+# test_backend_connector.py
+
+import socket
+import time
+from selenium.common.exceptions import WebDriverException
+from backend_connector import BackendConnector
+from config_builder import get_config_builder, ocpp_identity_from_hostname
+from config_index import ConfigIndex, config_fingerprint
+from instrumentation import tracer
+from conftest import CONFIG_FILE, CountingDriverManager
+
+
+def closed_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+def http_connector():
+    manager = CountingDriverManager()
+    connector = BackendConnector(manager, status_mode="http", scheme="http")
+    connector.http_reader.timeout = 1
+    return connector, manager
+
+
+def test_evse_status_is_read_over_http(charger):
+    connector, manager = http_connector()
+    connector.ip_address = charger.address
+    status = connector.get_evse_status('Assembler', 'E2')
+    assert status["AC Voltage"] == "224V"
+    assert manager.launches == 0
+
+
+def test_unreachable_charger_does_not_start_a_browser():
+    connector, manager = http_connector()
+    connector.ip_address = closed_address()
+    assert connector.get_evse_status('Assembler', 'E2') is None
+    address = closed_address()
+    assert connector._read_charger_info(f"http://{address}", address, 'Assembler', 'E2') is None
+    assert manager.launches == 0
+
+
+def test_changed_page_falls_back_to_selenium(charger):
+    connector, manager = http_connector()
+    connector.ip_address = charger.address
+    with charger.state.lock:
+        del charger.state.evse_status["Energy"]
+    # The fallback tries to lease a browser, which the stand-in manager refuses
+    assert connector.get_evse_status('Assembler', 'E2') is None
+    assert manager.launches == 1
+
+
+def test_missing_info_link_falls_back_to_selenium(charger, monkeypatch):
+    connector, manager = http_connector()
+    monkeypatch.setattr("mock_charger.NAV", "<nav></nav>")
+    assert connector._read_charger_info(charger.url, charger.address, 'Assembler', 'E2') is None
+    assert manager.launches == 1
+
+
+def test_status_of_another_charger_keeps_the_fallback(charger):
+    # What the StatusBroadcaster polls through: any address, not only the connected one
+    connector, manager = http_connector()
+    assert connector.read_evse_status(charger.address, 'Assembler', 'E2')["AC Voltage"] == "224V"
+    with charger.state.lock:
+        del charger.state.evse_status["Energy"]
+    assert connector.read_evse_status(charger.address, 'Assembler', 'E2') is None
+    assert manager.launches == 1
+    assert connector.ip_address is None
+
+
+def test_failed_feed_polls_do_not_pause_the_steps():
+    connector, manager = http_connector()
+    connector.ip_address = closed_address()
+    for _ in range(connector.resilience.failure_threshold + 1):
+        assert connector.read_evse_status(connector.ip_address, 'Assembler', 'E2') is None
+    assert connector.resilience.breaker(connector.ip_address).state == "closed"
+
+    # Both steps still run and get as far as leasing a browser instead of failing on an open circuit
+    assert connector.change_passwords('Assembler', 'E2') == {"error": "Failed to initialize WebDriver."}
+    assert connector.upload_config_file(CONFIG_FILE, 'Assembler', 'E2') == "Failed to initialize WebDriver."
+    assert manager.launches == 2
+
+
+def test_index_hit_alone_does_not_skip_the_upload(charger, tmp_path):
+    connector, manager = http_connector()
+    connector.config_index = ConfigIndex(str(tmp_path / "config_index.sqlite3"))
+    connector.ip_address, connector.hostname = charger.address, charger.state.hostname
+    ocpp_id = ocpp_identity_from_hostname(connector.hostname)
+    config_hash, _ = config_fingerprint(get_config_builder(CONFIG_FILE).build(ocpp_id))
+
+    # A reset unit is back on its factory identity: the upload goes ahead and the stale entry is dropped
+    connector.config_index.record(connector.hostname, config_hash, ocpp_id)
+    assert connector.upload_config_file(CONFIG_FILE, 'Assembler', 'E2', merge_ocpp_id=True) == "Failed to initialize WebDriver."
+    assert manager.launches == 1
+    assert connector.config_index.lookup(connector.hostname) is None
+
+    # Once the charger reports the merged identity the upload is skipped without a browser
+    connector.config_index.record(connector.hostname, config_hash, ocpp_id)
+    charger.state.identity = ocpp_id
+    assert "already applied" in connector.upload_config_file(CONFIG_FILE, 'Assembler', 'E2', merge_ocpp_id=True)
+    assert manager.launches == 1
+
+
+class NavigatedDriver:
+    # The import page is gone: no monitor state and no message can be read
+    def execute_script(self, script, *args):
+        raise WebDriverException("page navigated")
+
+
+class ScriptedDiscovery:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    def discover(self, urls, first_only=False):
+        return self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+
+
+def test_import_without_message_is_only_confirmed_by_a_reboot(monkeypatch):
+    monkeypatch.setattr("backend_connector.REBOOT_WAIT", 0.6)
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    connector, _ = http_connector()
+    url = "http://127.0.0.1"
+
+    connector.discovery = ScriptedDiscovery([url])
+    confirmed, detail = connector._wait_for_import(NavigatedDriver(), url, time.monotonic() + 5)
+    assert not confirmed and "without a success message" in detail
+
+    connector.discovery = ScriptedDiscovery([url], [], [], [url])
+    assert connector._wait_for_import(NavigatedDriver(), url, time.monotonic() + 5) == (
+        True, "charger rebooted and its web UI is back")
+
+
+class StepRecorder:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        if span.name == "step":
+            self.spans.append(span)
+
+    def close(self):
+        pass
+
+
+def test_readiness_span_is_tagged_with_the_charger_it_found(charger):
+    connector, _ = http_connector()
+    connector.ip_address, connector.hostname = "192.168.2.99", "ray-previous-unit"
+    recorder = StepRecorder()
+    tracer.add_exporter(recorder)
+    try:
+        connector.connect_to_backend([charger.url], 'Assembler', 'E2')
+    finally:
+        tracer.remove_exporter(recorder)
+    step = next(span for span in recorder.spans if span.tags["step"] == "connect_to_backend")
+    assert step.tags["hostname"] == charger.state.hostname
+    assert step.tags["ip"] == connector.ip_address != "192.168.2.99"
@@ -0,0 +1,77 @@
+# test_benchmark.py
+
+import pytest
+from benchmark import NavigationRecorder, build_report, format_comparison, format_report, run_benchmark
+from instrumentation import percentile
+from instrumentation import Tracer
+
+
+def report_for(outcomes, step_names=("step",), chargers=2, navigations=(), browser_rss=()):
+    return build_report(list(step_names), outcomes, chargers=chargers, iterations=2, latency=0.0, failure_rate=0.0,
+                        profile="default", wall_time=1.0, navigations=list(navigations), browser_rss=list(browser_rss))
+
+
+def test_percentile_is_nearest_rank():
+    values = [0.01 * n for n in range(10, 0, -1)]
+    assert percentile(values, 0.50) == pytest.approx(0.05)
+    assert percentile(values, 0.95) == pytest.approx(0.10)
+    assert percentile([0.2], 0.95) == 0.2
+    assert percentile([], 0.50) is None
+
+
+def test_step_statistics_pool_every_charger():
+    outcomes = [({"step": [0.1, 0.3]}, {"step": 0}), ({"step": [0.2, 0.4]}, {"step": 1})]
+    step = report_for(outcomes)["steps"]["step"]
+    assert step["count"] == 4
+    assert step["failures"] == 1
+    assert step["p50"] == pytest.approx(0.2)
+    assert step["p95"] == pytest.approx(0.4)
+    assert step["mean"] == pytest.approx(0.25)
+    # 4 calls in 1.0s of summed call time, two chargers running side by side
+    assert step["throughput"] == pytest.approx(8.0)
+
+
+def test_navigation_and_memory_summary():
+    report = report_for([({"step": [0.1]}, {"step": 0})], navigations=[0.3, 0.1, 0.2], browser_rss=[100.0, 300.0])
+    assert report["navigation"] == {"count": 3, "p50": pytest.approx(0.2), "p95": pytest.approx(0.3)}
+    assert report["browser_rss_mb"] == pytest.approx(200.0)
+
+
+def test_format_report_without_steps():
+    report = report_for([], step_names=(), navigations=[0.25])
+    text = format_report(report)
+    assert "250.0" in text
+    assert "(1 loads)" in text
+
+
+def test_format_report_and_comparison_with_missing_values():
+    outcomes = [({"step": []}, {"step": 0})]
+    report = report_for(outcomes)
+    assert report["steps"]["step"]["mean"] is None
+    assert "step" in format_report(report)
+    assert "-" in format_comparison(report, report)
+
+
+def test_navigation_recorder_keeps_spans_past_the_tracer_buffer():
+    tracer = Tracer(max_spans=5)
+    recorder = NavigationRecorder()
+    tracer.add_exporter(recorder)
+    for _ in range(20):
+        with tracer.span("page_load"):
+            pass
+        with tracer.span("login"):
+            pass
+    tracer.remove_exporter(recorder)
+    with tracer.span("page_load"):
+        pass
+    assert len(tracer.recent_spans()) == 5
+    assert len(recorder.durations) == 20
+
+
+def test_browser_free_run_against_mock_chargers():
+    report = run_benchmark("./chromedriver", chargers=2, iterations=2, use_browser=False)
+    assert set(report["steps"]) == {"connect_to_backend", "get_evse_status[http]"}
+    for step in report["steps"].values():
+        assert step["count"] == 4
+        assert step["failures"] == 0
+    assert report["navigation"]["count"] == 0
@@ -0,0 +1,36 @@
+# test_browser_lifecycle.py
+
+import browser_lifecycle as lifecycle_module
+from browser_lifecycle import MARKER_ARGUMENT, BrowserLifecycle
+
+# pid -> (ppid, name, cmdline); every chromedriver here lost its parent and was re-parented to init
+PROCESSES = {
+    1: (0, "init", ["init"]),
+    100: (1, "chromedriver", ["chromedriver", "--port=9515"]),
+    101: (100, "chrome", ["chrome", MARKER_ARGUMENT, "--user-data-dir=/tmp/profile"]),
+    200: (1, "chromedriver", ["chromedriver", "--port=9516"]),
+    201: (200, "chrome", ["chrome", "--user-data-dir=/home/someone/.config/chrome"]),
+    300: (1, "chromedriver", ["chromedriver", "--port=9517"]),
+}
+
+
+def tree(pid):
+    pids = [pid]
+    for child, (ppid, _, _) in PROCESSES.items():
+        if ppid == pid:
+            pids.extend(tree(child))
+    return pids
+
+
+def test_sweep_only_kills_chromedrivers_running_a_marked_chrome(monkeypatch):
+    killed = []
+    monkeypatch.setattr(lifecycle_module, "processes_visible", lambda: True)
+    monkeypatch.setattr(lifecycle_module, "list_processes", lambda: dict(PROCESSES))
+    monkeypatch.setattr(lifecycle_module, "process_tree", tree)
+    monkeypatch.setattr(lifecycle_module, "browser_processes", list)
+    monkeypatch.setattr(lifecycle_module, "kill_processes", lambda pids: killed.extend(pids) or len(pids))
+    lifecycle = BrowserLifecycle()
+    monkeypatch.setattr(lifecycle, "_remove_stale_profiles", lambda live_profiles: None)
+
+    assert lifecycle.sweep_orphans() == 2
+    assert sorted(killed) == [100, 101]
@@ -0,0 +1,58 @@
+# test_provisioning_pipeline.py
+
+from backend_connector import BackendConnector
+from config_builder import get_config_builder, ocpp_identity_from_hostname
+from config_index import ConfigIndex, config_fingerprint
+from conftest import CONFIG_FILE, CountingDriverManager
+from provisioning_pipeline import ProvisioningPipeline, Station
+from provisioning_state import ProvisioningCheckpoints
+
+
+class BrowserlessPipeline(ProvisioningPipeline):
+    # Every browser step fails to get a browser, so only the HTTP read-backs can pass
+    def create_connector(self, station):
+        connector = BackendConnector(CountingDriverManager(), status_mode="http", config_index=self.config_index,
+                                     scheme="http")
+        connector.http_reader.timeout = 1
+        return connector
+
+
+def resumed_pipeline(charger, tmp_path):
+    # A unit whose checkpoints and config index say the merged config went on in an earlier run
+    hostname = charger.state.hostname
+    ocpp_id = ocpp_identity_from_hostname(hostname)
+    config_index = ConfigIndex(str(tmp_path / "config_index.sqlite3"))
+    config_hash, _ = config_fingerprint(get_config_builder(CONFIG_FILE).build(ocpp_id))
+    config_index.record(hostname, config_hash, ocpp_id)
+    checkpoints = ProvisioningCheckpoints(str(tmp_path / "provisioning_state.sqlite3"))
+    checkpoints.mark_done(hostname, "pre_configure", "Configuration uploaded successfully.")
+    checkpoints.mark_done(hostname, "ocpp_id", f"OCPP ID allocated successfully: {ocpp_id}", {"ocpp_id": ocpp_id})
+    events = []
+    pipeline = BrowserlessPipeline("chromedriver", CONFIG_FILE, config_index=config_index, checkpoints=checkpoints,
+                                   on_event=events.append)
+    return pipeline, events
+
+
+def test_identity_that_did_not_stick_reopens_the_upload(charger, tmp_path):
+    pipeline, events = resumed_pipeline(charger, tmp_path)
+    hostname = charger.state.hostname
+
+    result = pipeline.run_station(Station("bench", charger.url))
+
+    assert result.failed_step == "pre_configure"
+    assert "ocpp_id" not in result.steps
+    assert pipeline.checkpoints.completed_steps(hostname) == {}
+    assert pipeline.config_index.lookup(hostname) is None
+    assert not any(event["step"] == "ocpp_id" and event["status"] in ("ok", "verified") for event in events)
+    assert charger.state.imports == 0
+
+
+def test_confirmed_checkpoints_are_resumed(charger, tmp_path):
+    pipeline, events = resumed_pipeline(charger, tmp_path)
+    charger.state.identity = ocpp_identity_from_hostname(charger.state.hostname)
+
+    result = pipeline.run_station(Station("bench", charger.url))
+
+    assert result.steps["pre_configure"]["resumed"] and result.steps["ocpp_id"]["resumed"]
+    assert result.failed_step == "passwords"
+    assert set(pipeline.checkpoints.completed_steps(charger.state.hostname)) == {"pre_configure", "ocpp_id"}
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from resilience import BrowserUnavailable, ChargerResilience, CircuitBreaker, CircuitOpenError, RetryPolicy
+
+RESET_TIMEOUT = 0.05
+
+
+def make_resilience():
+    return ChargerResilience(retry_policy=RetryPolicy(attempts=1), failure_threshold=2, reset_timeout=RESET_TIMEOUT,
+                             max_reset_timeout=RESET_TIMEOUT * 4)
+
+
+def failing(resilience):
+    def call():
+        resilience.report(ConnectionError("connection refused"))
+    return call
+
+
+def raising():
+    raise ConnectionError("connection refused")
+
+
+def test_probe_that_raises_reopens_the_breaker():
+    resilience = make_resilience()
+    breaker = resilience.breaker("charger")
+
+    for _ in range(2):
+        result, error = resilience.run("charger", "read", failing(resilience))
+        assert isinstance(error, ConnectionError)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    result, error = resilience.run("charger", "read", lambda: "status")
+    assert isinstance(error, CircuitOpenError)
+
+    time.sleep(breaker.reset_timeout)
+    with pytest.raises(ConnectionError):
+        resilience.run("charger", "read", raising)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.reset_timeout == RESET_TIMEOUT * 2
+
+    time.sleep(breaker.reset_timeout)
+    result, error = resilience.run("charger", "read", lambda: "status")
+    assert (result, error) == ("status", None)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.reset_timeout == RESET_TIMEOUT
+
+
+def test_raised_browser_error_only_frees_the_probe():
+    resilience = make_resilience()
+    breaker = resilience.breaker("charger")
+    for _ in range(2):
+        resilience.run("charger", "read", failing(resilience))
+    time.sleep(breaker.reset_timeout)
+
+    def browser_down():
+        raise BrowserUnavailable("chromedriver missing")
+
+    with pytest.raises(BrowserUnavailable):
+        resilience.run("charger", "read", browser_down)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    result, error = resilience.run("charger", "read", lambda: "status")
+    assert (result, error) == ("status", None)
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from poll_scheduler import PollScheduler
+from status_broadcaster import StatusBroadcaster, StatusSubscriber
+
+
+class FakeReader:
+    def __init__(self):
+        self.reads = []
+
+    def read_evse_status(self, ip_address, username, password):
+        self.reads.append(ip_address)
+        return {"Status": "available", "AC Voltage": "230V"}
+
+
+def poll_threads():
+    return sorted(thread.name for thread in threading.enumerate()
+                  if thread.name.startswith("status-evse-") and thread.is_alive())
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def broadcaster():
+    broadcaster = StatusBroadcaster(reader=FakeReader(), poll_scheduler=PollScheduler(base_interval=0.05, jitter=0))
+    yield broadcaster
+    broadcaster.close()
+
+
+def test_watch_polls_once_per_charger(broadcaster):
+    messages = []
+    broadcaster.subscribe(messages.append)
+    assert broadcaster.watch("192.168.2.3", key="evse-1") == "evse-1"
+    assert broadcaster.watch("192.168.2.3", key="evse-1") == "evse-1"
+
+    assert wait_for(lambda: any(message["type"] == "delta" for message in messages))
+    assert poll_threads() == ["status-evse-1"]
+    assert broadcaster.snapshot()["chargers"]["evse-1"]["status"]["Status"] == "available"
+
+
+def test_switching_the_ip_replaces_the_poll(broadcaster):
+    broadcaster.watch("192.168.2.3", key="evse-1")
+    broadcaster.watch("192.168.2.4", key="evse-1")
+    assert wait_for(lambda: poll_threads() == ["status-evse-1"])
+    assert broadcaster.snapshot()["chargers"]["evse-1"]["ip_address"] == "192.168.2.4"
+
+    # Another key on an address that is already polled takes that poll over
+    messages = []
+    broadcaster.subscribe(messages.append)
+    broadcaster.watch("192.168.2.4", key="evse-2")
+    assert wait_for(lambda: poll_threads() == ["status-evse-2"])
+    assert list(broadcaster.snapshot()["chargers"]) == ["evse-2"]
+    assert any(message["type"] == "snapshot" and list(message["chargers"]) == ["evse-2"] for message in messages)
+
+
+def test_unwatch_stops_the_poll(broadcaster):
+    messages = []
+    broadcaster.subscribe(messages.append)
+    broadcaster.watch("192.168.2.3", key="evse-1")
+    assert broadcaster.unwatch("evse-1")
+    assert not broadcaster.unwatch("evse-1")
+    assert wait_for(lambda: poll_threads() == [])
+    assert messages[-1] == {"type": "snapshot", "chargers": {}}
+
+
+def test_status_source_replaces_the_reader(broadcaster):
+    reads = []
+
+    def source(ip_address, username, password):
+        reads.append(ip_address)
+        return None
+
+    broadcaster.set_status_source(source)
+    broadcaster.watch("192.168.2.3", key="evse-1")
+    assert wait_for(lambda: broadcaster.snapshot()["chargers"]["evse-1"]["reachable"] is False)
+    assert reads and broadcaster.reader.reads == []
+
+
+def test_subscriber_watches_and_unwatches_over_http(broadcaster):
+    port = broadcaster.serve(port=0)
+    subscriber = StatusSubscriber(f"http://127.0.0.1:{port}")
+    try:
+        assert subscriber.watch("192.168.2.3", key="evse-1") == "evse-1"
+        assert wait_for(lambda: poll_threads() == ["status-evse-1"])
+        assert subscriber.unwatch("evse-1")
+        assert wait_for(lambda: poll_threads() == [])
+        assert not subscriber.unwatch("evse-1")
+    finally:
+        subscriber.close()
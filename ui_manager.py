@@ -1,14 +1,71 @@
 import logging
+import queue
+import time
 import tkinter as tk
 from tkinter import messagebox
+from background_worker import BackendWorker
+from poll_scheduler import PollScheduler
+from provisioning_state import UnitProvisioning
+from dashboard_grid import STATUS_COLORS, open_dashboard
+
+# Upper bounds for a single backend job before the UI reports it as timed out
+POLL_TIMEOUT = 30
+STEP_TIMEOUT = 120
+# A config upload may wait up to BackendConnector.upload_timeout for the import and the reboot alone; this covers
+# the session lease, login and the config read-back around it, so the UI never gives up before the connector does
+UPLOAD_STEP_MARGIN = 60
+# How often status feed messages are applied to the labels
+FEED_DRAIN_MS = 200
+CONFIG_FILE_PATH = r'./1.3.7_Config.zip'  # Adjust the path to your configuration file
 
 class UIManager:
-    def __init__(self, root, backend_connector):
+    def __init__(self, root, backend_connector=None, worker=None, telemetry=None, poll_scheduler=None, checkpoints=None,
+                 ledger=None, status_feed=None):
         self.root = root
-        self.backend_connector = backend_connector
+        self.backend_connector = None  # Set by attach_backend(), possibly after the window is already up
+        self.telemetry = telemetry  # Optional TelemetryStore fed with every successful poll
+        self.poll_scheduler = poll_scheduler or PollScheduler()
+        # Optional ProvisioningCheckpoints: steps done on this unit in an earlier session are shown and kept
+        self.checkpoints = checkpoints
+        self.unit = None
+        self.ledger = ledger  # Optional RunLedger, every step outcome and finished unit goes there
+        self.step_started = {}  # step job name -> wall-clock start, for the ledger durations
+        # Optional StatusBroadcaster/StatusSubscriber; when set, the labels follow the shared feed instead of polling
+        self.status_feed = status_feed
+        self.status_messages = queue.Queue()
+        self.feed_key = None
+        self.feed_status = {}
+        self.dashboard = None  # Open DashboardGrid window, if any
+        self.unit_started = None  # Readiness results of the unit on the bench, completed into a ledger unit record
         self.logo_image = None  # Keep a reference to the image
+        # All backend calls run on the worker under one key, so jobs on this charger never overlap
+        self.worker = worker or BackendWorker()
+        self.worker.attach(self.root)
+        self.charger_key = "charger"
         self.setup_ui()
 
+        if backend_connector is not None:
+            self.attach_backend(backend_connector)
+        else:
+            self.set_backend_buttons(tk.DISABLED)
+            self.set_browser_status("Starting browser...", "gray")
+
+    def attach_backend(self, backend_connector):
+        self.backend_connector = backend_connector
+        self.set_backend_buttons(tk.NORMAL)
+        if self.status_feed is not None:
+            self.status_feed.subscribe(self.status_messages.put)
+            self.drain_status_feed()
+        else:
+            self.poll_evse_status()
+
+    def set_backend_buttons(self, state):
+        for button in (self.btn_check_unit, self.btn_pre_configure, self.btn_ocpp_id_allocation):
+            button.config(state=state)
+
+    def set_browser_status(self, text, color="gray"):
+        self.browser_status_label.config(text=text, fg=color)
+
     def setup_ui(self):
         self.root.title("Production Handling Automation Suite")
         self.root.geometry("1024x768")  # Adjusting the window size
@@ -33,11 +90,14 @@ class UIManager:
         self.loading_label = tk.Label(self.root, text="", font=("Helvetica", 12))
         self.loading_label.pack(pady=5)
 
+        self.browser_status_label = tk.Label(self.root, text="", font=("Helvetica", 10), fg="gray")
+        self.browser_status_label.pack(side=tk.BOTTOM, pady=5)
+
         self.readiness_result_label = tk.Label(self.frame_main, text="", font=("Helvetica", 12), fg="green", width=70, anchor='w')
-        btn_check_unit = tk.Button(self.frame_main, text="Check Unit Readiness", command=self.check_unit_ready, width=30, height=2)
-        btn_check_unit.grid(row=0, column=0, padx=10, pady=15)
-        btn_check_unit.bind("<Enter>", self.on_enter)
-        btn_check_unit.bind("<Leave>", self.on_leave)
+        self.btn_check_unit = tk.Button(self.frame_main, text="Check Unit Readiness", command=self.check_unit_ready, width=30, height=2)
+        self.btn_check_unit.grid(row=0, column=0, padx=10, pady=15)
+        self.btn_check_unit.bind("<Enter>", self.on_enter)
+        self.btn_check_unit.bind("<Leave>", self.on_leave)
         self.readiness_result_label.grid(row=0, column=1, padx=(20, 30), pady=20)
 
         self.create_buttons()
@@ -64,36 +124,84 @@ class UIManager:
         # Pack the labels vertically
         for label in self.evse_status_labels.values():
             label.pack(anchor="w")
-
-        self.poll_evse_status()
+        self.evse_shown = {}  # label key -> (text, color) on screen
 
     def poll_evse_status(self):
-        evse_status = self.backend_connector.get_evse_status(username='Assembler', password='E2')
-        if evse_status:
+        # Skip this tick while a provisioning step (or the previous poll) still owns the charger
+        job = self.worker.submit(
+            self.charger_key, self.poll_scheduler.scrape, self.backend_connector.get_evse_status,
+            username='Assembler', password='E2',
+            timeout=POLL_TIMEOUT, on_done=self.on_evse_status, name="get_evse_status", skip_if_busy=True,
+        )
+        if job is None:
+            self.schedule_next_poll(self.poll_scheduler.record_skipped(self.poll_key()))
+
+    def on_evse_status(self, evse_status, error):
+        if error is None and evse_status:
             self.update_evse_status(evse_status)
-        self.root.after(5000, self.poll_evse_status)  # Poll every 5 seconds
+            if self.telemetry is not None:
+                charger = self.backend_connector.hostname or self.backend_connector.ip_address
+                self.telemetry.record(charger, evse_status)
+        if self.backend_connector.ip_address is None:
+            # Nothing connected yet, keep checking at the base rate so a new unit shows up quickly
+            self.schedule_next_poll(self.poll_scheduler.base_interval)
+            return
+        # Poll fast while the unit charges, back off while it idles or does not answer
+        self.schedule_next_poll(self.poll_scheduler.record_result(self.poll_key(), None if error else evse_status))
+
+    def watch_status(self, ip_address, hostname):
+        # Ask the shared poller to watch the unit on the bench; the HTTP calls run off the Tk thread
+        previous_key, self.feed_key = self.feed_key, hostname or ip_address
+        self.feed_status = {}
+        if previous_key is not None and previous_key != self.feed_key:
+            # The unit that left the bench is not polled any longer
+            self.worker.submit("status_feed", self.status_feed.unwatch, previous_key, name="unwatch_status")
+        self.worker.submit("status_feed", self.status_feed.watch, ip_address, 'Assembler', 'E2', key=self.feed_key,
+                           name="watch_status")
+
+    def drain_status_feed(self):
+        changed = False
+        while True:
+            try:
+                message = self.status_messages.get_nowait()
+            except queue.Empty:
+                break
+            if message["type"] == "snapshot":
+                entry = message["chargers"].get(self.feed_key)
+                if entry and entry["status"]:
+                    self.feed_status = dict(entry["status"])
+                    changed = True
+            elif message["charger"] == self.feed_key and message["changes"]:
+                self.feed_status.update(message["changes"])
+                changed = True
+        if changed and all(field in self.feed_status for field in self.evse_status_labels):
+            self.update_evse_status(self.feed_status)
+        self.root.after(FEED_DRAIN_MS, self.drain_status_feed)
+
+    def poll_key(self):
+        return self.backend_connector.hostname or self.backend_connector.ip_address or "unconnected"
+
+    def schedule_next_poll(self, delay):
+        self.root.after(int(delay * 1000), self.poll_evse_status)
 
     def update_evse_status(self, evse_status):
-        status_color = {
-            "preparing": "pink",
-            "suspendedev": "gray",
-            "charging": "blue",
-            "available": "green"
-        }
-        
-        # Update each label with the EVSE status information
+        # Only labels whose text or color changed are reconfigured, an unchanged poll touches no widget
         for key, label in self.evse_status_labels.items():
-            label.config(text=f"{key}: {evse_status[key]}")
+            text = f"{key}: {evse_status[key]}"
+            color = STATUS_COLORS.get(evse_status[key], "white") if key == "Status" else "white"
+            if self.evse_shown.get(key) != (text, color):
+                label.config(text=text, fg=color)
+                self.evse_shown[key] = (text, color)
 
-        # Set the Status color dynamically
-        status = evse_status["Status"]
-        self.evse_status_labels["Status"].config(fg=status_color.get(status, "white"))
+    def run_backend_step(self, fn, on_done, name, timeout=STEP_TIMEOUT, **kwargs):
+        self.step_started[name] = time.time()
+        self.worker.submit(self.charger_key, fn, timeout=timeout, on_done=on_done, name=name, **kwargs)
 
     def check_unit_ready(self):
         self.loading_label.config(text="Loading... Please wait.")
-        self.root.update()
 
-        ip_address, power_drawn, hostname = self.backend_connector.connect_to_backend(
+        self.run_backend_step(
+            self.backend_connector.connect_to_backend, self.on_unit_ready, "connect_to_backend",
             test_urls=[
                 'https://192.168.2.3', 'https://192.168.0.108',
                 'https://192.168.2.4', 'https://192.168.2.5', 
@@ -103,65 +211,174 @@ class UIManager:
             password='E2'
         )
 
+    def on_unit_ready(self, result, error):
+        ready = self.show_unit_ready(result, error)
+        self.record_step("readiness", "connect_to_backend", ready, self.readiness_result_label.cget("text"))
+
+    def show_unit_ready(self, result, error):
         self.loading_label.config(text="")
-        self.root.update()
 
+        if error is not None:
+            self.readiness_result_label.config(text=f"Readiness check failed: {str(error)}", fg="red")
+            return False
+
+        ip_address, power_drawn, hostname = result
         if not ip_address or not power_drawn:
             self.readiness_result_label.config(text="Could not retrieve IP or power information.", fg="red")
-            return
+            return False
 
         try:
             power_drawn = float(power_drawn.strip('V'))
         except ValueError:
             self.readiness_result_label.config(text="Invalid power drawn value retrieved.", fg="red")
             logging.error("Invalid power drawn value retrieved.")
-            return
+            return False
 
         if 220.0 <= power_drawn <= 240.0:
             self.readiness_result_label.config(text=f"IP Address: {ip_address}, Power Supply: {power_drawn:.2f}V, Hostname: {hostname}", fg="green")
             logging.info("Unit is ready for testing.")
+            self.unit_started = {"started_at": time.time(), "ip_address": ip_address, "power_drawn": f"{power_drawn:.2f}V"}
+            if self.status_feed is not None:
+                self.watch_status(self.backend_connector.ip_address, hostname)
+            self.resume_unit(hostname)
+            return True
         else:
             self.readiness_result_label.config(text="Power supply is not within the expected range.", fg="orange")
             logging.warning("Power supply is not within the expected range.")
+            return False
+
+    def resume_unit(self, hostname):
+        if self.checkpoints is None or not hostname:
+            return
+        self.unit = UnitProvisioning(hostname, self.checkpoints)
+        self.show_checkpoints(restored=False)
+        if self.unit.state == "pre_configure":
+            return
+        # The checkpoint file alone is not trusted, the unit may have been reset or swapped since
+        self.loading_label.config(text="Checking earlier progress on the charger... Please wait.")
+        self.run_backend_step(self.backend_connector.read_back_checkpoints, self.on_checkpoints_read_back,
+                              "read_back_checkpoints", unit=self.unit, config_file_path=CONFIG_FILE_PATH,
+                              username='Assembler', password='E2', merge_ocpp_id=True)
+
+    def on_checkpoints_read_back(self, stale_step, error):
+        self.loading_label.config(text="")
+        unit = self.unit
+        if unit is None or unit.hostname != self.backend_connector.hostname:
+            return
+        if error is not None:
+            # Nothing is restored without a read-back, the checkpoints stay for the next attempt
+            logging.error(f"Could not read back the checkpoints of {unit.hostname}: {str(error)}")
+            self.show_checkpoints(restored=False)
+            return
+        self.show_checkpoints()
+        if unit.state != "pre_configure":
+            logging.info(f"{unit.hostname} resumes at {unit.state}.")
+
+    def show_checkpoints(self, restored=True):
+        labels = {
+            "pre_configure": self.pre_configure_result_label,
+            "ocpp_id": self.ocpp_id_result_label,
+            "passwords": self.generate_passwords_result_label,
+        }
+        done = self.unit.resumable_steps
+        for step, label in labels.items():
+            checkpoint = self.unit.checkpoint(step) if restored and step in done else None
+            label.config(text=f"Done earlier: {checkpoint['detail']}" if checkpoint else "", fg="green")
+        if restored and "ocpp_id" in done:
+            self.btn_generate_passwords.config(state=tk.NORMAL)
+
+    def record_step(self, step, name, ok, detail):
+        if self.ledger is None:
+            return
+        started_at = self.step_started.pop(name, None)
+        duration = time.time() - started_at if started_at is not None else None
+        hostname = self.backend_connector.hostname if self.backend_connector is not None else None
+        self.ledger.record_step(step, "ok" if ok else "failed", hostname=hostname, station="bench", detail=detail,
+                                duration=duration, started_at=started_at)
+
+    def record_unit_done(self, passwords):
+        # The bench flow has no fixed end besides the last step, a unit counts once its passwords are set
+        if self.ledger is None or self.unit_started is None:
+            return
+        hostname = self.backend_connector.hostname
+        ocpp_id = (self.unit.checkpoint("ocpp_id") or {}).get("data") if self.unit is not None else None
+        self.ledger.record_unit(
+            "ok", started_at=self.unit_started["started_at"], hostname=hostname,
+            ip_address=self.unit_started["ip_address"], station="bench", power_drawn=self.unit_started["power_drawn"],
+            ocpp_id=(ocpp_id or {}).get("ocpp_id"), installer_password=passwords.get("Installer"),
+        )
+        self.unit_started = None
+
+    def checkpoint(self, step, detail, data=None):
+        if self.unit is not None and self.unit.hostname == self.backend_connector.hostname:
+            self.unit.complete(step, detail, data)
 
     def upload_config(self):
         self.loading_label.config(text="Uploading configuration... Please wait.")
-        self.root.update()
 
-        config_file_path = r'./1.3.7_Config.zip'  # Adjust the path to your configuration file
-        status = self.backend_connector.upload_config_file(config_file_path=config_file_path, username='Assembler', password='E2')
-        
+        # The OCPP ID goes into the uploaded archive once the readiness check has found the hostname
+        self.run_backend_step(
+            self.backend_connector.upload_config_file, self.on_config_uploaded, "upload_config_file",
+            timeout=self.backend_connector.upload_timeout + UPLOAD_STEP_MARGIN, config_file_path=CONFIG_FILE_PATH, username='Assembler', password='E2',
+            merge_ocpp_id=self.backend_connector.hostname is not None
+        )
+
+    def on_config_uploaded(self, status, error):
         self.loading_label.config(text="")
-        self.root.update()
+        if error is not None:
+            status = f"An error occurred: {str(error)}"
 
         self.pre_configure_result_label.config(text=status, fg="green" if "successfully" in status else "red")
+        self.record_step("pre_configure", "upload_config_file", "successfully" in status, status)
+        if "successfully" in status:
+            self.checkpoint("pre_configure", status)
+
+        if "with OCPP ID" in status:
+            ocpp_id = status.rsplit(": ", 1)[1]
+            self.on_ocpp_id_allocated(f"OCPP ID allocated successfully: {ocpp_id} (merged into configuration)", None)
 
     def allocate_ocpp_id(self):
         self.loading_label.config(text="Allocating OCPP ID... Please wait.")
-        self.root.update()
 
-        status = self.backend_connector.allocate_ocpp_id(username='Assembler', password='E2')
+        self.run_backend_step(
+            self.backend_connector.allocate_ocpp_id, self.on_ocpp_id_allocated, "allocate_ocpp_id",
+            username='Assembler', password='E2'
+        )
+
+    def on_ocpp_id_allocated(self, status, error):
         self.loading_label.config(text="")
-        self.root.update()
+        if error is not None:
+            status = f"An error occurred: {str(error)}"
 
         self.ocpp_id_result_label.config(text=status, fg="green" if "successfully" in status else "red")
+        self.record_step("ocpp_id", "allocate_ocpp_id", "successfully" in status, status)
 
         if "successfully" in status:
+            self.checkpoint("ocpp_id", status, {"ocpp_id": status.split(": ", 1)[1].split(" ", 1)[0]})
             self.btn_generate_passwords.config(state=tk.NORMAL)
 
     def change_passwords(self):
         self.loading_label.config(text="Changing passwords... Please wait.")
-        self.root.update()
 
-        passwords = self.backend_connector.change_passwords(username='Assembler', password='E2')
+        self.run_backend_step(
+            self.backend_connector.change_passwords, self.on_passwords_changed, "change_passwords",
+            username='Assembler', password='E2'
+        )
+
+    def on_passwords_changed(self, passwords, error):
         self.loading_label.config(text="")
-        self.root.update()
+        if error is not None:
+            passwords = {"error": str(error)}
 
         if "error" in passwords:
             self.generate_passwords_result_label.config(text=f"Error: {passwords['error']}", fg="red")
+            self.record_step("passwords", "change_passwords", False, passwords["error"])
         else:
             password_text = f"Assembler: {passwords['Assembler']} | Installer: {passwords['Installer']} | EV: {passwords['EV']}"
             self.generate_passwords_result_label.config(text=password_text, fg="green")
+            self.checkpoint("passwords", "Passwords updated.", passwords)
+            self.record_step("passwords", "change_passwords", True, "Passwords updated.")
+            self.record_unit_done(passwords)
 
     def on_enter(self, e):
         e.widget['background'] = 'lightblue'
@@ -171,18 +388,18 @@ class UIManager:
 
     def create_buttons(self):
         self.pre_configure_result_label = tk.Label(self.frame_main, text="", font=("Helvetica", 12), fg="green", width=60, anchor='w')
-        btn_pre_configure = tk.Button(self.frame_main, text="Pre-configure Settings", command=self.upload_config, width=30, height=2)
-        btn_pre_configure.grid(row=2, column=0, padx=10, pady=5)
-        btn_pre_configure.bind("<Enter>", self.on_enter)
-        btn_pre_configure.bind("<Leave>", self.on_leave)
+        self.btn_pre_configure = tk.Button(self.frame_main, text="Pre-configure Settings", command=self.upload_config, width=30, height=2)
+        self.btn_pre_configure.grid(row=2, column=0, padx=10, pady=5)
+        self.btn_pre_configure.bind("<Enter>", self.on_enter)
+        self.btn_pre_configure.bind("<Leave>", self.on_leave)
         self.pre_configure_result_label.grid(row=2, column=1, padx=10, pady=5)
 
         # Add "OCPP ID Allocation" button
         self.ocpp_id_result_label = tk.Label(self.frame_main, text="", font=("Helvetica", 12), fg="green", width=60, anchor='w')
-        btn_ocpp_id_allocation = tk.Button(self.frame_main, text="OCPP ID Allocation", command=self.allocate_ocpp_id, width=30, height=2)
-        btn_ocpp_id_allocation.grid(row=3, column=0, padx=10, pady=5)
-        btn_ocpp_id_allocation.bind("<Enter>", self.on_enter)
-        btn_ocpp_id_allocation.bind("<Leave>", self.on_leave)
+        self.btn_ocpp_id_allocation = tk.Button(self.frame_main, text="OCPP ID Allocation", command=self.allocate_ocpp_id, width=30, height=2)
+        self.btn_ocpp_id_allocation.grid(row=3, column=0, padx=10, pady=5)
+        self.btn_ocpp_id_allocation.bind("<Enter>", self.on_enter)
+        self.btn_ocpp_id_allocation.bind("<Leave>", self.on_leave)
         self.ocpp_id_result_label.grid(row=3, column=1, padx=10, pady=5)
 
         # Add "Generate Passwords" button, initially disabled
@@ -193,3 +410,16 @@ class UIManager:
         self.generate_passwords_result_label = tk.Label(self.frame_main, text="", font=("Helvetica", 12), fg="green", width=60, anchor='w')
         self.generate_passwords_result_label.grid(row=4, column=1, padx=10, pady=5)     
 
+        # Every charger on the shared status feed in one grid, for the benches around this one
+        self.btn_dashboard = tk.Button(self.frame_main, text="Bench Dashboard", command=self.open_dashboard, width=30, height=2,
+                                       state=tk.NORMAL if self.status_feed is not None else tk.DISABLED)
+        self.btn_dashboard.grid(row=5, column=0, padx=10, pady=5)
+        self.btn_dashboard.bind("<Enter>", self.on_enter)
+        self.btn_dashboard.bind("<Leave>", self.on_leave)
+
+    def open_dashboard(self):
+        if self.dashboard is not None and not self.dashboard.closed:
+            self.dashboard.parent.lift()
+            return
+        self.dashboard = open_dashboard(self.root, self.status_feed, telemetry=self.telemetry)
+
@@ -1,17 +1,57 @@
 # web_driver_manager.py
 
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from instrumentation import tracer
+from browser_lifecycle import MARKER_ARGUMENT, PROFILE_DIR_PREFIX, browser_lifecycle
+
+# Selenium is imported on first use so the UI can come up before it has loaded
+
+# "lean" Chrome: nothing the scrapes and form fills do not need
+LEAN_BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp",
+                     "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+LEAN_BLOCKED_STYLESHEETS = ["*.css"]
+LEAN_ARGUMENTS = [
+    "--window-size=800,600",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--disable-gpu",
+    "--mute-audio",
+    "--metrics-recording-only",
+    "--no-service-autorun",
+    "--password-store=basic",
+]
+
 
 class WebDriverManager:
-    def __init__(self, driver_path):
+    # profile="default" keeps the historical Chrome options; "lean" blocks images and fonts (and external
+    # stylesheets unless block_stylesheets is off), uses the eager page load strategy, a small window and
+    # a throwaway user-data dir per browser.
+
+    def __init__(self, driver_path, profile="default", block_stylesheets=True):
         self.driver_path = driver_path
-        self.driver = None
+        self.profile = profile
+        self.block_stylesheets = block_stylesheets
+        self._profile_dirs = {}  # id(driver) -> temp user-data dir, removed by quit()
 
-    def initialize_driver(self, headless=True):  # Pass headless as a parameter
+    def create_driver(self, headless=True):
+        # Start a new Chrome instance; every caller owns the drivers it creates and hands them back to quit()
         try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service
+            from selenium.webdriver.chrome.options import Options
+
             service = Service(self.driver_path)
             chrome_options = Options()
 
@@ -30,18 +70,236 @@ class WebDriverManager:
             chrome_options.add_argument("--disable-web-security")
             chrome_options.add_argument("disable-search-engine-choice-screen")
             chrome_options.add_argument("disable-first-run-ui")
+            chrome_options.add_argument(MARKER_ARGUMENT)  # Lets browser_lifecycle find this Chrome if we die
+
+            profile_dir = None
+            if self.profile == "lean":
+                # DOM is ready long before the charger's images and scripts finish, the waits take it from there
+                chrome_options.page_load_strategy = "eager"
+                for argument in LEAN_ARGUMENTS:
+                    chrome_options.add_argument(argument)
+                if sys.platform.startswith("linux"):
+                    chrome_options.add_argument("--disable-dev-shm-usage")
+                profile_dir = tempfile.mkdtemp(prefix=PROFILE_DIR_PREFIX)
+                chrome_options.add_argument(f"--user-data-dir={profile_dir}")
 
             # Log the final options being passed to Chrome
             logging.info(f"Chrome options being used: {chrome_options.arguments}")
 
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            # Never more browsers than the process-wide budget allows, a launch waits for a slot instead
+            if not browser_lifecycle.acquire():
+                raise RuntimeError(f"all {browser_lifecycle.max_browsers} browser slots stayed busy")
+            try:
+                with tracer.span("driver_start", headless=headless, profile=self.profile):
+                    driver = webdriver.Chrome(service=service, options=chrome_options)
+            except Exception:
+                browser_lifecycle.release()
+                if profile_dir is not None:
+                    shutil.rmtree(profile_dir, ignore_errors=True)
+                raise
+            browser_lifecycle.register(driver, profile_dir)
+            if profile_dir is not None:
+                self._profile_dirs[id(driver)] = profile_dir
+                self._block_resources(driver)
             logging.info("WebDriver initialized successfully.")
-            return self.driver
+            return driver
         except Exception as e:
             logging.error(f"Failed to initialize WebDriver: {str(e)}")
             return None
 
-    def quit_driver(self):
-        if self.driver is not None:
-            self.driver.quit()
-            logging.info("WebDriver closed successfully.")
+    def _block_resources(self, driver):
+        blocked = LEAN_BLOCKED_URLS + (LEAN_BLOCKED_STYLESHEETS if self.block_stylesheets else [])
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked})
+        except Exception as e:
+            # Only costs bandwidth, the browser is still usable
+            logging.warning(f"Could not block static resources: {str(e)}")
+
+    def quit(self, driver):
+        # Quit a browser from create_driver(), kill whatever of it survived the quit and remove its temporary profile
+        pids = browser_lifecycle.pids(driver)  # Taken first, after the quit its leftovers no longer hang below chromedriver
+        try:
+            driver.quit()
+        finally:
+            browser_lifecycle.unregister(driver, pids)
+            profile_dir = self._profile_dirs.pop(id(driver), None)
+            if profile_dir is not None:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+class PooledSession:
+    def __init__(self, ip_address, driver):
+        self.ip_address = ip_address
+        self.driver = driver
+        self.username = None
+        self.password = None
+        self.logged_in_at = None
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    # Keeps warm, logged-in Chrome sessions per charger IP and hands them out through lease()/release().
+    # login_fn(driver, ip_address, username, password) must leave the driver authenticated or raise,
+    # callers that land on the login form again log in on the leased driver themselves (see
+    # BackendConnector._open_page), which leaves the pooled session valid for the next lease.
+
+    def __init__(self, web_driver_manager, login_fn, idle_ttl=300, max_idle_per_ip=1, headless=True):
+        self.web_driver_manager = web_driver_manager
+        self.login_fn = login_fn
+        self.idle_ttl = idle_ttl
+        self.max_idle_per_ip = max_idle_per_ip
+        self.headless = headless
+        self._idle = {}     # ip_address -> [PooledSession]
+        self._leased = {}   # id(driver) -> PooledSession
+        self._spares = []   # Prelaunched, not yet logged-in drivers for whichever charger comes first
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._reaper = None
+
+    def lease(self, ip_address, username, password):
+        self._start_reaper()
+        self.reap_idle()
+
+        while True:
+            with self._lock:
+                idle = self._idle.get(ip_address)
+                session = idle.pop() if idle else None
+            if session is None:
+                break
+            reason = self._recycle_reason(session)
+            if reason is None:
+                break
+            logging.info(f"Discarding browser session for {ip_address}: {reason}.")
+            self._quit(session)
+
+        if session is None:
+            with self._lock:
+                driver = self._spares.pop() if self._spares else None
+            if driver is not None and browser_lifecycle.recycle_reason(driver) is not None:
+                self._quit(PooledSession(ip_address, driver))
+                driver = None
+            if driver is None:
+                driver = self.web_driver_manager.create_driver(headless=self.headless)
+            if driver is None:
+                return None
+            session = PooledSession(ip_address, driver)
+
+        try:
+            if session.username != username or session.password != password or self._login_expired(session):
+                self.login_fn(session.driver, ip_address, username, password)
+                session.username = username
+                session.password = password
+                session.logged_in_at = time.monotonic()
+                logging.info(f"Logged in browser session for {ip_address} as {username}.")
+        except Exception as e:
+            logging.error(f"Failed to log in pooled session for {ip_address}: {str(e)}")
+            self._quit(session)
+            raise
+
+        with self._lock:
+            self._leased[id(session.driver)] = session
+        return session.driver
+
+    def release(self, driver, discard=False):
+        with self._lock:
+            session = self._leased.pop(id(driver), None)
+        if session is None:
+            return
+
+        session.last_used = time.monotonic()
+        reason = browser_lifecycle.recycle_reason(driver)
+        if reason is not None:
+            logging.info(f"Recycling browser session for {session.ip_address}: {reason}.")
+        if discard or reason is not None or self._closed.is_set():
+            self._quit(session)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(session.ip_address, [])
+            if len(idle) < self.max_idle_per_ip:
+                idle.append(session)
+                session = None
+        if session is not None:
+            self._quit(session)
+
+    def prelaunch(self, count=1):
+        # Start browsers ahead of time so the first lease only pays for the login; returns how many started
+        started = 0
+        for _ in range(count):
+            driver = self.web_driver_manager.create_driver(headless=self.headless)
+            if driver is None:
+                break
+            with self._lock:
+                if self._closed.is_set():
+                    self.web_driver_manager.quit(driver)
+                    break
+                self._spares.append(driver)
+            started += 1
+        return started
+
+    def reap_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for ip_address, idle in list(self._idle.items()):
+                keep = [s for s in idle if now - s.last_used < self.idle_ttl]
+                expired.extend(s for s in idle if now - s.last_used >= self.idle_ttl)
+                if keep:
+                    self._idle[ip_address] = keep
+                else:
+                    del self._idle[ip_address]
+        for session in expired:
+            logging.info(f"Closing idle browser session for {session.ip_address}.")
+            self._quit(session)
+
+    def drivers(self):
+        with self._lock:
+            return ([s.driver for idle in self._idle.values() for s in idle]
+                    + [s.driver for s in self._leased.values()] + list(self._spares))
+
+    def close_all(self):
+        self._closed.set()
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle] + list(self._leased.values())
+            sessions += [PooledSession(None, driver) for driver in self._spares]
+            self._idle.clear()
+            self._leased.clear()
+            self._spares.clear()
+        for session in sessions:
+            self._quit(session)
+
+    def _login_expired(self, session):
+        # Expired charger sessions are detected where they show up, on navigation (see BackendConnector._open_page)
+        return session.logged_in_at is None
+
+    def _is_alive(self, session):
+        try:
+            session.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _recycle_reason(self, session):
+        # Why an idle session must not be handed out again, None when it is fine
+        if not self._is_alive(session):
+            return "session is dead"
+        return browser_lifecycle.recycle_reason(session.driver)
+
+    def _quit(self, session):
+        try:
+            self.web_driver_manager.quit(session.driver)
+        except Exception as e:
+            logging.warning(f"Failed to quit browser session for {session.ip_address}: {str(e)}")
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None or self._closed.is_set():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="session-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_ttl / 4)
+        while not self._closed.wait(interval):
+            self.reap_idle()